@@ -3,14 +3,19 @@ import random
 import time
 import sys
 import os, os.path
+import imp
 import importlib
+import inspect
+import socket
 import types
 
-logging.basicConfig(
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        level=logging.INFO)
+from botwar_events import EventBus, LoggingSubscriber, TurnStart, TurnEnd, Command, Wasted, Move, \
+                          Collision, Scan, Hit, Pickup, Death, GameOver
+from botwar_replay import ReplayError, KEYFRAME_INTERVAL, open_reader, open_writer
+from botwar_profile import Profiler
+from botwar_planner import GotoPlanner
+
 logger = logging.getLogger()
-logger.setLevel(logging.DEBUG)
 
 NORTH=0
 EAST=1
@@ -19,19 +24,54 @@ WEST=3
 
 log_direction = ["NORTH", "EAST", "SOUTH", "WEST"]
 
+DEFAULT_SIZE = (16, 9)
+DEFAULT_POWERUPS = 1
+MAX_SEED = 2**64 - 1
+
+# Keyword arguments passed to function robots and the expression each is read
+# from, where source is either a Robot or an Environment
+ARGUMENTS = (
+    ("clone_world", "source.clone_world"),
+    ("enemy_location_x", "source.enemy_location[0]"),
+    ("enemy_location_y", "source.enemy_location[1]"),
+    ("enemy_location_age", "source.enemy_location[2]"),
+    ("energy", "source.energy"),
+    ("life", "source.life"),
+    ("location_x", "source.location[0]"),
+    ("location_y", "source.location[1]"),
+    ("max_energy", "source.max_energy"),
+    ("max_life", "source.max_life"),
+    ("powerup_location_x", "source.powerup_location[0]"),
+    ("powerup_location_y", "source.powerup_location[1]"),
+    ("powerup_location_age", "source.powerup_location[2]"),
+    ("robot_direction", "source.robot_direction"),
+    ("turn", "turn"),
+    ("turret_direction", "source.turret_direction"),
+)
+
+def compile_arguments(run_function=None):
+    # Work out once which arguments run_function takes, and build a function
+    # that reads just those into a dict, so each turn is a handful of reads
+    names = [name for name, expression in ARGUMENTS]
+    try:
+        argspec = inspect.getargspec(run_function)
+        if argspec.keywords is None:
+            names = [name for name in names if name in argspec.args]
+    except TypeError:
+        pass
+    expressions = dict(ARGUMENTS)
+    source = "lambda source, turn: {%s}" % ", ".join(["%r: %s" % (name, expressions[name]) for name in names])
+    return eval(source)
+
 class Environment(object):
-    enemy_location = (-1, -1, -1)
-    powerup_location = (-1, -1, -1)
-    location = (-1, -1)
-    energy = 0
-    max_energy = 0
-    life = 0
-    max_life = 0
-    turn = 0
-    robot_direction = NORTH
-    turret_direction = NORTH
-    
-    def __init__(self, turn, max_energy, max_life, energy, life, location, enemy_location, powerup_location, robot_direction, turret_direction):
+    __slots__ = ("turn", "max_energy", "max_life", "energy", "life", "location",
+                 "enemy_location", "powerup_location", "robot_direction", "turret_direction", "clone_world")
+
+    # clone_world returns a copy of the game the robot is in, for robots that
+    # look ahead with simulate(), or is None for robots playing outside the
+    # engine's process.  Robots never get the game itself, so they can't
+    # change it
+    def __init__(self, turn, max_energy, max_life, energy, life, location, enemy_location, powerup_location, robot_direction, turret_direction, clone_world=None):
         self.turn = turn
         self.max_energy = max_energy
         self.max_life = max_life
@@ -42,32 +82,17 @@ class Environment(object):
         self.powerup_location = powerup_location
         self.robot_direction = robot_direction
         self.turret_direction = turret_direction
+        self.clone_world = clone_world
         
     def to_dict(self):
-        dict = {}
-        for attr, value in self:
-            dict[attr] = value
-        return dict
+        return all_arguments(self, self.turn)
         
     def __iter__(self):
-        for attr in dir(self):
-            if attr.startswith("__") or callable(getattr(self, attr)):
-                continue
-                
-            value = getattr(self, attr)
-            try:
-                if len(value) == 3:
-                    yield attr + "_x", value[0]
-                    yield attr + "_y", value[1]
-                    yield attr + "_age", value[2]
-                    continue
-                if len(value) == 2:
-                    yield attr + "_x", value[0]
-                    yield attr + "_y", value[1]
-                    continue
-            except TypeError:
-                pass
-            yield attr, value
+        arguments = self.to_dict()
+        for name, expression in ARGUMENTS:
+            yield name, arguments[name]
+
+all_arguments = compile_arguments()
             
             
 class Robot(object):
@@ -87,6 +112,13 @@ class Robot(object):
     turns = None
     playing = False
     path = None
+    build_arguments = None
+    grid = None
+    index = None
+    run_batch = None
+    think_times = None
+    module = None
+    clone_world = None
 
     def __init__(self, name, path, run_function, rf_type="function", reset_function=None, max_energy=100, max_life=100):
         self.name = name
@@ -94,6 +126,8 @@ class Robot(object):
         self.reset_function = reset_function
         self.run_function = run_function
         self.rf_type = rf_type
+        if rf_type == "function":
+            self.build_arguments = compile_arguments(run_function)
         self.max_energy = max_energy
         self.max_life = max_life
         
@@ -112,25 +146,25 @@ class Robot(object):
     def move(self, direction):
         if direction == NORTH:
             if self.location[1] < self.size[1]:
-                self.location = (self.location[0], self.location[1] + 1)
+                location = (self.location[0], self.location[1] + 1)
             else:
-                self.location = (self.location[0], self.size[1])
+                location = (self.location[0], self.size[1])
         elif direction == SOUTH:
             if self.location[1] > 1:
-                self.location = (self.location[0], self.location[1] - 1)
+                location = (self.location[0], self.location[1] - 1)
             else:
-                self.location = (self.location[0], 1)
+                location = (self.location[0], 1)
         elif direction == EAST:
             if self.location[0] < self.size[0]:
-                self.location = (self.location[0] + 1, self.location[1])
+                location = (self.location[0] + 1, self.location[1])
             else:
-                self.location = (self.size[0], self.location[1])        
+                location = (self.size[0], self.location[1])
         elif direction == WEST:
             if self.location[0] > 1:
-                self.location = (self.location[0] - 1, self.location[1])
+                location = (self.location[0] - 1, self.location[1])
             else:
-                self.location = (1, self.location[1])
-        logger.debug("%s is facing %s at (%i, %i)" % (self.name, log_direction[self.robot_direction], self.location[0], self.location[1]))
+                location = (1, self.location[1])
+        self.set_location(location)
 
     def forward(self):
         self.move(self.robot_direction)
@@ -138,8 +172,31 @@ class Robot(object):
     def backward(self):
         self.move((self.robot_direction + 2) % 4)
         
+    # Everything about the robot that changes as the game is played
+    def get_state(self):
+        return (self.location, self.robot_direction, self.turret_direction, self.energy, self.life,
+                self.playing, self.enemy_location, self.powerup_location, self.last_command)
+
+    def set_state(self, state):
+        (location, self.robot_direction, self.turret_direction, self.energy, self.life,
+         self.playing, self.enemy_location, self.powerup_location, self.last_command) = state
+        self.set_location(location)
+
+    # A copy of the robot for World.clone, not yet on any board.  The copy
+    # keeps the robot's code but is never asked for a command
+    def clone(self):
+        robot = Robot.__new__(Robot)
+        robot.__dict__.update(self.__dict__)
+        robot.grid = None
+        robot.clone_world = None
+        robot.think_times = None
+        return robot
+
     def set_location(self, location):
+        old_location = self.location
         self.location = location
+        if self.grid is not None:
+            self.grid.move_robot(self, old_location, location)
         
     def update_enemy_location(self, location):
         self.enemy_location = (location[0], location[1], 0)
@@ -147,21 +204,26 @@ class Robot(object):
     def update_powerup_location(self, location):
         self.powerup_location = (location[0], location[1], 0)
         
+    # Returns why the robot has just died, or None if it hasn't
     def check_dead(self):
+        if self.life < 0:
+            self.life = 0
         if not self.playing:
-            return
+            return None
+        cause = None
             
         # If energy is < 0, we're dead
         if self.energy <= 0:
             self.energy = 0
             self.playing = False
-            logger.info("%s has run out of energy" % self.name)
+            cause = "energy"
             
         # If life is < 0, we're dead
         if self.life <= 0:
             self.life = 0
             self.playing = False
-            logger.info("%s has been destroyed" % self.name)
+            cause = "destroyed"
+        return cause
                         
     def cleanup_turn(self):
         if self.enemy_location[2] > -1:
@@ -169,26 +231,271 @@ class Robot(object):
         if self.powerup_location[2] > -1:
             self.powerup_location = (self.powerup_location[0], self.powerup_location[1], self.powerup_location[2] + 1)
         self.energy -= 1
-        self.check_dead()
+        return self.check_dead()
 
         
     def run_turn(self, turn):
-        environ = Environment(turn, self.max_energy, self.max_life,
-                              self.energy, self.life, self.location,
-                              self.enemy_location, self.powerup_location,
-                              self.robot_direction, self.turret_direction)
+        # Only time the robot when something is collecting the times
+        if self.think_times is None:
+            return self.think(turn)
+        start = time.time()
+        try:
+            return self.think(turn)
+        finally:
+            self.think_times.append(time.time() - start)
+
+    def think(self, turn):
         if self.rf_type == "function":
-            command = self.run_function(**environ.to_dict())
+            command = self.run_function(**self.build_arguments(self, turn))
         elif self.rf_type == "class":
+            environ = Environment(turn, self.max_energy, self.max_life,
+                                  self.energy, self.life, self.location,
+                                  self.enemy_location, self.powerup_location,
+                                  self.robot_direction, self.turret_direction, self.clone_world)
             command = self.run_function(environ)
         elif self.rf_type is None:
             command = "w"
         else:
-            logger.error("Unknown run function type (rf_type): %s" % self.rf_type)
+            logger.error("Unknown run function type (rf_type): %s", self.rf_type)
             raise Error("Unknown run function type (rf_type): %s" % self.rf_type)
         return command
+
+    # Release anything the robot holds on to when it's finished with
+    def close(self):
+        pass
             
     
+class Grid(object):
+    """Index of which robots and powerups are in each cell, row and column of
+    the board, kept up to date as robots move, so collision, laser, EMP and
+    sight checks only look at the squares they cover."""
+    size = None
+    cells = None
+    rows = None
+    columns = None
+    powerup_cells = None
+    robot_count = 0
+    powerup_count = 0
+    changed = None
+
+    def __init__(self, size):
+        self.size = size
+        self.cells = {}
+        self.rows = {}
+        self.columns = {}
+        self.powerup_cells = {}
+        self.robot_count = 0
+        self.powerup_count = 0
+        self.changed = None
+
+    def add_robot(self, robot):
+        # Robots are numbered in the order they were added, which is the
+        # order World.robots is checked in
+        robot.index = self.robot_count
+        robot.grid = self
+        self.robot_count += 1
+        if self.changed is not None:
+            self.changed.append(robot.location)
+        self.place(robot, robot.location)
+
+    def place(self, robot, location):
+        self.cells.setdefault(location, set()).add(robot)
+        self.columns.setdefault(location[0], set()).add(robot)
+        self.rows.setdefault(location[1], set()).add(robot)
+
+    def remove(self, robot, location):
+        self.cells[location].discard(robot)
+        self.columns[location[0]].discard(robot)
+        self.rows[location[1]].discard(robot)
+
+    # changed lists every square a robot has been put on, moved into or
+    # moved out of since the planner last looked, and is None unless a
+    # planner is watching
+    def move_robot(self, robot, old_location, new_location):
+        if old_location == new_location:
+            return
+        if self.changed is not None:
+            self.changed.append(old_location)
+            self.changed.append(new_location)
+        self.remove(robot, old_location)
+        self.place(robot, new_location)
+
+    def robots_at(self, location):
+        return self.cells.get(location, ())
+
+    def robots_in_box(self, min_x, max_x, min_y, max_y):
+        robots = []
+        for x in range(max(min_x, 1), min(max_x, self.size[0]) + 1):
+            if not self.columns.get(x):
+                continue
+            for y in range(max(min_y, 1), min(max_y, self.size[1]) + 1):
+                robots.extend(self.cells.get((x, y), ()))
+        return robots
+
+    def robots_in_line(self, location, direction):
+        # Robots strictly beyond location when looking in direction
+        if direction == NORTH:
+            return [r for r in self.columns.get(location[0], ()) if r.location[1] > location[1]]
+        elif direction == SOUTH:
+            return [r for r in self.columns.get(location[0], ()) if r.location[1] < location[1]]
+        elif direction == EAST:
+            return [r for r in self.rows.get(location[1], ()) if r.location[0] > location[0]]
+        else: # direction == WEST
+            return [r for r in self.rows.get(location[1], ()) if r.location[0] < location[0]]
+
+    def add_powerup(self, location):
+        # Remember the newest powerup in each cell, as World.powerups is kept
+        # in the order they were added
+        self.powerup_count += 1
+        self.powerup_cells[location] = self.powerup_count
+
+    def clear_powerups(self):
+        self.powerup_cells = {}
+
+    def remove_powerups(self, location):
+        if location in self.powerup_cells:
+            del self.powerup_cells[location]
+
+    def has_powerup(self, location):
+        return location in self.powerup_cells
+
+    def last_powerup_in_box(self, min_x, max_x, min_y, max_y):
+        found = None
+        newest = 0
+        for x in range(max(min_x, 1), min(max_x, self.size[0]) + 1):
+            for y in range(max(min_y, 1), min(max_y, self.size[1]) + 1):
+                serial = self.powerup_cells.get((x, y), 0)
+                if serial > newest:
+                    newest = serial
+                    found = (x, y)
+        return found
+
+
+class CommandHandler(object):
+    """What a command does.  World looks up the handler for each command a
+    robot sends, and if the robot has more energy than the cost, takes the
+    cost off and calls run().  Robots that can't afford a command are shown
+    as waiting, unless shown_as_wait is False."""
+    name = None
+    cost = 0
+    shown_as_wait = True
+
+    def run(self, world, robot):
+        pass
+
+class ScanEnemies(CommandHandler):
+    name = "se"
+    cost = 9
+
+    # Find the closest robot still playing, the first in the list on a tie
+    def run(self, world, robot):
+        distance = -1
+        location = (-1, -1)
+        for check_robot in world.robots:
+            if check_robot == robot:
+                continue
+            if not check_robot.playing:
+                continue
+            check_distance = abs(robot.location[0] - check_robot.location[0]) + abs(robot.location[1] - check_robot.location[1])
+            if check_distance < distance or distance == -1:
+                distance = check_distance
+                location = check_robot.location
+        if world.events.scan:
+            world.events.emit(Scan(robot, "enemy", location))
+        robot.update_enemy_location(location)
+
+class ScanPowerups(CommandHandler):
+    name = "sp"
+    cost = 9
+
+    def run(self, world, robot):
+        distance = -1
+        location = (-1, -1)
+        for pu in world.powerups:
+            check_distance = abs(robot.location[0] - pu[0]) + abs(robot.location[1] - pu[1])
+            if check_distance < distance or distance == -1:
+                distance = check_distance
+                location = pu
+        if world.events.scan:
+            world.events.emit(Scan(robot, "powerup", location))
+        robot.update_powerup_location(location)
+
+class TurnLeft(CommandHandler):
+    name = "lt"
+    cost = 1
+
+    def run(self, world, robot):
+        robot.robot_direction = (robot.robot_direction - 1) % 4
+        robot.turret_direction = (robot.turret_direction - 1) % 4
+
+class TurnRight(CommandHandler):
+    name = "rt"
+    cost = 1
+
+    def run(self, world, robot):
+        robot.robot_direction = (robot.robot_direction + 1) % 4
+        robot.turret_direction = (robot.turret_direction + 1) % 4
+
+class Forward(CommandHandler):
+    name = "fd"
+    cost = 1
+
+    def run(self, world, robot):
+        robot.forward()
+        if world.is_collision(robot):
+            robot.backward()
+        world.check_goodies(robot)
+        if world.events.move:
+            world.events.emit(Move(robot, robot.location, robot.robot_direction))
+
+class Backward(CommandHandler):
+    name = "bk"
+    cost = 4
+    shown_as_wait = False
+
+    def run(self, world, robot):
+        robot.backward()
+        if world.is_collision(robot):
+            robot.forward()
+        world.check_goodies(robot)
+        if world.events.move:
+            world.events.emit(Move(robot, robot.location, robot.robot_direction))
+
+class Emp(CommandHandler):
+    name = "emp"
+    cost = 4
+
+    def run(self, world, robot):
+        world.emp(robot)
+
+class Laser(CommandHandler):
+    name = "laser"
+    cost = 9
+
+    def run(self, world, robot):
+        world.laser(robot)
+
+class Wait(CommandHandler):
+    name = "w"
+
+# Handlers for each command, copied by every World when it's created
+COMMANDS = {}
+
+def register_command(handler):
+    COMMANDS[handler.name] = handler
+
+for handler in (ScanEnemies(), ScanPowerups(), TurnLeft(), TurnRight(), Forward(), Backward(), Emp(), Laser(), Wait()):
+    register_command(handler)
+
+# What facing a direction comes to for each direction the robot could be
+# facing: nothing if it already is, a right turn if that's a quarter turn to
+# the right, and otherwise a left turn
+FACE_DIRECTIONS = {"north": NORTH, "east": EAST, "south": SOUTH, "west": WEST}
+FACE_TURNS = {}
+for target_name, target in FACE_DIRECTIONS.items():
+    for direction in (NORTH, EAST, SOUTH, WEST):
+        FACE_TURNS[(target_name, direction)] = ("w", "rt", "lt", "lt")[(target - direction) % 4]
+
 class World(object):
     turn = 0
     round = 0
@@ -196,85 +503,241 @@ class World(object):
     powerups = []
     powerup_count = 0
     size = (-1, -1)
-    startfrom_fd = None
-    replay_fd = None
-    save_fd = None
+    startfrom_reader = None
+    replay_reader = None
+    save_writer = None
     game_over = False
+    quiet = False
+    grid = None
+    events = None
+    start_turn = None
+    seed = None
+    random = None
+    profiler = None
+    commands = None
+    planner = None
+    # Whether begin_turn has started a turn that end_turn hasn't finished
+    in_turn = False
+    # Whether main plays the game with check_simulate
+    check_simulate = False
     
-    def __init__(self, size, startfrom_file, replay_file, save_file, robots, powerups = 1):
+    # If no seed is given, one is picked with the random module, so seeding
+    # that still makes games repeatable
+    def __init__(self, size, startfrom_file, replay_file, save_file, robots, powerups = 1, seed = None):
         self.size = size
         self.powerup_count = powerups
+        if seed is None:
+            seed = random.randint(0, MAX_SEED)
+        self.set_seed(seed)
+        self.events = EventBus()
+        self.commands = dict(COMMANDS)
         self.robots = []
+        self.grid = Grid(size)
         for i in range(0, len(robots)):
-            self.robots.append(robots[i])
+            self.add_robot(robots[i])
         if save_file is not None:
             try:
-                self.save_fd = open(save_file, 'w')
+                self.save_writer = open_writer(save_file, DEFAULT_SIZE)
             except:
                 print "ERROR: Unable to open %s for writing" % save_file
                 sys.exit(1)
         if replay_file is not None:
             try:
-                self.replay_fd = open(replay_file, 'r')
+                self.replay_reader = open_reader(replay_file)
             except:
-                print "ERROR: Unable to open %s for reading.  Does it exist?" % startfrom_file
+                print "ERROR: Unable to open %s for reading.  Does it exist?" % replay_file
                 sys.exit(1)
             if startfrom_file is not None:
                 logger.warning("Unable to both replay and set a starting point, so ignoring starting point file")
                 startfrom_file = None
         if startfrom_file is not None:
             try:
-                self.startfrom_fd = open(startfrom_file, 'r')
+                self.startfrom_reader = open_reader(startfrom_file)
             except:
                 print "ERROR: Unable to open %s for reading.  Does it exist?" % startfrom_file
                 sys.exit(1)
     
+    def add_robot(self, robot):
+        self.robots.append(robot)
+        self.grid.add_robot(robot)
+        robot.clone_world = self.clone
+
+    def add_powerup(self, location):
+        self.powerups.append(location)
+        self.grid.add_powerup(location)
+
+    def clear_powerups(self):
+        self.powerups = []
+        self.grid.clear_powerups()
+
+    def set_size(self, size):
+        self.size = size
+        self.grid.size = size
+
+    def set_seed(self, seed):
+        self.seed = seed
+        self.random = random.Random(seed)
+
     def get_random_location(self):
-        return (random.randint(1, self.size[0]), random.randint(1, self.size[1]))
+        return (self.random.randint(1, self.size[0]), self.random.randint(1, self.size[1]))
     
+    # Everything needed to carry on the game from the current turn
+    def get_state(self):
+        return (list(self.powerups), [robot.get_state() for robot in self.robots])
+
+    def set_state(self, state):
+        powerups, robots = state
+        self.clear_powerups()
+        for powerup in powerups:
+            self.add_powerup(powerup)
+        for robot, robot_state in zip(self.robots, robots):
+            robot.set_state(robot_state)
+
+    # A copy of the game as it stands, for trying out commands on with
+    # simulate().  The copy has its own robots and board, but no save file,
+    # replay or event subscribers, and never prints, so it's cheap to make
+    # and to throw away
+    def clone(self):
+        world = World.__new__(World)
+        world.__dict__.update(self.__dict__)
+        world.events = EventBus()
+        world.save_writer = None
+        world.replay_reader = None
+        world.startfrom_reader = None
+        world.profiler = None
+        world.random = None
+        world.quiet = True
+        world.powerups = list(self.powerups)
+        world.robots = []
+        world.grid = Grid(self.size)
+        for robot in self.robots:
+            world.add_robot(robot.clone())
+        for powerup in self.powerups:
+            world.grid.add_powerup(powerup)
+        if self.planner is not None:
+            world.planner = GotoPlanner(world.grid)
+        return world
+
+    # Play commands as the next turns, one command for each turn in the
+    # order robots take their turns, with every rule applied just as when
+    # robots send them.  A clone made during a robot's turn, as when a robot
+    # clones the game it's playing, starts with that robot's turn.  Dead
+    # robots' turns still use up a command.  Meant for clones, as the robots
+    # are never asked for a command
+    def simulate(self, commands):
+        for command in commands:
+            if self.game_over:
+                break
+            if self.in_turn:
+                robot = self.robots[self.turn % len(self.robots)]
+            else:
+                robot = self.begin_turn()
+            if robot.playing:
+                self.play_command(robot, command)
+            self.end_turn(robot)
+
+    # Jump to the end of turn in a binary replay by restoring the last
+    # keyframe before it and only playing the turns after the keyframe
+    def seek(self, turn):
+        if self.replay_reader is None or not hasattr(self.replay_reader, "seek_keyframe"):
+            raise ReplayError("Only binary replays can be seeked")
+        keyframe_turn, state = self.replay_reader.seek_keyframe(turn + 1)
+        self.set_state(state)
+        self.turn = keyframe_turn - 1
+        self.round = ((self.turn - 1) / len(self.robots)) + 1
+        # The last keyframe is the state the game ended in
+        self.game_over = len([robot for robot in self.robots if robot.playing]) < 2
+        while self.turn < turn and not self.game_over:
+            self.next_turn()
+
     def next_turn(self):
+        robot = self.begin_turn()
+        if robot.playing:
+            if self.replay_reader is not None:
+                if not self.replay_turn(robot):
+                    return robot
+            else:
+                try:
+                    command = robot.run_turn(self.round)
+                except:
+                    self.crash(robot)
+                else:
+                    self.play_command(robot, command)
+        self.end_turn(robot)
+        return robot
+
+    # Start the next turn, up to the point the robot whose turn it is has to
+    # send a command, and return that robot
+    def begin_turn(self):
+        self.in_turn = True
         self.turn += 1
+        if self.save_writer is not None and self.turn % KEYFRAME_INTERVAL == 1:
+            self.save_writer.keyframe(self.turn, self.get_state())
         self.round = ((self.turn - 1) / len(self.robots)) + 1
-        logger.info("Starting turn %i, round %i" % (self.turn, self.round))
         robot = self.robots[self.turn % len(self.robots)]
- 
+        if self.events.turn_start:
+            self.events.emit(TurnStart(self.turn, self.round, robot))
         if robot.playing:
-            logger.info("It's %s's turn" % robot.name)
             self.check_nearby_enemies(robot)
             self.check_nearby_powerups(robot)
-            exit = False
-            try:
-                if self.replay_fd is None:
-                    command = robot.run_turn(self.round)
+        return robot
+
+    # Play the robot's command, which can be a list or tuple of the command
+    # and its arguments
+    def play_command(self, robot, command):
+        try:
+            if (type(command) == types.ListType or type(command) == types.TupleType):
+                if len(command) > 1:
+                    self.check_command(robot, command[0], command[1:])
                 else:
-                    command = self.read_command()
-                    if command.startswith('cr '):
-                        dead_robot_name = command[3:]
-                        logger.error("%s has crashed and is now dead!" % dead_robot_name)
-                        for r in self.robots:
-                            if r.name == dead_robot_name:
-                                r.playing = False
-                        exit = True
-                    if command is None:
-                        logger.info("Replay finished")
-                        self.game_over = True
-                        return robot
-                if not exit:
-                    if (type(command) == types.ListType or type(command) == types.TupleType):
-                        if len(command) > 1:
-                            self.check_command(robot, command[0], command[1:])
-                        else:
-                            self.check_command(robot, command[0], ())
-                    else:
-                        self.check_command(robot, command, ())
-            except:
-                self.write('cr %s\n' % robot.name)
-                logger.exception("%s has crashed and is now dead!" % robot.name)
-                robot.playing = False
+                    self.check_command(robot, command[0], ())
+            else:
+                self.check_command(robot, command, ())
+        except:
+            self.crash(robot)
+
+    # Take the robot out of the game, from inside the except clause for
+    # whatever it did wrong
+    def crash(self, robot):
+        self.write_crash(robot)
+        logger.exception("%s has crashed and is now dead!", robot.name)
+        robot.playing = False
+        if self.events.death:
+            self.events.emit(Death(robot, "crashed"))
 
-        robot.cleanup_turn()
-        if not robot.playing:
-             logger.info("%s has died" % robot.name)
+    # Play the robot's turn from the replay, returning False once the replay
+    # has finished
+    def replay_turn(self, robot):
+        try:
+            command = self.read_command()
+            if command is None:
+                logger.info("Replay finished")
+                self.game_over = True
+                self.close_save()
+                return False
+            if command.startswith('cr '):
+                dead_robot_name = command[3:]
+                logger.error("%s has crashed and is now dead!", dead_robot_name)
+                for r in self.robots:
+                    if r.name == dead_robot_name:
+                        r.playing = False
+                        self.write_crash(r)
+                        if self.events.death:
+                            self.events.emit(Death(r, "crashed"))
+                return True
+        except:
+            self.crash(robot)
+            return True
+        self.play_command(robot, command)
+        return True
+
+    # Finish the turn once the robot has played, and check for the end of
+    # the game
+    def end_turn(self, robot):
+        self.in_turn = False
+        cause = robot.cleanup_turn()
+        if cause is not None and self.events.death:
+            self.events.emit(Death(robot, cause))
         
         cr = robot
         
@@ -283,233 +746,264 @@ class World(object):
         for robot in self.robots:
             if not robot.playing:
                 continue
-            logger.debug("%s has %i life points and %i energy" % (robot.name, robot.life, robot.energy))
             alive += 1
-            alive_name = robot.name
-            alive_path = robot.path
+            alive_robot = robot
+        if self.events.turn_end:
+            self.events.emit(TurnEnd(self.turn, cr, self.robots))
         
         # Return false if game is over
         if alive < 2:
-            if alive == 0:
+            self.game_over = True
+            self.close_save()
+            if self.events.game_over:
+                self.events.emit(GameOver(self.turn, alive_robot if alive == 1 else None))
+            if self.quiet:
+                pass
+            elif alive == 0:
                 print "All robots are now dead"
                 print "Game over"
+            elif alive_robot.path is None:
+                print "%s has defeated all other robots!" % alive_robot.name
             else:
-                if alive_path is None:
-                    print "%s has defeated all other robots!" % alive_name
-                else:
-                    print "%s (%s) has defeated all other robots!" % (alive_name, alive_path)
-            self.game_over = True
-        
-        return cr
+                print "%s (%s) has defeated all other robots!" % (alive_robot.name, alive_robot.path)
         
+    # Pick where the powerups and robots start, keeping robots off each other
+    # while there's room
+    def random_layout(self, robot_count):
+        powerups = []
+        for pu in range(0, self.powerup_count):
+            powerups.append(self.get_random_location())
+        locations = []
+        placed = set()
+        for i in range(0, robot_count):
+            location = self.get_random_location()
+            while location in placed and len(placed) < self.size[0] * self.size[1]:
+                location = self.get_random_location()
+            placed.add(location)
+            locations.append(location)
+        return powerups, locations
+
     def load_new(self):
+        powerups, locations = self.random_layout(len(self.robots))
+
         # Initialize powerups
-        self.powerups = []
-        for pu in range(0, self.powerup_count):
-            self.powerups.append(self.get_random_location())
-            self.write("%i %i\n" % (self.powerups[-1][0], self.powerups[-1][1]))
-        self.write("endpu\n")
+        self.clear_powerups()
+        for powerup in powerups:
+            self.add_powerup(powerup)
             
         # Initialize robots
-        for robot in self.robots:
+        for robot, location in zip(self.robots, locations):
             robot.reset(self.size)
-            logger.info("Resetting %s" % robot.name)
-            robot.set_location(self.get_random_location())
-            self.write("%s\n" % (robot.name))
-            self.write("%i %i\n" % (robot.location[0], robot.location[1]))
-            logger.debug("Putting %s at (%i, %i)" % (robot.name, robot.location[0], robot.location[1]))
-        self.write("endrb\n")
+            logger.info("Resetting %s", robot.name)
+            robot.set_location(location)
+            logger.debug("Putting %s at (%i, %i)", robot.name, robot.location[0], robot.location[1])
+        self.write_header()
         return True
     
     def load(self):
-        if self.replay_fd is not None:
-            read_fd = self.replay_fd
-        elif self.startfrom_fd is not None:
-            read_fd = self.startfrom_fd
+        if self.replay_reader is not None:
+            reader = self.replay_reader
+        elif self.startfrom_reader is not None:
+            reader = self.startfrom_reader
         else:
             return self.load_new()
+
+        try:
+            size, powerups, robots, seed, paths, moves = reader.read_header()
+        except ReplayError, e:
+            logger.error("%s", e)
+            sys.exit(1)
         
-        self.powerups = []
-        data = read_fd.readline()[:-1]
-        while data != "endpu":
-            try:
-                data = data.split(" ", 1)
-                self.powerups.append((int(data[0]), int(data[1])))
-            except:
-                logger.error("Error loading powerups from savegame")
-                sys.exit(1)
-            self.write("%i %i\n" % (self.powerups[-1][0], self.powerups[-1][1]))
-            data = read_fd.readline()[:-1]
-        self.write("endpu\n")
+        if size is not None:
+            self.set_size(size)
+        if seed is not None:
+            self.set_seed(seed)
+        self.clear_powerups()
+        for powerup in powerups:
+            self.add_powerup(powerup)
         
-        if self.replay_fd is not None:
-            data = read_fd.readline()[:-1]
-            step = 0
-            name = None
-            robot = None
-            while data != "endrb":
-                if step == 0:
-                    try:
-                        name = data.strip()
-                    except:
-                        logger.error("Error loading robot name from savegame")
-                        sys.exit(1)
-                    robot = Robot(name, None, None, None, None)
-                    self.robots.append(robot)
-                    self.write("%s\n" % (name))
-                else:
-                    try:
-                        data = data.split(" ", 1)
-                        robot.set_location((int(data[0]), int(data[1])))
-                    except:
-                        logger.error("Error loading powerups from savegame")
-                        sys.exit(1)
-                    logger.info("Resetting %s" % robot.name)
-                    robot.reset(self.size)
-                    self.write("%i %i\n" % (robot.location[0], robot.location[1]))
-                    logger.debug("Placing %s at (%i, %i)" % (robot.name, robot.location[0], robot.location[1]))
-                data = read_fd.readline()[:-1]
-                step = (step + 1) % 2
-            self.write("endrb\n")
-        else:
-            for robot in self.robots:
+        if self.replay_reader is not None:
+            for i in range(0, len(robots)):
+                name, location = robots[i]
+                path = None
+                if paths is not None:
+                    path = paths[i]
+                robot = Robot(name, path, None, None, None)
+                self.add_robot(robot)
+                robot.set_location(location)
+                logger.info("Resetting %s", robot.name)
                 robot.reset(self.size)
-                logger.info("Resetting %s" % robot.name)
-                data = read_fd.readline()[:-1] # Throw away robot name
-                data = read_fd.readline()[:-1]
-                if data == "endrb":
-                    logger.error("Missing robot information in savegame")
-                    sys.exit(1)
-                try:
-                    data = data.split(" ", 1)
-                    robot.set_location((int(data[0]), int(data[1])))
-                except:
-                    logger.error("Error loading robot from savegame")
-                    sys.exit(1)
-                self.write("%s\n" % (robot.name))
-                self.write("%i %i\n" % (robot.location[0], robot.location[1]))
-                logger.debug("Placing %s at (%i, %i)" % (robot.name, robot.location[0], robot.location[1]))
-                
-            data = read_fd.readline()[:-1]
-            if data != "endrb":
+                logger.debug("Placing %s at (%i, %i)", robot.name, robot.location[0], robot.location[1])
+        else:
+            if len(robots) < len(self.robots):
+                logger.error("Missing robot information in savegame")
+                sys.exit(1)
+            if len(robots) > len(self.robots):
                 logger.error("Missing robot end code")
                 sys.exit(1)
-            self.write("endrb\n")            
+            for robot, (name, location) in zip(self.robots, robots):
+                robot.reset(self.size)
+                logger.info("Resetting %s", robot.name)
+                robot.set_location(location)
+                logger.debug("Placing %s at (%i, %i)", robot.name, robot.location[0], robot.location[1])
+        self.write_header()
         return True
             
     def read_command(self):
-        if self.replay_fd is not None:
-            read_fd = self.replay_fd
-        elif self.startfrom_fd is not None:
-            read_fd = self.startfrom_fd
+        if self.replay_reader is not None:
+            reader = self.replay_reader
+        elif self.startfrom_reader is not None:
+            reader = self.startfrom_reader
 
-        data = read_fd.readline()
-        if data == "":
-            return None
-            
-        data = data[:-1]
         try:
-            command = data.strip()
-        except:
-            logger.error("Error reading command from savegame")
+            return reader.read_command()
+        except ReplayError, e:
+            logger.error("%s", e)
             sys.exit(1)
-        return command
-        
 
-    def write(self, data):
-        if self.save_fd is not None:
-            self.save_fd.write(data)
+    def write_header(self):
+        if self.save_writer is not None:
+            self.save_writer.header(self.size, self.powerups, [(robot.name, robot.location) for robot in self.robots],
+                                    self.seed, [robot.path for robot in self.robots])
+
+    def write_command(self, command):
+        if self.save_writer is not None:
+            self.save_writer.command(self.turn, command)
+
+    def write_move(self, robot):
+        if self.save_writer is not None:
+            self.save_writer.move(self.turn, robot.location)
+
+    def write_hit(self, target):
+        if self.save_writer is not None:
+            self.save_writer.hit(self.turn, target.index)
+
+    def write_crash(self, robot):
+        if self.save_writer is not None:
+            self.save_writer.crash(self.turn, robot.name)
+
+    # Finish writing the saved game, ending with the state the game finished
+    # in so the save can be read without playing it through
+    def close_save(self):
+        if self.save_writer is not None:
+            self.save_writer.keyframe(self.turn + 1, self.get_state())
+            self.save_writer.close()
+        self.save_writer = None
+
+    # Finish writing the saved game and close any open files
+    def close(self):
+        self.close_save()
+        for f in (self.replay_reader, self.startfrom_reader):
+            if f is not None:
+                f.close()
+        self.replay_reader = None
+        self.startfrom_reader = None
+        for robot in self.robots:
+            robot.close()
             
     def start(self):            
         self.load()
         
         # Start running rounds
         self.turn = 0
+        self.in_turn = False
+        if self.start_turn is not None:
+            try:
+                self.seek(self.start_turn)
+            except ReplayError, e:
+                logger.error("%s", e)
+                return False
         return True
 
     # Check for collisions
     def is_collision(self, robot):
-        for check_robot in self.robots:
+        for check_robot in self.grid.robots_at(robot.location):
             if robot == check_robot:
                 continue
-            if robot.location == check_robot.location:
-                logger.info("%s has run into %s" % (robot.name, check_robot.name))
-                return True
+            if self.events.collision:
+                self.events.emit(Collision(robot, check_robot))
+            return True
         return False
-        
+
+    # Area the robot can see, which reaches further in front of the turret
+    def sight_box(self, robot):
+        return (robot.location[0] - (1 + ((robot.turret_direction == WEST) * 3)),
+                robot.location[0] + (1 + ((robot.turret_direction == EAST) * 3)),
+                robot.location[1] - (1 + ((robot.turret_direction == SOUTH) * 3)),
+                robot.location[1] + (1 + ((robot.turret_direction == NORTH) * 3)))
+
     def check_nearby_enemies(self, robot):
-        if robot.enemy_location[0] >= robot.location[0] - (1 + ((robot.turret_direction == WEST) * 3)) and \
-           robot.enemy_location[0] <= robot.location[0] + (1 + ((robot.turret_direction == EAST) * 3)) and \
-           robot.enemy_location[1] >= robot.location[1] - (1 + ((robot.turret_direction == SOUTH) * 3)) and \
-           robot.enemy_location[1] <= robot.location[1] + (1 + ((robot.turret_direction == NORTH) * 3)):
+        min_x, max_x, min_y, max_y = self.sight_box(robot)
+        if robot.enemy_location[0] >= min_x and robot.enemy_location[0] <= max_x and \
+           robot.enemy_location[1] >= min_y and robot.enemy_location[1] <= max_y:
             robot.enemy_location = (-1, -1, -1)
-        for check_robot in self.robots:
+
+        # If several robots are in sight, the last one in the list is seen
+        seen = None
+        for check_robot in self.grid.robots_in_box(min_x, max_x, min_y, max_y):
             if robot == check_robot:
                 continue
-            if check_robot.location[0] >= robot.location[0] - (1 + ((robot.turret_direction == WEST) * 3)) and \
-               check_robot.location[0] <= robot.location[0] + (1 + ((robot.turret_direction == EAST) * 3)) and \
-               check_robot.location[1] >= robot.location[1] - (1 + ((robot.turret_direction == SOUTH) * 3)) and \
-               check_robot.location[1] <= robot.location[1] + (1 + ((robot.turret_direction == NORTH) * 3)):
-                robot.update_enemy_location(check_robot.location)
+            if seen is None or check_robot.index > seen.index:
+                seen = check_robot
+        if seen is not None:
+            robot.update_enemy_location(seen.location)
 
     def check_nearby_powerups(self, robot):
-        if robot.powerup_location[0] >= robot.location[0] - (1 + ((robot.turret_direction == WEST) * 3)) and \
-           robot.powerup_location[0] <= robot.location[0] + (1 + ((robot.turret_direction == EAST) * 3)) and \
-           robot.powerup_location[1] >= robot.location[1] - (1 + ((robot.turret_direction == SOUTH) * 3)) and \
-           robot.powerup_location[1] <= robot.location[1] + (1 + ((robot.turret_direction == NORTH) * 3)):
+        min_x, max_x, min_y, max_y = self.sight_box(robot)
+        if robot.powerup_location[0] >= min_x and robot.powerup_location[0] <= max_x and \
+           robot.powerup_location[1] >= min_y and robot.powerup_location[1] <= max_y:
             robot.powerup_location = (-1, -1, -1)
 
-        for pu in self.powerups:
-            if pu[0] >= robot.location[0] - (1 + ((robot.turret_direction == WEST) * 3)) and \
-               pu[0] <= robot.location[0] + (1 + ((robot.turret_direction == EAST) * 3)) and \
-               pu[1] >= robot.location[1] - (1 + ((robot.turret_direction == SOUTH) * 3)) and \
-               pu[1] <= robot.location[1] + (1 + ((robot.turret_direction == NORTH) * 3)):
-                robot.update_powerup_location(pu)
+        location = self.grid.last_powerup_in_box(min_x, max_x, min_y, max_y)
+        if location is not None:
+            robot.update_powerup_location(location)
+
+    # First robot in the list out of those that have been hit.  Dead robots
+    # stay where they died but can't be hit
+    def first_hit(self, robot, check_robots):
+        hit = None
+        for check_robot in check_robots:
+            if robot == check_robot or not check_robot.playing:
+                continue
+            if hit is None or check_robot.index < hit.index:
+                hit = check_robot
+        return hit
+
+    def hit(self, robot, check_robot, weapon, damage):
+        self.write_hit(check_robot)
+        if self.events.hit:
+            self.events.emit(Hit(robot, check_robot, weapon, damage))
+        cause = check_robot.check_dead()
+        if cause is not None and self.events.death:
+            self.events.emit(Death(check_robot, cause, robot))
 
     # Send out EMP (range 2)
     def emp(self, robot):
-        for check_robot in self.robots:
-            if robot == check_robot:
-                continue
-            if check_robot.location[0] >= robot.location[0]-2 and \
-               check_robot.location[0] <= robot.location[0]+2 and \
-               check_robot.location[1] >= robot.location[1]-2 and \
-               check_robot.location[1] <= robot.location[1]+2:
-                check_robot.life -= 30
-                logger.info("%s hit %s with an EMP" % (robot.name, check_robot.name))
-                check_robot.check_dead()
-                return True
-        return False
+        check_robot = self.first_hit(robot, self.grid.robots_in_box(robot.location[0]-2, robot.location[0]+2,
+                                                                    robot.location[1]-2, robot.location[1]+2))
+        if check_robot is None:
+            return False
+        check_robot.life -= 30
+        self.hit(robot, check_robot, "emp", 30)
+        return True
         
     # Fire laser
     def laser(self, robot):
-        for check_robot in self.robots:
-            if robot == check_robot:
-                continue
-            if (robot.turret_direction == NORTH and \
-                    check_robot.location[0] == robot.location[0] and \
-                    check_robot.location[1] > robot.location[1]) or \
-               (robot.turret_direction == SOUTH and \
-                    check_robot.location[0] == robot.location[0] and \
-                    check_robot.location[1] < robot.location[1]) or \
-               (robot.turret_direction == EAST and \
-                    check_robot.location[0] > robot.location[0] and \
-                    check_robot.location[1] == robot.location[1]) or \
-               (robot.turret_direction == WEST and \
-                    check_robot.location[0] < robot.location[0] and \
-                    check_robot.location[1] == robot.location[1]):
-                check_robot.life -= 90
-                logger.info("%s hit %s with a laser" % (robot.name, check_robot.name))
-                check_robot.check_dead()
-                return True
-        return False
+        check_robot = self.first_hit(robot, self.grid.robots_in_line(robot.location, robot.turret_direction))
+        if check_robot is None:
+            return False
+        check_robot.life -= 90
+        self.hit(robot, check_robot, "laser", 90)
+        return True
         
     # Check and claim any powerups
     def check_goodies(self, robot):
-        for i in range(0, len(self.powerups)):
-            if robot.location == self.powerups[i]:
-                robot.energy = 100
-                del self.powerups[i]
+        if self.grid.has_powerup(robot.location):
+            robot.energy = 100
+            if self.events.pickup:
+                self.events.emit(Pickup(robot, robot.location))
+            self.powerups = [pu for pu in self.powerups if pu != robot.location]
+            self.grid.remove_powerups(robot.location)
 
     def goto_command(self, robot, argument):
         x = argument[0]
@@ -518,15 +1012,23 @@ class World(object):
             x = int(x)
             y = int(y)
         except:
-            logger.warn("goto %s, %s: coordinates aren't integers" % (argument[0], argument[1]))
+            self.wasted(robot, "goto", "bad coordinates", "goto %s, %s: coordinates aren't integers", argument[0], argument[1])
             return "w", ()
         if x < 1 or x > self.size[0] or y < 1 or y > self.size[1]:
-            logger.warn("goto %i, %i: coordinates aren't within range (1, 1) - (%i, %i)" % (x, y, self.size[0], self.size[1]))
+            self.wasted(robot, "goto", "off the board", "goto %i, %i: coordinates aren't within range (1, 1) - (%i, %i)",
+                        x, y, self.size[0], self.size[1])
             return "w", ()
 
         if x == robot.location[0] and y == robot.location[1]:
-            logger.warn("goto %i, %i: robot is already at requested coordinates" % (x, y))
+            self.wasted(robot, "goto", "already there", "goto %i, %i: robot is already at requested coordinates", x, y)
             return "w", ()
+
+        # Steer around other robots if planning, unless there's no way past.
+        # The planner's choice is passed on as the argument to "planner"
+        if self.planner is not None:
+            command = self.planner.next_command(robot, (x, y))
+            if command is not None:
+                return "planner", (command,)
             
         delta_x = 0
         delta_y = 0
@@ -596,213 +1098,191 @@ class World(object):
             return "face", ("west",)
 
  
+    # kind is a short description of the reason that's the same every time
+    def wasted(self, robot, command, kind, reason, *args):
+        if self.events.wasted:
+            self.events.emit(Wasted(robot, command, reason % args, kind))
+
+    def face_command(self, robot, argument):
+        if len(argument) == 0:
+            self.wasted(robot, "face", "bad direction", "face: Robot did not specify a direction to face")
+            return "w"
+        try:
+            return FACE_TURNS[(argument[0], robot.robot_direction)]
+        except (KeyError, TypeError):
+            pass
+        try:
+            self.wasted(robot, "face", "bad direction", "face: Unable to face unrecognized direction %s", argument[0])
+        except:
+            self.wasted(robot, "face", "bad direction", "face: Direction must be a string")
+        return "w"
+
     def check_command(self, robot, command, argument):
-        # Go to location
+        requested = command
+
+        # Work out what goto and face come to, and the steps taken to get there
+        route = []
         if command == "goto":
+            route.append(command)
             command, argument = self.goto_command(robot, argument)
-    
-        # Face north
-        if command == "face" and len(argument) > 0 and argument[0] == "north":
-            if robot.robot_direction == 1 or robot.robot_direction == 2:
-                command = "lt"
-            elif robot.robot_direction == 3:
-                command = "rt"
-            else:
-                command = "w"
-
-        # Face south
-        elif command == "face" and len(argument) > 0 and argument[0] == "south":
-            if robot.robot_direction == 0 or robot.robot_direction == 3:
-                command = "lt"
-            elif robot.robot_direction == 1:
-                command = "rt"
-            else:
-                command = "w"
-
-        # Face east
-        elif command == "face" and len(argument) > 0 and argument[0] == "east":
-            if robot.robot_direction == 2 or robot.robot_direction == 3:
-                command = "lt"
-            elif robot.robot_direction == 0:
-                command = "rt"
-            else:
-                command = "w"
-
-        # Face west
-        elif command == "face" and len(argument) > 0 and argument[0] == "west":
-            if robot.robot_direction == 0 or robot.robot_direction == 1:
-                command = "lt"
-            elif robot.robot_direction == 2:
-                command = "rt"
-            else:
-                command = "w"
-                
-        # Face unknown direction
-        elif command == "face":
-            if len(argument) > 0:
-                try:
-                    logger.warn("face: Unable to face unrecognized direction %s" % argument[0])
-                except:
-                    logger.warn("face: Direction must be a string")
-            else:
-                logger.warn("face: Robot did not specify a direction to face")
-            command = "w"
+            if command == "planner":
+                route.append(command)
+                command = argument[0]
+        if command == "face":
+            route.append(command)
+            command = self.face_command(robot, argument)
 
         robot.last_command = command
-        self.write("%s\n" % command)
-        
-        # Robot is scanning for enemy
-        if command == 'se':
-            cost = 9
-            
-            logger.info("%s is scanning for closest enemy" % robot.name)
-            if robot.energy > cost:
-                robot.energy -= cost
-                distance = -1
-                location = (-1, -1)
-                for check_robot in self.robots:
-                    if check_robot == robot:
-                        continue
-                    if not check_robot.playing:
-                        continue
-                    check_distance = abs(robot.location[0] - check_robot.location[0]) + abs(robot.location[1] - check_robot.location[1])
-                    logger.debug("%s is %i squares away" % (check_robot.name, check_distance))
-                    if check_distance < distance or distance == -1:
-                        distance = check_distance
-                        location = check_robot.location
-                logger.info("Closest enemy is at %i, %i" % (location[0], location[1]))
-                robot.update_enemy_location(location)
-            else:
-                robot.last_command = "w"
-                logger.warning("%s doesn't have enough energy" % robot.name)
-                
-        # Robot is scanning for powerups
-        elif command == 'sp':
-            cost = 9
-            
-            logger.info("%s is scanning for closest powerup" % robot.name)
-            if robot.energy > cost:
-                robot.energy -= cost
-                distance = -1
-                location = (-1, -1)
-                for pu in self.powerups:
-                    check_distance = abs(robot.location[0] - pu[0]) + abs(robot.location[1] - pu[1])
-                    logger.debug("Powerup is %i squares away" % check_distance)
-                    if check_distance < distance or distance == -1:
-                        distance = check_distance
-                        location = pu
-                logger.info("Closest powerup is at %i, %i" % (location[0], location[1]))
-                robot.update_powerup_location(location)
-            else:
-                robot.last_command = "w"
-                logger.warning("%s doesn't have enough energy" % robot.name)
+        self.write_command(command)
+        location = robot.location
 
-        # Turn left
-        elif command == "lt":
-            cost = 1
-            
-            logger.info("%s is turning left" % robot.name)
-            if robot.energy > cost:
-                robot.energy -= cost
-                robot.robot_direction = (robot.robot_direction - 1) % 4
-                robot.turret_direction = (robot.turret_direction - 1) % 4
-                logger.debug("%s is now facing %s" % (robot.name, log_direction[robot.robot_direction]))
-            else:
-                robot.last_command = "w"
-                logger.warning("%s doesn't have enough energy" % robot.name)
+        try:
+            handler = self.commands.get(command)
+        except TypeError:
+            handler = None
+        if handler is None:
+            self.wasted(robot, command, "unknown command", "sent unknown command '%s'", command)
+            return
 
-        # Turn right
-        elif command == "rt":
-            cost = 1
-            
-            logger.info("%s is turning right" % robot.name)
-            if robot.energy > cost:
-                robot.energy -= cost
-                robot.robot_direction = (robot.robot_direction + 1) % 4
-                robot.turret_direction = (robot.turret_direction + 1) % 4
-                logger.debug("%s is now facing %i (%s)" % (robot.name, robot.robot_direction, log_direction[robot.robot_direction]))
-            else:
+        if self.events.command:
+            self.events.emit(Command(robot, requested, command, handler.cost, route))
+        if handler.cost == 0:
+            handler.run(self, robot)
+        elif robot.energy > handler.cost:
+            robot.energy -= handler.cost
+            handler.run(self, robot)
+        else:
+            if handler.shown_as_wait:
                 robot.last_command = "w"
-                logger.warning("%s doesn't have enough energy" % robot.name)
+            self.wasted(robot, command, "no energy", "doesn't have enough energy")
+        if robot.location != location:
+            self.write_move(robot)
 
-        # Go forward
-        elif command == "fd":
-            cost = 1
-            
-            logger.info("%s moving forward" % robot.name)
-            if robot.energy > cost:
-                robot.energy -= cost
-                robot.forward()
-                if self.is_collision(robot):
-                    robot.backward()
-                self.check_goodies(robot)
-                logger.debug("%s is now at (%i, %i)" % (robot.name, robot.location[0], robot.location[1]))
-            else:
-                robot.last_command = "w"
-                logger.warning("%s doesn't have enough energy" % robot.name)
+def usage():
+    print "Usage: %s [ --startfrom=savegame ] [ --replay=savegame ] [ --save=savegame ] [ --seek=turn ] [ --seed=N ] [ --size=WIDTHxHEIGHT ] [ --robots=N ] [ --powerups=N ] [ --sandbox ] [ --timeout=seconds ] [ --timeout-action=wait|crash ] [ --profile ] [ --check-simulate ] [ --goto=direct|planned ] [ --listen=tcp:host:port|unix:path ] <first_robot.py> <second_robot.py> .." % sys.argv[0]
 
-        # Go backward
-        elif command == "bk":
-            cost = 4
-            
-            logger.info("%s moving backward" % robot.name)
-            if robot.energy > cost:
-                robot.energy -= cost
-                robot.backward()
-                if self.is_collision(robot):
-                    robot.forward()
-                self.check_goodies(robot)
-                logger.debug("%s is now at (%i, %i)" % (robot.name, robot.location[0], robot.location[1]))
-            else:
-                logger.warning("%s doesn't have enough energy" % robot.name)
- 
-        # Fire EMP
-        elif command == "emp":
-            cost = 4
-            
-            logger.info("%s fired EMP" % robot.name)
-            if robot.energy > cost:
-                robot.energy -= cost
-                self.emp(robot)
-            else:
-                robot.last_command = "w"
-                logger.warning("%s doesn't have enough energy" % robot.name)
-                
-        # Fire laser
-        elif command == "laser":
-            cost = 9
-            
-            logger.info("%s fired a laser" % robot.name)
-            if robot.energy > cost:
-                robot.energy -= cost
-                self.laser(robot)
-            else:
-                robot.last_command = "w"
-                logger.warning("%s doesn't have enough energy" % robot.name)
-        
-        # Wait out turn
-        elif command == "w":
-            logger.info("%s is waiting out this turn" % robot.name)
-               
+# Compiled code and file name of each robot module loaded so far, with None
+# for the code of robots only found as bytecode
+robot_code = {}
+# Number of copies of robot modules loaded from bytecode
+robot_copies = 0
+
+def load_robot_module(robimpstr):
+    # Run the robot's module code in a new module object, so each robot
+    # starts with its own copy of any state the module keeps, without
+    # importing it again.  Only the robot's own module is copied: modules
+    # it imports are shared between robots as usual.  Modules that aren't
+    # Python source or bytecode can only be shared
+    global robot_copies
+    if robimpstr not in robot_code:
+        robimp = importlib.import_module(robimpstr)
+        filename = getattr(robimp, "__file__", "")
+        if filename.endswith(".pyc") and os.path.exists(filename[:-1]):
+            filename = filename[:-1]
+        if filename.endswith(".py"):
+            code = compile(open(filename, "rU").read(), filename, "exec")
+        elif filename.endswith(".pyc"):
+            code = None
         else:
-            logger.warning("%s sent unknown command '%s'" % (robot.name, command))
+            return robimp
+        robot_code[robimpstr] = (code, filename)
+    code, filename = robot_code[robimpstr]
+    if code is None:
+        # Bytecode is left to imp, which knows the header it starts with, and
+        # is loaded under a name of its own so it's a new module each time
+        robot_copies += 1
+        name = "%s (copy %i)" % (robimpstr, robot_copies)
+        robimp = imp.load_compiled(name, filename)
+        del sys.modules[name]
+        robimp.__name__ = robimpstr
+        return robimp
+    robimp = types.ModuleType(robimpstr)
+    robimp.__file__ = filename
+    exec code in robimp.__dict__
+    return robimp
+
+def robot_path(robot_file):
+    # What a robot loaded from robot_file is known as in saves and ratings:
+    # the file's name without the directory or .py
+    if robot_file.endswith('.py'):
+        robot_file = robot_file[:-3]
+    return os.path.basename(robot_file)
+
+def load_robot(robimpstr):
+    if robimpstr.endswith('.py'):
+        robimpstr = robimpstr[:-3]
+    try:
+        robimp = load_robot_module(robimpstr)
+    except:
+        logger.exception("Unable to import %s" % robimpstr)
+        return None
+    if not hasattr(robimp, "function_type"):
+        robimp.function_type = "function"
+    if not hasattr(robimp, "reset"):
+        robimp.reset = None
+    if not hasattr(robimp, "name"):
+        logger.error("%s.py must have the variable 'name' set" % robimpstr)
+        return None
+    if not hasattr(robimp, "run") or not callable(getattr(robimp, "run")):
+        logger.error("%s.py must have a function named 'run()'" % robimpstr)
+        return None
+    robot = Robot(robimp.name, robot_path(robimpstr), robimp.run, robimp.function_type, robimp.reset)
+    # The module has to outlive load_robot, as Python clears a module's
+    # variables when the module object is freed
+    robot.module = robimp
+    # Optional entry point for playing many games at once in botwar_batch
+    robot.run_batch = getattr(robimp, "run_batch", None)
+    return robot
+
+def load_robots(robot_files, count=None):
+    # Fill count places by cycling through robot_files, giving robots that
+    # share a name a number so they can be told apart
+    if count is None:
+        count = len(robot_files)
+    if os.getcwd() not in sys.path:
+        sys.path.append(os.getcwd())
+    robots = []
+    names = {}
+    for i in range(0, count):
+        robot = load_robot(robot_files[i % len(robot_files)])
+        if robot is None:
+            return None
+        names[robot.name] = names.get(robot.name, 0) + 1
+        if names[robot.name] > 1:
+            robot.name = "%s-%i" % (robot.name, names[robot.name])
+        robots.append(robot)
+    return robots
 
-def usage():
-    print "Usage: %s [ --startfrom=savegame ] [ --replay=savegame ] [ --save=savegame ] <first_robot.py> <second_robot.py> .." % sys.argv[0]
-    
 def load(arguments):
-    roblibs = []
     robots = []
     robot_files = []
     startfrom_file = None
     replay_file = None
     save_file = None
+    size = DEFAULT_SIZE
+    robot_count = None
+    powerups = DEFAULT_POWERUPS
+    start_turn = None
+    seed = None
+    sandbox = False
+    timeout = None
+    timeout_action = "wait"
+    profile = False
+    check_simulate = False
+    goto = "direct"
+    listen = None
     
     for arg in arguments:
-        if arg.startswith('--'):
+        if arg == '--sandbox':
+            sandbox = True
+        elif arg == '--profile':
+            profile = True
+        elif arg == '--check-simulate':
+            check_simulate = True
+        elif arg.startswith('--'):
             arglist = arg[2:].split('=', 1)
             if len(arglist) != 2:
-                print "You must specify a savegame with --%s" % (arglist[0])
+                print "You must specify a value with --%s" % (arglist[0])
                 sys.exit(1)
             if arglist[0] == 'startfrom':
                 startfrom_file = arglist[1]
@@ -810,6 +1290,63 @@ def load(arguments):
                 replay_file = arglist[1]
             elif arglist[0] == 'save':
                 save_file = arglist[1]
+            elif arglist[0] == 'size':
+                try:
+                    size = tuple([int(v) for v in arglist[1].lower().split('x', 1)])
+                except ValueError:
+                    size = ()
+                if len(size) != 2 or size[0] < 1 or size[1] < 1:
+                    print "The board size must be given as WIDTHxHEIGHT, for example --size=16x9"
+                    sys.exit(1)
+            elif arglist[0] == 'seed':
+                try:
+                    seed = int(arglist[1])
+                except ValueError:
+                    seed = -1
+                if seed < 0 or seed > MAX_SEED:
+                    print "--seed must be a number from 0 to %i" % MAX_SEED
+                    sys.exit(1)
+            elif arglist[0] == 'seek':
+                try:
+                    start_turn = int(arglist[1])
+                except ValueError:
+                    start_turn = -1
+                if start_turn < 0:
+                    print "--seek must be a turn number"
+                    sys.exit(1)
+            elif arglist[0] == 'timeout':
+                try:
+                    timeout = float(arglist[1])
+                except ValueError:
+                    timeout = -1
+                if timeout <= 0:
+                    print "--timeout must be a number of seconds"
+                    sys.exit(1)
+                sandbox = True
+            elif arglist[0] == 'goto':
+                if arglist[1] not in ('direct', 'planned'):
+                    print "--goto must be direct or planned"
+                    sys.exit(1)
+                goto = arglist[1]
+            elif arglist[0] == 'listen':
+                listen = arglist[1]
+            elif arglist[0] == 'timeout-action':
+                if arglist[1] not in ('wait', 'crash'):
+                    print "--timeout-action must be wait or crash"
+                    sys.exit(1)
+                timeout_action = arglist[1]
+            elif arglist[0] in ('robots', 'powerups'):
+                try:
+                    value = int(arglist[1])
+                except ValueError:
+                    value = -1
+                if value < 0:
+                    print "--%s must be a positive number" % (arglist[0])
+                    sys.exit(1)
+                if arglist[0] == 'robots':
+                    robot_count = value
+                else:
+                    powerups = value
             else:
                 print "Unrecognized argument %s" % (arg)
                 sys.exit(1)
@@ -822,49 +1359,110 @@ def load(arguments):
             usage()
             sys.exit(1)
     else:
-        if len(robot_files) != 2:
-            print "You must specify two robots"
+        if robot_count is None and len(robot_files) < 2:
+            print "You must specify at least two robots"
+            usage()
+            sys.exit(1)
+        if robot_count is not None and (robot_count < 2 or robot_count < len(robot_files) or len(robot_files) == 0):
+            print "--robots must be at least two and at least the number of robots given"
+            usage()
+            sys.exit(1)
+        remote = [robot_file for robot_file in robot_files if robot_file.startswith("remote:")]
+        if len(remote) > 0 and listen is None:
+            print "You must give an address to --listen on for remote robots"
+            usage()
+            sys.exit(1)
+        if listen is not None and sandbox:
+            print "You can't use --sandbox with --listen, remote robots are already kept apart"
             usage()
             sys.exit(1)
         
-        sys.path.append(os.getcwd())
-        for robimpstr in robot_files:
-            if robimpstr.endswith('.py'):
-                robimpstr = robimpstr[:-3]
+        if listen is not None:
+            import botwar_remote
             try:
-                robimp = importlib.import_module(robimpstr)
-            except:
-                logger.exception("Unable to import %s" % robimpstr)
-                return None
-            if not hasattr(robimp, "function_type"):
-                robimp.function_type = "function"
-            if not hasattr(robimp, "reset"):
-                robimp.reset = None
-            if not hasattr(robimp, "name"):
-                logger.error("%s.py must have the variable 'name' set" % robimpstr)
-                return None
-            if not hasattr(robimp, "run") or not callable(getattr(robimp, "run")):
-                logger.error("%s.py must have a function named 'run()'" % robimpstr)
-                return None
-            robot = Robot(robimp.name, os.path.basename(robimpstr), robimp.run, robimp.function_type, robimp.reset)
-            robots.append(robot)
+                pool = botwar_remote.get_pool(listen)
+            except (botwar_remote.RemoteError, socket.error), e:
+                print "Unable to listen on %s: %s" % (listen, e)
+                sys.exit(1)
+            robots = botwar_remote.load_robots(pool, robot_files, robot_count)
+        elif sandbox:
+            import botwar_sandbox
+            robots = botwar_sandbox.load_robots(robot_files, robot_count, timeout, timeout_action)
+        else:
+            robots = load_robots(robot_files, robot_count)
+        if robots is None:
+            return None
+    
+    if start_turn is not None and replay_file is None:
+        print "You can only use --seek with --replay"
+        usage()
+        sys.exit(1)
     
-    world = World((16, 9), startfrom_file, replay_file, save_file, robots)
+    world = World(size, startfrom_file, replay_file, save_file, robots, powerups, seed)
+    world.start_turn = start_turn
+    world.check_simulate = check_simulate
+    if goto == "planned":
+        world.planner = GotoPlanner(world.grid)
+    if profile:
+        world.profiler = Profiler()
+        world.profiler.attach(world)
     return world
     
+# Play the started game through, checking every turn that a clone the robot
+# makes with clone_world, playing the robot's command with simulate(), ends
+# the turn in the same state as the game.  Returns the number of turns that
+# ended differently
+def check_simulate(world):
+    differed = 0
+    while not world.game_over:
+        robot = world.begin_turn()
+        future = None
+        if robot.playing:
+            try:
+                future = robot.clone_world()
+                command = robot.run_turn(world.round)
+            except:
+                world.crash(robot)
+                future = None
+            else:
+                future.simulate([command])
+                world.play_command(robot, command)
+        world.end_turn(robot)
+        if future is not None and (future.turn != world.turn or future.game_over != world.game_over or
+                                   future.get_state() != world.get_state()):
+            logger.error("Simulating %s's command on turn %i didn't match the game", robot.name, world.turn)
+            differed += 1
+    return differed
+
 def main():
+    logging.basicConfig(
+            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+            level=logging.INFO)
+    logger.setLevel(logging.DEBUG)
+
     world = load(sys.argv[1:])
 
     if world is None:
         sys.exit(1)
+    LoggingSubscriber(logger).attach(world.events)
         
     if not world.start():
         sys.exit(1)
+
+    if world.check_simulate:
+        differed = check_simulate(world)
+        print "%i of %i turns played differently when simulated" % (differed, world.turn)
+        if differed > 0:
+            sys.exit(1)
+        return
         
     while True:
         world.next_turn()
         if world.game_over:
             break
 
+    if world.profiler is not None:
+        world.profiler.show()
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,255 @@
+#!/usr/bin/python
+
+import multiprocessing
+import sys
+
+import numpy
+
+from botwar_ratings import replay_files
+from botwar_replay import COMMAND_CODES, ReplayError, Command, Crash, Hit, Keyframe, Move, read_records
+
+# Columns of Analysis.command_counts, with every command that isn't one of the
+# basic ones counted under "other"
+COMMANDS = sorted(COMMAND_CODES, key=lambda command: COMMAND_CODES[command]) + ["other"]
+COMMAND_COLUMNS = dict([(COMMANDS[i], i) for i in range(0, len(COMMANDS))])
+# Columns of Analysis.deaths
+CAUSES = ["energy", "destroyed", "crashed"]
+
+class Analysis(object):
+    """What a set of saved games add up to, read from the saves without
+    playing them through the engine.  Robots are told apart by name.
+
+    heatmaps holds, for each board size, an array indexed [y - 1, x - 1] of
+    how many turns robots started on each square.  Per robot, command_counts
+    counts each of COMMANDS, deaths counts each of CAUSES, wins counts games
+    it won, so outlived every other robot in, and kills counts robots it
+    destroyed, being the last to hit them with a laser or EMP.
+
+    Text saves don't record turns, moves, hits or keyframes, so they don't
+    say which robot sent each command or how the game ended.  They only add
+    to games and to the commands of the robot "?"."""
+    games = 0
+    finished = 0
+    heatmaps = None
+    robots = None
+    command_counts = None
+    deaths = None
+    wins = None
+    kills = None
+    games_played = None
+    errors = None
+
+    def __init__(self):
+        self.heatmaps = {}
+        self.robots = {}
+        self.command_counts = numpy.zeros((0, len(COMMANDS)), numpy.int64)
+        self.deaths = numpy.zeros((0, len(CAUSES)), numpy.int64)
+        self.wins = numpy.zeros(0, numpy.int64)
+        self.kills = numpy.zeros(0, numpy.int64)
+        self.games_played = numpy.zeros(0, numpy.int64)
+        self.errors = []
+
+    # Row of the robot in the per robot arrays, adding one if it's new
+    def robot(self, name):
+        if name not in self.robots:
+            self.robots[name] = len(self.robots)
+            self.command_counts = numpy.vstack((self.command_counts, numpy.zeros(len(COMMANDS), numpy.int64)))
+            self.deaths = numpy.vstack((self.deaths, numpy.zeros(len(CAUSES), numpy.int64)))
+            self.wins = numpy.append(self.wins, 0)
+            self.kills = numpy.append(self.kills, 0)
+            self.games_played = numpy.append(self.games_played, 0)
+        return self.robots[name]
+
+    def heatmap(self, size):
+        if size not in self.heatmaps:
+            self.heatmaps[size] = numpy.zeros((size[1], size[0]), numpy.int64)
+        return self.heatmaps[size]
+
+    def add_file(self, filename):
+        try:
+            self.add_records(read_records(filename))
+        except (ReplayError, IOError), e:
+            self.errors.append("%s: %s" % (filename, e))
+
+    def add_records(self, records):
+        header = records.next()
+        if not header.moves:
+            unknown = self.robot("?")
+            for record in records:
+                if isinstance(record, Command):
+                    self.command_counts[unknown, COMMAND_COLUMNS.get(record.command, COMMAND_COLUMNS["other"])] += 1
+            self.games += 1
+            return
+        # Counts stay local until the save turns out to be whole
+        heatmap = numpy.zeros((header.size[1], header.size[0]), numpy.int64)
+        locations = [location for name, location in header.robots]
+        rows = [self.robot(name) for name, location in header.robots]
+        commands = [numpy.zeros(len(COMMANDS), numpy.int64) for row in rows]
+        # Seat of the last robot to hit each robot
+        hit_by = [None] * len(rows)
+        crashed = set()
+        last = None
+        for record in records:
+            last = record
+            if isinstance(record, Command):
+                commands[record.seat][COMMAND_COLUMNS.get(record.command, COMMAND_COLUMNS["other"])] += 1
+                location = locations[record.seat]
+                heatmap[location[1] - 1, location[0] - 1] += 1
+            elif isinstance(record, Move):
+                locations[record.seat] = record.location
+            elif isinstance(record, Hit):
+                hit_by[record.target] = record.seat
+            elif isinstance(record, Crash):
+                if record.seat is not None:
+                    crashed.add(record.seat)
+        # Binary saves end with a keyframe of how the game finished
+        if not isinstance(last, Keyframe):
+            raise ReplayError("Savegame doesn't say how the game finished")
+
+        self.heatmap(header.size)[:] += heatmap
+        for seat in range(0, len(rows)):
+            self.command_counts[rows[seat]] += commands[seat]
+            self.games_played[rows[seat]] += 1
+        self.games += 1
+        self.finished += 1
+        alive = []
+        for seat in range(0, len(rows)):
+            robot = last.robots[seat]
+            if robot.playing:
+                alive.append(seat)
+            elif seat in crashed:
+                self.deaths[rows[seat], CAUSES.index("crashed")] += 1
+            elif robot.life <= 0:
+                self.deaths[rows[seat], CAUSES.index("destroyed")] += 1
+                if hit_by[seat] is not None:
+                    self.kills[rows[hit_by[seat]]] += 1
+            else:
+                self.deaths[rows[seat], CAUSES.index("energy")] += 1
+        if len(alive) == 1:
+            self.wins[rows[alive[0]]] += 1
+
+    def merge(self, other):
+        self.games += other.games
+        self.finished += other.finished
+        for size, heatmap in other.heatmaps.items():
+            self.heatmap(size)[:] += heatmap
+        for name, row in other.robots.items():
+            mine = self.robot(name)
+            self.command_counts[mine] += other.command_counts[row]
+            self.deaths[mine] += other.deaths[row]
+            self.wins[mine] += other.wins[row]
+            self.kills[mine] += other.kills[row]
+            self.games_played[mine] += other.games_played[row]
+        self.errors.extend(other.errors)
+
+    def names(self):
+        return sorted(self.robots, key=lambda name: self.robots[name])
+
+    def show(self, out=sys.stdout):
+        out.write("%i games, %i with how they finished\n" % (self.games, self.finished))
+        names = sorted(self.robots, key=lambda name: (-self.wins[self.robots[name]], name))
+        width = max([len(name) for name in names] + [5])
+        out.write("\n%-*s %6s %6s %6s" % (width, "Robot", "Games", "Won", "Kills"))
+        for cause in CAUSES:
+            out.write(" %9s" % cause)
+        out.write("\n")
+        for name in names:
+            row = self.robots[name]
+            out.write("%-*s %6i %6i %6i" % (width, name, self.games_played[row], self.wins[row], self.kills[row]))
+            for column in range(0, len(CAUSES)):
+                out.write(" %9i" % self.deaths[row, column])
+            out.write("\n")
+
+        out.write("\n%-*s" % (width, "Commands"))
+        for command in COMMANDS:
+            out.write(" %7s" % command)
+        out.write("\n")
+        for name in names:
+            row = self.robots[name]
+            total = max(1, self.command_counts[row].sum())
+            out.write("%-*s" % (width, name))
+            for column in range(0, len(COMMANDS)):
+                out.write(" %6.1f%%" % (self.command_counts[row, column] * 100.0 / total))
+            out.write("\n")
+
+        for size in sorted(self.heatmaps):
+            heatmap = self.heatmaps[size]
+            out.write("\nWhere robots started their turns on %ix%i boards, as a share of the busiest square:\n" % size)
+            busiest = max(1, heatmap.max())
+            # Drawn with north at the top
+            for y in range(size[1] - 1, -1, -1):
+                out.write("  " + "".join([" .:-=+*#%@"[min(9, heatmap[y, x] * 10 / busiest)] for x in range(0, size[0])]) + "\n")
+
+        for error in self.errors:
+            out.write("ERROR: %s\n" % error)
+
+def analyse_files(filenames):
+    analysis = Analysis()
+    for filename in filenames:
+        analysis.add_file(filename)
+    return analysis
+
+def analyse(paths, processes=None, chunk=64):
+    # Read the saves in paths across a pool of processes, each adding up a
+    # chunk of files at a time, and merge what they find
+    files = replay_files(paths)
+    chunks = [files[i:i + chunk] for i in range(0, len(files), chunk)]
+    analysis = Analysis()
+    pool = multiprocessing.Pool(processes)
+    try:
+        for part in pool.imap_unordered(analyse_files, chunks):
+            analysis.merge(part)
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+    return analysis
+
+def usage():
+    print "Usage: %s [ --processes=N ] [ --save=analysis.npz ] <replay> | <directory> [ .. ]" % sys.argv[0]
+
+def main():
+    processes = None
+    save_file = None
+    paths = []
+    for arg in sys.argv[1:]:
+        if arg.startswith('--'):
+            arglist = arg[2:].split('=', 1)
+            if len(arglist) != 2:
+                print "You must specify a value with --%s" % (arglist[0])
+                sys.exit(1)
+            if arglist[0] == 'save':
+                save_file = arglist[1]
+            elif arglist[0] == 'processes':
+                try:
+                    processes = int(arglist[1])
+                except ValueError:
+                    print "--processes must be a number"
+                    sys.exit(1)
+            else:
+                print "Unrecognized argument %s" % (arg)
+                sys.exit(1)
+        else:
+            paths.append(arg)
+
+    if len(paths) == 0:
+        usage()
+        sys.exit(1)
+
+    analysis = analyse(paths, processes)
+    analysis.show()
+    if save_file is not None:
+        # The arrays, with the robot names for the rows and the command and
+        # cause names for the columns
+        arrays = {"robots": numpy.array(analysis.names()), "commands": numpy.array(COMMANDS),
+                  "causes": numpy.array(CAUSES), "command_counts": analysis.command_counts,
+                  "deaths": analysis.deaths, "wins": analysis.wins, "kills": analysis.kills,
+                  "games": analysis.games_played}
+        for size, heatmap in analysis.heatmaps.items():
+            arrays["heatmap_%ix%i" % size] = heatmap
+        numpy.savez(save_file, **arrays)
+
+if __name__ == '__main__':
+    main()
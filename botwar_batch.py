@@ -0,0 +1,602 @@
+#!/usr/bin/python
+
+import botwar
+import logging
+import numpy
+import random
+import sys
+import time
+import types
+
+from botwar import NORTH, EAST, SOUTH, WEST
+
+logger = logging.getLogger()
+
+DEFAULT_GAMES = 1000
+DEFAULT_MAX_TURNS = 10000
+
+# Command codes used by run_batch.  A robot returns an array of codes, or for
+# goto a tuple of (codes, x, y) arrays giving where each game's robot goes.
+# The face codes are FACE + direction
+W = 0
+SE = 1
+SP = 2
+LT = 3
+RT = 4
+FD = 5
+BK = 6
+EMP = 7
+LASER = 8
+GOTO = 9
+FACE = 10
+FACE_NORTH = FACE + NORTH
+FACE_EAST = FACE + EAST
+FACE_SOUTH = FACE + SOUTH
+FACE_WEST = FACE + WEST
+UNKNOWN = 14
+CRASH = 15
+
+COMMAND_CODES = {"w": W, "se": SE, "sp": SP, "lt": LT, "rt": RT, "fd": FD, "bk": BK, "emp": EMP, "laser": LASER}
+COMMAND_NAMES = dict([(code, command) for command, code in COMMAND_CODES.items()])
+FACE_CODES = {"north": FACE_NORTH, "east": FACE_EAST, "south": FACE_SOUTH, "west": FACE_WEST}
+
+# Energy each command needs, which must be less than the robot's energy,
+# and whether a robot that can't afford it is shown as waiting, taken from
+# World's command handlers.  Only the standard commands can be played here
+COSTS = numpy.zeros(CRASH + 1, dtype=int)
+SHOWN_AS_WAIT = numpy.zeros(CRASH + 1, dtype=bool)
+for command, code in COMMAND_CODES.items():
+    COSTS[code] = botwar.COMMANDS[command].cost
+    SHOWN_AS_WAIT[code] = botwar.COMMANDS[command].shown_as_wait
+
+# What facing a direction comes to, indexed by the number of right turns from
+# the robot's direction to the one it wants to face
+FACE_TURNS = numpy.array([COMMAND_CODES[botwar.FACE_TURNS[("north", (NORTH - turns) % 4)]] for turns in range(0, 4)])
+
+# Steps taken by moving one square in each direction
+STEP_X = numpy.array([0, 1, 0, -1])
+STEP_Y = numpy.array([1, 0, -1, 0])
+
+def usage():
+    print "Usage: %s [ --games=N ] [ --max-turns=N ] [ --seed=N ] [ --size=WIDTHxHEIGHT ] [ --powerups=N ] [ --check ] <first_robot.py> <second_robot.py> .." % sys.argv[0]
+
+def parse_command(command):
+    # Turn a command returned by run() into a code and goto coordinates,
+    # treating it the way World.check_command would
+    if type(command) == types.ListType or type(command) == types.TupleType:
+        if len(command) == 0:
+            return CRASH, 0, 0
+        name = command[0]
+        argument = command[1:]
+    else:
+        name = command
+        argument = ()
+    if name == "goto":
+        if len(argument) < 2:
+            return CRASH, 0, 0
+        try:
+            return GOTO, int(argument[0]), int(argument[1])
+        except:
+            return W, 0, 0
+    if name == "face":
+        if len(argument) > 0:
+            for direction, code in FACE_CODES.items():
+                if argument[0] == direction:
+                    return code, 0, 0
+        return W, 0, 0
+    for command_name, code in COMMAND_CODES.items():
+        if name == command_name:
+            return code, 0, 0
+    return UNKNOWN, 0, 0
+
+class BatchWorld(object):
+    """Many games between the same robots played in lockstep, with the state
+    of every game held in arrays indexed by [game, seat] so each turn is a
+    few array operations instead of a loop over games.
+
+    Each game starts from the same layout World picks for its seed and
+    follows the same rules, so it ends just as World would have played it.
+    Robots with a run_batch(observations) function are asked for every
+    game's command at once, getting a dict of arrays named like run()'s
+    arguments, and have to keep any state they need for every game.  Other
+    robots have run() called once per game, with each game getting its own
+    copy of the robot's module."""
+    size = None
+    robots = None
+    seeds = None
+    turn = 0
+    games = 0
+    powerup_count = 0
+    instances = None
+
+    def __init__(self, size, robots, seeds, powerups=botwar.DEFAULT_POWERUPS):
+        self.size = size
+        self.robots = robots
+        self.seeds = list(seeds)
+        self.powerup_count = powerups
+        self.games = len(self.seeds)
+        self.turn = 0
+        shape = (self.games, len(robots))
+
+        self.x = numpy.zeros(shape, dtype=int)
+        self.y = numpy.zeros(shape, dtype=int)
+        self.powerup_x = numpy.zeros((self.games, powerups), dtype=int)
+        self.powerup_y = numpy.zeros((self.games, powerups), dtype=int)
+        for game in range(0, self.games):
+            world = botwar.World(size, None, None, None, [], powerups, self.seeds[game])
+            powerup_locations, locations = world.random_layout(len(robots))
+            for i in range(0, powerups):
+                self.powerup_x[game, i], self.powerup_y[game, i] = powerup_locations[i]
+            for seat in range(0, len(robots)):
+                self.x[game, seat], self.y[game, seat] = locations[seat]
+        self.powerup_active = numpy.ones((self.games, powerups), dtype=bool)
+
+        self.robot_direction = numpy.zeros(shape, dtype=int) + NORTH
+        self.turret_direction = numpy.zeros(shape, dtype=int) + NORTH
+        self.max_energy = numpy.array([robot.max_energy for robot in robots])
+        self.max_life = numpy.array([robot.max_life for robot in robots])
+        self.energy = numpy.zeros(shape, dtype=int) + self.max_energy
+        self.life = numpy.zeros(shape, dtype=int) + self.max_life
+        self.playing = numpy.ones(shape, dtype=bool)
+        self.enemy_x = numpy.zeros(shape, dtype=int) - 1
+        self.enemy_y = numpy.zeros(shape, dtype=int) - 1
+        self.enemy_age = numpy.zeros(shape, dtype=int) - 1
+        self.seen_powerup_x = numpy.zeros(shape, dtype=int) - 1
+        self.seen_powerup_y = numpy.zeros(shape, dtype=int) - 1
+        self.seen_powerup_age = numpy.zeros(shape, dtype=int) - 1
+        self.last_command = numpy.zeros(shape, dtype=int) + UNKNOWN
+        self.game_over = numpy.zeros(self.games, dtype=bool)
+        self.turns = numpy.zeros(self.games, dtype=int)
+
+        # Each seat's robot for every game, which is the same robot for
+        # every game when it plays them all at once
+        self.instances = []
+        for robot in robots:
+            if robot.run_batch is None and robot.module is not None:
+                instances = [botwar.load_robot(robot.module.__name__) for game in range(0, self.games)]
+            else:
+                instances = [robot]
+            for instance in instances:
+                instance.size = size
+                if instance.reset_function is not None:
+                    instance.reset_function()
+            self.instances.append(instances)
+
+    def run(self, max_turns=DEFAULT_MAX_TURNS):
+        while not self.game_over.all() and self.turn < max_turns:
+            self.next_turn()
+        self.turns[~self.game_over] = self.turn
+
+    def next_turn(self):
+        self.turn += 1
+        seat = self.turn % len(self.robots)
+        round = ((self.turn - 1) / len(self.robots)) + 1
+        active = numpy.nonzero(~self.game_over)[0]
+
+        games = active[self.playing[active, seat]]
+        if len(games) > 0:
+            self.check_nearby_enemies(games, seat)
+            self.check_nearby_powerups(games, seat)
+            codes, x, y = self.run_turn(games, seat, round)
+            self.check_commands(games, seat, codes, x, y)
+
+        self.cleanup_turn(active, seat)
+
+        ended = active[self.playing[active].sum(1) < 2]
+        self.game_over[ended] = True
+        self.turns[ended] = self.turn
+
+    # Seat of the surviving robot in each game, or -1 for a draw or a game
+    # that hasn't finished
+    def winners(self):
+        winners = numpy.zeros(self.games, dtype=int) - 1
+        won = self.game_over & (self.playing.sum(1) == 1)
+        winners[won] = self.playing[won].argmax(1)
+        return winners
+
+    def observations(self, games, seat, round):
+        return {
+            "enemy_location_x": self.enemy_x[games, seat],
+            "enemy_location_y": self.enemy_y[games, seat],
+            "enemy_location_age": self.enemy_age[games, seat],
+            "energy": self.energy[games, seat],
+            "life": self.life[games, seat],
+            "location_x": self.x[games, seat],
+            "location_y": self.y[games, seat],
+            "max_energy": numpy.zeros(len(games), dtype=int) + self.max_energy[seat],
+            "max_life": numpy.zeros(len(games), dtype=int) + self.max_life[seat],
+            "powerup_location_x": self.seen_powerup_x[games, seat],
+            "powerup_location_y": self.seen_powerup_y[games, seat],
+            "powerup_location_age": self.seen_powerup_age[games, seat],
+            "robot_direction": self.robot_direction[games, seat],
+            "turn": numpy.zeros(len(games), dtype=int) + round,
+            "turret_direction": self.turret_direction[games, seat],
+        }
+
+    def run_turn(self, games, seat, round):
+        robot = self.robots[seat]
+        observations = self.observations(games, seat, round)
+        if robot.run_batch is not None:
+            try:
+                result = robot.run_batch(observations)
+                if type(result) == types.TupleType:
+                    codes, x, y = [numpy.array(value, dtype=int) for value in result]
+                else:
+                    codes = numpy.array(result, dtype=int)
+                    x = numpy.zeros(len(games), dtype=int)
+                    y = numpy.zeros(len(games), dtype=int)
+            except:
+                logger.exception("%s has crashed and is now dead!", robot.name)
+                codes = numpy.zeros(len(games), dtype=int) + CRASH
+                x = numpy.zeros(len(games), dtype=int)
+                y = numpy.zeros(len(games), dtype=int)
+            return codes, x, y
+
+        # Ask each game in turn
+        values = dict([(name, value.tolist()) for name, value in observations.items()])
+        codes = numpy.zeros(len(games), dtype=int)
+        x = numpy.zeros(len(games), dtype=int)
+        y = numpy.zeros(len(games), dtype=int)
+        instances = self.instances[seat]
+        for i in range(0, len(games)):
+            robot = instances[games[i] % len(instances)]
+            environ = botwar.Environment(round, values["max_energy"][i], values["max_life"][i],
+                                         values["energy"][i], values["life"][i],
+                                         (values["location_x"][i], values["location_y"][i]),
+                                         (values["enemy_location_x"][i], values["enemy_location_y"][i],
+                                          values["enemy_location_age"][i]),
+                                         (values["powerup_location_x"][i], values["powerup_location_y"][i],
+                                          values["powerup_location_age"][i]),
+                                         values["robot_direction"][i], values["turret_direction"][i])
+            try:
+                if robot.rf_type == "function":
+                    command = robot.run_function(**robot.build_arguments(environ, round))
+                elif robot.rf_type == "class":
+                    command = robot.run_function(environ)
+                else:
+                    command = "w"
+                codes[i], x[i], y[i] = parse_command(command)
+            except:
+                logger.exception("%s has crashed and is now dead!", robot.name)
+                codes[i] = CRASH
+        return codes, x, y
+
+    # Area each robot can see, which reaches further in front of the turret
+    def sight_box(self, games, seat):
+        x = self.x[games, seat]
+        y = self.y[games, seat]
+        turret = self.turret_direction[games, seat]
+        return (x - (1 + (turret == WEST) * 3), x + (1 + (turret == EAST) * 3),
+                y - (1 + (turret == SOUTH) * 3), y + (1 + (turret == NORTH) * 3))
+
+    def check_nearby_enemies(self, games, seat):
+        min_x, max_x, min_y, max_y = self.sight_box(games, seat)
+        enemy_x = self.enemy_x[games, seat]
+        enemy_y = self.enemy_y[games, seat]
+        forget = games[(enemy_x >= min_x) & (enemy_x <= max_x) & (enemy_y >= min_y) & (enemy_y <= max_y)]
+        self.enemy_x[forget, seat] = -1
+        self.enemy_y[forget, seat] = -1
+        self.enemy_age[forget, seat] = -1
+
+        # If several robots are in sight, the last one is seen
+        x = self.x[games]
+        y = self.y[games]
+        in_sight = (x >= min_x[:, None]) & (x <= max_x[:, None]) & (y >= min_y[:, None]) & (y <= max_y[:, None])
+        in_sight[:, seat] = False
+        seen = in_sight.any(1)
+        last = in_sight.shape[1] - 1 - in_sight[:, ::-1].argmax(1)
+        rows = numpy.nonzero(seen)[0]
+        self.enemy_x[games[rows], seat] = x[rows, last[rows]]
+        self.enemy_y[games[rows], seat] = y[rows, last[rows]]
+        self.enemy_age[games[rows], seat] = 0
+
+    def check_nearby_powerups(self, games, seat):
+        min_x, max_x, min_y, max_y = self.sight_box(games, seat)
+        seen_x = self.seen_powerup_x[games, seat]
+        seen_y = self.seen_powerup_y[games, seat]
+        forget = games[(seen_x >= min_x) & (seen_x <= max_x) & (seen_y >= min_y) & (seen_y <= max_y)]
+        self.seen_powerup_x[forget, seat] = -1
+        self.seen_powerup_y[forget, seat] = -1
+        self.seen_powerup_age[forget, seat] = -1
+        if self.powerup_count == 0:
+            return
+
+        # If several powerups are in sight, the newest one is seen
+        x = self.powerup_x[games]
+        y = self.powerup_y[games]
+        in_sight = self.powerup_active[games] & (x >= min_x[:, None]) & (x <= max_x[:, None]) & \
+                   (y >= min_y[:, None]) & (y <= max_y[:, None])
+        seen = in_sight.any(1)
+        last = in_sight.shape[1] - 1 - in_sight[:, ::-1].argmax(1)
+        rows = numpy.nonzero(seen)[0]
+        self.seen_powerup_x[games[rows], seat] = x[rows, last[rows]]
+        self.seen_powerup_y[games[rows], seat] = y[rows, last[rows]]
+        self.seen_powerup_age[games[rows], seat] = 0
+
+    def check_dead(self, games, seats):
+        playing = self.playing[games, seats]
+        out = playing & (self.energy[games, seats] <= 0)
+        self.energy[games[out], seats[out]] = 0
+        destroyed = playing & (self.life[games, seats] <= 0)
+        self.life[games[destroyed], seats[destroyed]] = 0
+        dead = out | destroyed
+        self.playing[games[dead], seats[dead]] = False
+
+    def cleanup_turn(self, games, seat):
+        seats = numpy.zeros(len(games), dtype=int) + seat
+        self.enemy_age[games, seat] += self.enemy_age[games, seat] > -1
+        self.seen_powerup_age[games, seat] += self.seen_powerup_age[games, seat] > -1
+        self.energy[games, seat] -= 1
+        self.check_dead(games, seats)
+
+    def goto_commands(self, games, seat, x, y):
+        # The same choice as World.goto_command: turn towards whichever of
+        # the target's directions needs the fewest turns, or move forward if
+        # already facing it
+        location_x = self.x[games, seat]
+        location_y = self.y[games, seat]
+        direction = self.robot_direction[games, seat]
+        direction_x = numpy.where(x > location_x, EAST, numpy.where(x < location_x, WEST, -1))
+        direction_y = numpy.where(y > location_y, NORTH, numpy.where(y < location_y, SOUTH, -1))
+        turns_x = numpy.where(direction_x >= 0, numpy.minimum((direction_x - direction) % 4,
+                                                              (direction - direction_x) % 4), 99)
+        turns_y = numpy.where(direction_y >= 0, numpy.minimum((direction_y - direction) % 4,
+                                                              (direction - direction_y) % 4), 99)
+        target = numpy.where(turns_x <= turns_y, direction_x, direction_y)
+        codes = numpy.where(target == direction, FD, FACE + target)
+
+        valid = (x >= 1) & (x <= self.size[0]) & (y >= 1) & (y <= self.size[1]) & \
+                ((x != location_x) | (y != location_y))
+        return numpy.where(valid, codes, W)
+
+    def check_commands(self, games, seat, codes, x, y):
+        # Robots that crashed are out of the game, having done nothing
+        crashed = codes == CRASH
+        self.playing[games[crashed], seat] = False
+        games = games[~crashed]
+        codes = codes[~crashed]
+        x = x[~crashed]
+        y = y[~crashed]
+
+        goto = codes == GOTO
+        if goto.any():
+            codes[goto] = self.goto_commands(games[goto], seat, x[goto], y[goto])
+        face = (codes >= FACE_NORTH) & (codes <= FACE_WEST)
+        if face.any():
+            codes[face] = FACE_TURNS[(codes[face] - FACE - self.robot_direction[games[face], seat]) % 4]
+        self.last_command[games, seat] = codes
+
+        # Without enough energy nothing happens, and the robot is usually
+        # shown as waiting
+        cost = COSTS[codes]
+        energy = self.energy[games, seat]
+        wasted = (cost > 0) & (energy <= cost)
+        self.last_command[games[wasted & SHOWN_AS_WAIT[codes]], seat] = W
+        done = (cost > 0) & (energy > cost)
+        self.energy[games[done], seat] -= cost[done]
+
+        for code, handler in ((SE, self.scan_enemies), (SP, self.scan_powerups), (LT, self.turn_left),
+                              (RT, self.turn_right), (FD, self.forward), (BK, self.backward),
+                              (EMP, self.emp), (LASER, self.laser)):
+            selected = games[done & (codes == code)]
+            if len(selected) > 0:
+                handler(selected, seat)
+
+    def scan_enemies(self, games, seat):
+        x = self.x[games]
+        y = self.y[games]
+        others = self.playing[games]
+        others[:, seat] = False
+        distance = numpy.abs(x - self.x[games, seat][:, None]) + numpy.abs(y - self.y[games, seat][:, None])
+        distance[~others] = sys.maxint
+        closest = distance.argmin(1)
+        rows = numpy.arange(len(games))
+        found = others[rows, closest]
+        self.enemy_x[games, seat] = numpy.where(found, x[rows, closest], -1)
+        self.enemy_y[games, seat] = numpy.where(found, y[rows, closest], -1)
+        self.enemy_age[games, seat] = 0
+
+    def scan_powerups(self, games, seat):
+        self.seen_powerup_x[games, seat] = -1
+        self.seen_powerup_y[games, seat] = -1
+        self.seen_powerup_age[games, seat] = 0
+        if self.powerup_count == 0:
+            return
+        x = self.powerup_x[games]
+        y = self.powerup_y[games]
+        active = self.powerup_active[games]
+        distance = numpy.abs(x - self.x[games, seat][:, None]) + numpy.abs(y - self.y[games, seat][:, None])
+        distance[~active] = sys.maxint
+        closest = distance.argmin(1)
+        rows = numpy.arange(len(games))
+        found = numpy.nonzero(active[rows, closest])[0]
+        self.seen_powerup_x[games[found], seat] = x[found, closest[found]]
+        self.seen_powerup_y[games[found], seat] = y[found, closest[found]]
+
+    def turn_left(self, games, seat):
+        self.robot_direction[games, seat] = (self.robot_direction[games, seat] - 1) % 4
+        self.turret_direction[games, seat] = (self.turret_direction[games, seat] - 1) % 4
+
+    def turn_right(self, games, seat):
+        self.robot_direction[games, seat] = (self.robot_direction[games, seat] + 1) % 4
+        self.turret_direction[games, seat] = (self.turret_direction[games, seat] + 1) % 4
+
+    def step(self, x, y, direction):
+        return (numpy.clip(x + STEP_X[direction], 1, self.size[0]),
+                numpy.clip(y + STEP_Y[direction], 1, self.size[1]))
+
+    def is_collision(self, games, seat, x, y):
+        collision = (self.x[games] == x[:, None]) & (self.y[games] == y[:, None])
+        collision[:, seat] = False
+        return collision.any(1)
+
+    # Move one square, stepping back again if that runs into another robot
+    def move(self, games, seat, direction):
+        x, y = self.step(self.x[games, seat], self.y[games, seat], direction)
+        collision = self.is_collision(games, seat, x, y)
+        back_x, back_y = self.step(x, y, (direction + 2) % 4)
+        x = numpy.where(collision, back_x, x)
+        y = numpy.where(collision, back_y, y)
+        self.x[games, seat] = x
+        self.y[games, seat] = y
+        self.check_goodies(games, seat, x, y)
+
+    def forward(self, games, seat):
+        self.move(games, seat, self.robot_direction[games, seat])
+
+    def backward(self, games, seat):
+        self.move(games, seat, (self.robot_direction[games, seat] + 2) % 4)
+
+    def check_goodies(self, games, seat, x, y):
+        if self.powerup_count == 0:
+            return
+        claimed = self.powerup_active[games] & (self.powerup_x[games] == x[:, None]) & \
+                  (self.powerup_y[games] == y[:, None])
+        self.energy[games[claimed.any(1)], seat] = 100
+        self.powerup_active[games] &= ~claimed
+
+    # Damage the first robot in each game that's in hit and still playing
+    def hit(self, games, seat, hit, damage):
+        hit &= self.playing[games]
+        hit[:, seat] = False
+        rows = numpy.nonzero(hit.any(1))[0]
+        games = games[rows]
+        targets = hit[rows].argmax(1)
+        self.life[games, targets] -= damage
+        self.check_dead(games, targets)
+
+    def emp(self, games, seat):
+        x = self.x[games]
+        y = self.y[games]
+        self.hit(games, seat, (numpy.abs(x - self.x[games, seat][:, None]) <= 2) &
+                              (numpy.abs(y - self.y[games, seat][:, None]) <= 2), 30)
+
+    def laser(self, games, seat):
+        x = self.x[games]
+        y = self.y[games]
+        location_x = self.x[games, seat][:, None]
+        location_y = self.y[games, seat][:, None]
+        turret = self.turret_direction[games, seat][:, None]
+        hit = ((turret == NORTH) & (x == location_x) & (y > location_y)) | \
+              ((turret == SOUTH) & (x == location_x) & (y < location_y)) | \
+              ((turret == EAST) & (y == location_y) & (x > location_x)) | \
+              ((turret == WEST) & (y == location_y) & (x < location_x))
+        self.hit(games, seat, hit, 90)
+
+    # Everything about one game's robots, in the form World's robots give it
+    # from get_state(), apart from the last command
+    def robot_states(self, game):
+        states = []
+        for seat in range(0, len(self.robots)):
+            states.append(((int(self.x[game, seat]), int(self.y[game, seat])),
+                           int(self.robot_direction[game, seat]), int(self.turret_direction[game, seat]),
+                           int(self.energy[game, seat]), int(self.life[game, seat]), bool(self.playing[game, seat]),
+                           (int(self.enemy_x[game, seat]), int(self.enemy_y[game, seat]),
+                            int(self.enemy_age[game, seat])),
+                           (int(self.seen_powerup_x[game, seat]), int(self.seen_powerup_y[game, seat]),
+                            int(self.seen_powerup_age[game, seat]))))
+        return states
+
+def play_world(robot_files, seed, size, powerups, max_turns):
+    # Play a game with World for comparing against a BatchWorld game
+    world = botwar.load(["--seed=%i" % seed, "--size=%ix%i" % size, "--powerups=%i" % powerups] + robot_files)
+    world.quiet = True
+    world.start()
+    while not world.game_over and world.turn < max_turns:
+        world.next_turn()
+    return world
+
+def check(robot_files, seeds, size=botwar.DEFAULT_SIZE, powerups=botwar.DEFAULT_POWERUPS,
+          max_turns=DEFAULT_MAX_TURNS, out=sys.stdout):
+    # Play the seeds with both engines and report any game that doesn't end
+    # the same way.  Returns the number of games that differ
+    robots = botwar.load_robots(robot_files)
+    batch = BatchWorld(size, robots, seeds, powerups)
+    batch.run(max_turns)
+    differ = 0
+    for game in range(0, batch.games):
+        world = play_world(robot_files, batch.seeds[game], size, powerups, max_turns)
+        states = [robot.get_state()[:-1] for robot in world.robots]
+        if world.turn != batch.turns[game] or states != batch.robot_states(game):
+            out.write("Seed %i differs: %i turns against %i\n" % (batch.seeds[game], batch.turns[game], world.turn))
+            differ += 1
+    return differ
+
+def main():
+    robot_files = []
+    games = DEFAULT_GAMES
+    max_turns = DEFAULT_MAX_TURNS
+    seed = None
+    size = botwar.DEFAULT_SIZE
+    powerups = botwar.DEFAULT_POWERUPS
+    run_check = False
+
+    for arg in sys.argv[1:]:
+        if arg == '--check':
+            run_check = True
+        elif arg.startswith('--'):
+            arglist = arg[2:].split('=', 1)
+            if len(arglist) != 2:
+                print "You must specify a value with --%s" % (arglist[0])
+                sys.exit(1)
+            if arglist[0] == 'size':
+                try:
+                    size = tuple([int(v) for v in arglist[1].lower().split('x', 1)])
+                except ValueError:
+                    size = ()
+                if len(size) != 2 or size[0] < 1 or size[1] < 1:
+                    print "The board size must be given as WIDTHxHEIGHT, for example --size=16x9"
+                    sys.exit(1)
+                continue
+            try:
+                value = int(arglist[1])
+            except ValueError:
+                print "--%s must be a number" % (arglist[0])
+                sys.exit(1)
+            if arglist[0] == 'games':
+                games = value
+            elif arglist[0] == 'max-turns':
+                max_turns = value
+            elif arglist[0] == 'seed':
+                seed = value
+            elif arglist[0] == 'powerups':
+                powerups = value
+            else:
+                print "Unrecognized argument %s" % (arg)
+                sys.exit(1)
+        else:
+            robot_files.append(arg)
+
+    if len(robot_files) < 2:
+        print "You must specify at least two robots"
+        usage()
+        sys.exit(1)
+
+    logging.basicConfig(
+            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+            level=logging.ERROR)
+    seeds = random.Random(seed)
+    seeds = [seeds.randint(0, botwar.MAX_SEED) for game in range(0, games)]
+    if run_check:
+        differ = check(robot_files, seeds, size, powerups, max_turns)
+        print "%i of %i games differ" % (differ, games)
+        sys.exit(differ > 0)
+
+    robots = botwar.load_robots(robot_files)
+    if robots is None:
+        sys.exit(1)
+    batch = BatchWorld(size, robots, seeds, powerups)
+    start = time.time()
+    batch.run(max_turns)
+    elapsed = time.time() - start
+
+    winners = batch.winners()
+    width = max([len(robot.name) for robot in robots] + [5])
+    print "%-*s %6s" % (width, "Robot", "Wins")
+    for seat in range(0, len(robots)):
+        print "%-*s %6i" % (width, robots[seat].name, (winners == seat).sum())
+    print "%-*s %6i" % (width, "Draws", (winners == -1).sum())
+    print "%i games, %i turns in %.2f seconds" % (games, batch.turns.sum(), elapsed)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,263 @@
+#!/usr/bin/python
+
+import botwar
+import json
+import logging
+import os
+import sys
+import time
+
+from botwar_planner import GotoPlanner
+
+logger = logging.getLogger()
+
+ROBOT_FILES = ["hunterbot", "smarthunter", "squarebot", "energybot", "testbot"]
+SIZES = [(16, 9), (32, 18), (64, 36), (128, 72)]
+ROBOT_COUNTS = [2, 8, 32, 128]
+# Boards the engine's own functions are timed on, small and crowded
+MICRO_BOARDS = [((16, 9), 2), ((64, 36), 32)]
+DEFAULT_TIME = 1.0
+# Turns of games played on each board
+DEFAULT_TURNS = 20000
+# Percentage a benchmark can fall below its baseline before it counts as a
+# regression
+DEFAULT_THRESHOLD = 10.0
+
+def usage():
+    print "Usage: %s [ --time=seconds ] [ --turns=N ] [ --save=baseline.json ] [ --baseline=baseline.json ] [ --threshold=percent ]" % sys.argv[0]
+
+def quietly(function, *args):
+    # Some robots print every turn, which would swamp the results
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+    try:
+        return function(*args)
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+def rate(function, min_time=DEFAULT_TIME, reset=None):
+    # Call function in ever bigger batches until min_time has passed, and
+    # return the number of calls per second.  If reset is given it's called
+    # before every call, and only the time spent in function counts
+    if reset is not None:
+        return rate_with_reset(function, reset, min_time)
+    calls = 0
+    batch = 1
+    start = time.time()
+    elapsed = 0.0
+    while elapsed < min_time:
+        for i in xrange(batch):
+            function()
+        calls += batch
+        batch *= 2
+        elapsed = time.time() - start
+    return calls / elapsed
+
+def rate_with_reset(function, reset, min_time=DEFAULT_TIME):
+    calls = 0
+    elapsed = 0.0
+    while elapsed < min_time:
+        reset()
+        start = time.time()
+        function()
+        elapsed += time.time() - start
+        calls += 1
+    return calls / elapsed
+
+def board_arguments(size, robot_count, robot_files=ROBOT_FILES):
+    return ["--size=%ix%i" % size, "--robots=%i" % robot_count,
+            "--powerups=%i" % max(1, robot_count / 2)] + robot_files[:robot_count]
+
+def scaling(size, robot_count, robot_files=ROBOT_FILES, turns=DEFAULT_TURNS):
+    # Play turns turns of games on the board and return the number of turns
+    # played per second.  The games are seeded 1, 2, .. so every run plays
+    # the same games
+    arguments = board_arguments(size, robot_count, robot_files)
+    played = 0
+    elapsed = 0.0
+    seed = 0
+    while played < turns:
+        seed += 1
+        world = botwar.load(["--seed=%i" % seed] + arguments)
+        world.quiet = True
+        world.start()
+        start = time.time()
+        while not world.game_over and played < turns:
+            world.next_turn()
+            played += 1
+        elapsed += time.time() - start
+        world.close()
+    return played / elapsed
+
+def board(size, robot_count):
+    world = botwar.load(["--seed=1"] + board_arguments(size, robot_count))
+    world.quiet = True
+    world.start()
+    return world
+
+def to_dict_benchmark(world):
+    robot = world.robots[0]
+    environ = botwar.Environment(1, robot.max_energy, robot.max_life, robot.energy, robot.life, robot.location,
+                                 robot.enemy_location, robot.powerup_location, robot.robot_direction,
+                                 robot.turret_direction)
+    return environ.to_dict
+
+def command_benchmark(world, command, argument):
+    # Returns (play, reset), where reset puts back whatever the command
+    # changed, so every call does the same work: the robot, any robot it hit
+    # and the powerups if it picked one up.  The robot starts with full
+    # energy, so the command is carried out rather than wasted
+    robot = world.robots[0]
+    robot.energy = robot.max_energy
+    states = [(other, other.get_state()) for other in world.robots]
+    powerups = list(world.powerups)
+    def play():
+        world.check_command(robot, command, argument)
+    def reset():
+        for other, state in states:
+            if other is robot or other.energy != state[3] or other.life != state[4] or other.playing != state[5]:
+                other.set_state(state)
+        if world.powerups != powerups:
+            world.clear_powerups()
+            for powerup in powerups:
+                world.add_powerup(powerup)
+    return play, reset
+
+def nearby_benchmark(world, check):
+    robots = world.robots
+    def play():
+        for robot in robots:
+            check(robot)
+    return play
+
+def goto_benchmark(world, planned):
+    # Head for the far corner from where the first robot is.  Only working
+    # out the command is timed, which leaves the robot where it is
+    robot = world.robots[0]
+    target = (world.size[0] + 1 - robot.location[0], world.size[1] + 1 - robot.location[1])
+    if target == robot.location:
+        target = (1, 1)
+    if planned:
+        world.planner = GotoPlanner(world.grid)
+    def play():
+        world.goto_command(robot, target)
+    return play
+
+def micro_benchmarks(min_time=DEFAULT_TIME):
+    # Yields (name, calls per second) for the engine's busiest functions.
+    # check_nearby_enemies and check_nearby_powerups are timed for every
+    # robot on the board in turn
+    world = quietly(board, *MICRO_BOARDS[0])
+    yield "Environment.to_dict", rate(to_dict_benchmark(world), min_time)
+    for size, robot_count in MICRO_BOARDS:
+        board_name = "%ix%i %i robots" % (size[0], size[1], robot_count)
+        commands = [(command, ()) for command in sorted(world.commands)]
+        commands.append(("face", ("north",)))
+        commands.append(("goto", (size[0], size[1])))
+        for command, argument in commands:
+            world = quietly(board, size, robot_count)
+            play, reset = command_benchmark(world, command, argument)
+            yield ("check_command %s, %s" % (command, board_name), rate(play, min_time, reset))
+        world = quietly(board, size, robot_count)
+        yield ("check_nearby_enemies, %s" % board_name,
+               rate(nearby_benchmark(world, world.check_nearby_enemies), min_time) * robot_count)
+        yield ("check_nearby_powerups, %s" % board_name,
+               rate(nearby_benchmark(world, world.check_nearby_powerups), min_time) * robot_count)
+        for planned in (False, True):
+            world = quietly(board, size, robot_count)
+            yield ("goto_command %s, %s" % (("direct", "planned")[planned], board_name),
+                   rate(goto_benchmark(world, planned), min_time))
+
+def game_benchmarks(turns=DEFAULT_TURNS):
+    # Yields (name, turns per second) for whole games between the bundled
+    # robots, repeated to fill each board, leaving at least half of it free
+    for robot_count in ROBOT_COUNTS:
+        for size in SIZES:
+            if robot_count * 2 > size[0] * size[1]:
+                continue
+            yield ("next_turn, %ix%i %i robots" % (size[0], size[1], robot_count),
+                   quietly(scaling, size, robot_count, ROBOT_FILES, turns))
+
+def run(min_time=DEFAULT_TIME, baseline=None, threshold=DEFAULT_THRESHOLD, out=sys.stdout, turns=DEFAULT_TURNS):
+    # Run every benchmark, showing how each compares with baseline if given,
+    # and return (results, regressions).  Only whole games, in turns per
+    # second, count as regressions, as timings of single functions are too
+    # easily thrown by whatever else the machine is doing
+    results = {}
+    regressions = []
+    width = 48
+    if baseline is None:
+        out.write("%-*s %12s\n" % (width, "Benchmark", "Per second"))
+    else:
+        out.write("%-*s %12s %12s %8s\n" % (width, "Benchmark", "Per second", "Baseline", "Change"))
+    for benchmarks, checked in ((micro_benchmarks(min_time), False), (game_benchmarks(turns), True)):
+        for name, per_second in benchmarks:
+            results[name] = per_second
+            out.write("%-*s %12.0f" % (width, name, per_second))
+            if baseline is not None and name in baseline:
+                change = (per_second - baseline[name]) * 100.0 / baseline[name]
+                out.write(" %12.0f %+7.1f%%" % (baseline[name], change))
+                if checked and change < -threshold:
+                    regressions.append(name)
+                    out.write(" REGRESSED")
+            out.write("\n")
+            out.flush()
+    return results, regressions
+
+def main():
+    min_time = DEFAULT_TIME
+    turns = DEFAULT_TURNS
+    threshold = DEFAULT_THRESHOLD
+    save_file = None
+    baseline_file = None
+    for arg in sys.argv[1:]:
+        arglist = arg[2:].split('=', 1)
+        if not arg.startswith('--') or len(arglist) != 2:
+            print "Unrecognized argument %s" % (arg)
+            usage()
+            sys.exit(1)
+        if arglist[0] == 'save':
+            save_file = arglist[1]
+        elif arglist[0] == 'baseline':
+            baseline_file = arglist[1]
+        elif arglist[0] in ('time', 'turns', 'threshold'):
+            try:
+                value = float(arglist[1])
+            except ValueError:
+                print "--%s must be a number" % (arglist[0])
+                sys.exit(1)
+            if arglist[0] == 'time':
+                min_time = value
+            elif arglist[0] == 'turns':
+                turns = int(value)
+            else:
+                threshold = value
+        else:
+            print "Unrecognized argument %s" % (arg)
+            usage()
+            sys.exit(1)
+
+    logger.setLevel(logging.CRITICAL)
+    if os.getcwd() not in sys.path:
+        sys.path.append(os.getcwd())
+
+    baseline = None
+    if baseline_file is not None:
+        try:
+            baseline = json.load(open(baseline_file))["results"]
+        except (IOError, ValueError, KeyError), e:
+            print "ERROR: Unable to read baseline %s: %s" % (baseline_file, e)
+            sys.exit(1)
+
+    results, regressions = run(min_time, baseline, threshold, turns=turns)
+
+    if save_file is not None:
+        with open(save_file, "w") as f:
+            json.dump({"time": min_time, "turns": turns, "results": results}, f, indent=1, sort_keys=True)
+    if len(regressions) > 0:
+        print "%i games are more than %.1f%% slower than the baseline" % (len(regressions), threshold)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
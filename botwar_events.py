@@ -0,0 +1,240 @@
+import logging
+
+log_direction = ["NORTH", "EAST", "SOUTH", "WEST"]
+
+class Event(object):
+    __slots__ = ()
+    name = None
+
+class TurnStart(Event):
+    __slots__ = ("turn", "round", "robot")
+    name = "turn_start"
+
+    def __init__(self, turn, round, robot):
+        self.turn = turn
+        self.round = round
+        self.robot = robot
+
+class TurnEnd(Event):
+    __slots__ = ("turn", "robot", "robots")
+    name = "turn_end"
+
+    def __init__(self, turn, robot, robots):
+        self.turn = turn
+        self.robot = robot
+        self.robots = robots
+
+# A command the engine is about to carry out, after goto and face have been
+# turned into the basic command they resolve to.  route lists the steps taken
+# from requested to command, such as ["goto", "face"] or ["goto", "planner"]
+class Command(Event):
+    __slots__ = ("robot", "requested", "command", "cost", "route")
+    name = "command"
+
+    def __init__(self, robot, requested, command, cost, route=()):
+        self.robot = robot
+        self.requested = requested
+        self.command = command
+        self.cost = cost
+        self.route = route
+
+# A command that had no effect, such as when there isn't enough energy or a
+# goto is off the board.  reason is the full message, and kind a short one
+# that's the same for every command wasted the same way, like "no energy"
+class Wasted(Event):
+    __slots__ = ("robot", "command", "reason", "kind")
+    name = "wasted"
+
+    def __init__(self, robot, command, reason, kind=None):
+        self.robot = robot
+        self.command = command
+        self.reason = reason
+        self.kind = kind
+
+class Move(Event):
+    __slots__ = ("robot", "location", "direction")
+    name = "move"
+
+    def __init__(self, robot, location, direction):
+        self.robot = robot
+        self.location = location
+        self.direction = direction
+
+class Collision(Event):
+    __slots__ = ("robot", "other")
+    name = "collision"
+
+    def __init__(self, robot, other):
+        self.robot = robot
+        self.other = other
+
+class Scan(Event):
+    __slots__ = ("robot", "kind", "location")
+    name = "scan"
+
+    def __init__(self, robot, kind, location):
+        self.robot = robot
+        self.kind = kind
+        self.location = location
+
+class Hit(Event):
+    __slots__ = ("robot", "target", "weapon", "damage")
+    name = "hit"
+
+    def __init__(self, robot, target, weapon, damage):
+        self.robot = robot
+        self.target = target
+        self.weapon = weapon
+        self.damage = damage
+
+class Pickup(Event):
+    __slots__ = ("robot", "location")
+    name = "pickup"
+
+    def __init__(self, robot, location):
+        self.robot = robot
+        self.location = location
+
+# cause is "energy", "destroyed" or "crashed", and killer is set when another
+# robot's weapon finished the robot off
+class Death(Event):
+    __slots__ = ("robot", "cause", "killer")
+    name = "death"
+
+    def __init__(self, robot, cause, killer=None):
+        self.robot = robot
+        self.cause = cause
+        self.killer = killer
+
+class GameOver(Event):
+    __slots__ = ("turn", "winner")
+    name = "game_over"
+
+    def __init__(self, turn, winner):
+        self.turn = turn
+        self.winner = winner
+
+EVENTS = (TurnStart, TurnEnd, Command, Wasted, Move, Collision, Scan, Hit, Pickup, Death, GameOver)
+
+class EventBus(object):
+    """Subscribers for each type of event, kept in an attribute named after
+    the event, so the engine can check whether anyone is listening before
+    it builds an event:
+
+        if self.events.hit:
+            self.events.emit(Hit(robot, target, "laser", 90))
+    """
+
+    def __init__(self):
+        for event_type in EVENTS:
+            setattr(self, event_type.name, [])
+
+    def subscribe(self, callback, event_types=EVENTS):
+        for event_type in event_types:
+            getattr(self, event_type.name).append(callback)
+
+    def unsubscribe(self, callback, event_types=EVENTS):
+        for event_type in event_types:
+            subscribers = getattr(self, event_type.name)
+            if callback in subscribers:
+                subscribers.remove(callback)
+
+    def emit(self, event):
+        for callback in getattr(self, event.name):
+            callback(event)
+
+class LoggingSubscriber(object):
+    """Writes events to a logger in the engine's traditional log format"""
+    logger = None
+
+    def __init__(self, logger=None):
+        if logger is None:
+            logger = logging.getLogger()
+        self.logger = logger
+        self.handlers = {}
+        for event_type in EVENTS:
+            self.handlers[event_type] = getattr(self, "log_" + event_type.name)
+
+    def attach(self, events):
+        # Only listen for what the logger will actually output
+        event_types = [event_type for event_type in EVENTS if self.logger.isEnabledFor(self.level(event_type))]
+        events.subscribe(self, event_types)
+
+    def level(self, event_type):
+        if event_type in (TurnEnd, Move):
+            return logging.DEBUG
+        if event_type is Wasted:
+            return logging.WARNING
+        return logging.INFO
+
+    def __call__(self, event):
+        self.handlers[type(event)](event)
+
+    def log_turn_start(self, event):
+        self.logger.info("Starting turn %i, round %i", event.turn, event.round)
+        if event.robot.playing:
+            self.logger.info("It's %s's turn", event.robot.name)
+
+    def log_turn_end(self, event):
+        for robot in event.robots:
+            if robot.playing:
+                self.logger.debug("%s has %i life points and %i energy", robot.name, robot.life, robot.energy)
+
+    def log_command(self, event):
+        robot = event.robot
+        if event.command == "se":
+            self.logger.info("%s is scanning for closest enemy", robot.name)
+        elif event.command == "sp":
+            self.logger.info("%s is scanning for closest powerup", robot.name)
+        elif event.command == "lt":
+            self.logger.info("%s is turning left", robot.name)
+        elif event.command == "rt":
+            self.logger.info("%s is turning right", robot.name)
+        elif event.command == "fd":
+            self.logger.info("%s moving forward", robot.name)
+        elif event.command == "bk":
+            self.logger.info("%s moving backward", robot.name)
+        elif event.command == "emp":
+            self.logger.info("%s fired EMP", robot.name)
+        elif event.command == "laser":
+            self.logger.info("%s fired a laser", robot.name)
+        elif event.command == "w":
+            self.logger.info("%s is waiting out this turn", robot.name)
+
+    def log_wasted(self, event):
+        self.logger.warning("%s: %s", event.robot.name, event.reason)
+
+    def log_move(self, event):
+        self.logger.debug("%s is facing %s at (%i, %i)", event.robot.name, log_direction[event.direction],
+                          event.location[0], event.location[1])
+
+    def log_collision(self, event):
+        self.logger.info("%s has run into %s", event.robot.name, event.other.name)
+
+    def log_scan(self, event):
+        if event.kind == "enemy":
+            self.logger.info("Closest enemy is at %i, %i", event.location[0], event.location[1])
+        else:
+            self.logger.info("Closest powerup is at %i, %i", event.location[0], event.location[1])
+
+    def log_hit(self, event):
+        if event.weapon == "emp":
+            self.logger.info("%s hit %s with an EMP", event.robot.name, event.target.name)
+        else:
+            self.logger.info("%s hit %s with a laser", event.robot.name, event.target.name)
+
+    def log_pickup(self, event):
+        self.logger.info("%s picked up a powerup at (%i, %i)", event.robot.name, event.location[0], event.location[1])
+
+    def log_death(self, event):
+        # Crashes are always logged by the engine, along with the traceback
+        if event.cause == "energy":
+            self.logger.info("%s has run out of energy", event.robot.name)
+        elif event.cause == "destroyed":
+            self.logger.info("%s has been destroyed", event.robot.name)
+
+    def log_game_over(self, event):
+        if event.winner is None:
+            self.logger.info("Game over after %i turns with no survivors", event.turn)
+        else:
+            self.logger.info("Game over after %i turns, won by %s", event.turn, event.winner.name)
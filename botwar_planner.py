@@ -0,0 +1,166 @@
+from collections import deque, OrderedDict
+
+# Square moved into by going forward in each direction, in the same order as
+# botwar's NORTH, EAST, SOUTH and WEST
+STEPS = ((0, 1), (1, 0), (0, -1), (-1, 0))
+
+UNREACHABLE = -1
+# Most fields kept at once, each of which holds four distances per square
+MAX_FIELDS = 32
+
+class Field(object):
+    """How many turns it takes to reach a target from each square and
+    direction, as far as the search has got, with the queue to carry on the
+    search from.  squares holds whether each square the search went through
+    was free for robot, the robot it was searching for."""
+    distances = None
+    queue = None
+    squares = None
+    robot = None
+
+    def __init__(self, size, robot):
+        self.distances = [UNREACHABLE] * (size[0] * size[1] * 4)
+        self.queue = deque()
+        self.squares = {}
+        self.robot = robot
+
+class GotoPlanner(object):
+    """Works out the quickest way for a robot to reach a square without
+    running into other robots, counting a turn for every move forward and
+    every quarter turn.
+
+    For each target square, the planner keeps a Field of how many turns it
+    takes to reach the target from every square and direction, so robots
+    heading for the same square share the work.  A Field is only thrown away
+    once a robot moves into or out of a square its search went through, as
+    listed in the grid's changed squares, or once MAX_FIELDS other targets
+    have been asked about since.  The robot asking is never in its own way,
+    so its Field lasts while it follows the path."""
+    grid = None
+    fields = None
+
+    def __init__(self, grid):
+        self.grid = grid
+        # Have the grid start listing changes
+        if grid.changed is None:
+            grid.changed = []
+        self.fields = OrderedDict()
+
+    def index(self, location, direction):
+        return ((location[1] - 1) * self.grid.size[0] + location[0] - 1) * 4 + direction
+
+    def is_free(self, location):
+        return len(self.grid.robots_at(location)) == 0
+
+    # Whether location is empty apart from robot
+    def is_free_for(self, location, robot):
+        for other in self.grid.robots_at(location):
+            if other is not robot:
+                return False
+        return True
+
+    def is_current(self, field, locations, robot):
+        for location in locations:
+            if location in field.squares and field.squares[location] != self.is_free_for(location, robot):
+                return False
+        return True
+
+    # Drop the fields whose searches went through squares robots have since
+    # moved into or out of
+    def check_changes(self):
+        changed = self.grid.changed
+        if len(changed) == 0:
+            return
+        locations = set(changed)
+        del changed[:]
+        for target, field in self.fields.items():
+            if not self.is_current(field, locations, field.robot):
+                del self.fields[target]
+
+    # Turns needed for robot to reach target from each square and direction,
+    # found by a breadth first search backwards from the target.  The search
+    # only goes as far as it has to, and carries on from where it stopped
+    # when asked about squares further away
+    def distances(self, target, wanted, robot):
+        self.check_changes()
+        # Fields are kept in the order they were last used in
+        field = self.fields.pop(target, None)
+        if field is not None and field.robot is not robot:
+            # Only the squares the two robots are on look any different to
+            # them
+            if self.is_current(field, (field.robot.location, robot.location), robot):
+                field.robot = robot
+            else:
+                field = None
+        if field is None:
+            field = Field(self.grid.size, robot)
+            for direction in range(0, 4):
+                field.distances[self.index(target, direction)] = 0
+                field.queue.append((target, direction))
+            if len(self.fields) >= MAX_FIELDS:
+                self.fields.popitem(False)
+        self.fields[target] = field
+        self.search(target, field, [self.index(location, direction) for location, direction in wanted])
+        return field.distances
+
+    def search(self, target, field, wanted):
+        # A robot can turn where it stands, and can move forward from any
+        # square into a free one, so only free squares are searched through.
+        # Stop once the closest of the wanted states is known, along with
+        # everything just as close
+        width, height = self.grid.size
+        distances = field.distances
+        queue = field.queue
+        squares = field.squares
+        closest = None
+        while queue:
+            if closest is None:
+                for i in wanted:
+                    if distances[i] != UNREACHABLE and (closest is None or distances[i] < closest):
+                        closest = distances[i]
+            location, direction = queue[0]
+            distance = distances[self.index(location, direction)]
+            if closest is not None and distance >= closest:
+                return
+            queue.popleft()
+            distance += 1
+            for turned in ((direction + 1) % 4, (direction - 1) % 4):
+                i = self.index(location, turned)
+                if distances[i] == UNREACHABLE:
+                    distances[i] = distance
+                    queue.append((location, turned))
+            if location != target:
+                if location not in squares:
+                    squares[location] = self.is_free_for(location, field.robot)
+                if not squares[location]:
+                    continue
+            step = STEPS[direction]
+            behind = (location[0] - step[0], location[1] - step[1])
+            if behind[0] < 1 or behind[0] > width or behind[1] < 1 or behind[1] > height:
+                continue
+            i = self.index(behind, direction)
+            if distances[i] == UNREACHABLE:
+                distances[i] = distance
+                queue.append((behind, direction))
+
+    # The command that takes robot towards target quickest, or None if other
+    # robots are in the way or on the target
+    def next_command(self, robot, target):
+        if not self.is_free(target):
+            return None
+        direction = robot.robot_direction
+        best = None
+        best_distance = UNREACHABLE
+        step = STEPS[direction]
+        ahead = (robot.location[0] + step[0], robot.location[1] + step[1])
+        options = [("lt", robot.location, (direction - 1) % 4), ("rt", robot.location, (direction + 1) % 4)]
+        if ahead[0] >= 1 and ahead[0] <= self.grid.size[0] and ahead[1] >= 1 and ahead[1] <= self.grid.size[1] and \
+           self.is_free(ahead):
+            options.insert(0, ("fd", ahead, direction))
+        field = self.distances(target, [(location, facing) for command, location, facing in options], robot)
+        for command, location, facing in options:
+            distance = field[self.index(location, facing)]
+            if distance != UNREACHABLE and (best is None or distance < best_distance):
+                best = command
+                best_distance = distance
+        return best
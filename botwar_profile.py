@@ -0,0 +1,96 @@
+import sys
+
+from botwar_events import Command, Wasted
+
+def percentile(times, fraction):
+    # Nearest rank percentile of an already sorted list
+    if len(times) == 0:
+        return 0.0
+    return times[min(len(times) - 1, int(fraction * len(times)))]
+
+class Profiler(object):
+    """Collects how long each robot takes to choose its commands, which
+    commands they come to once goto and face have been worked out, and which
+    of them were wasted.
+
+    Commands are counted under the command carried out, or for goto and face
+    the chain they went through, such as "goto>face>lt" or, for turns the
+    planner chose, "goto>planner>lt"."""
+    robots = None
+    commands = None
+    wasted = None
+
+    def __init__(self):
+        self.robots = []
+        self.commands = {}
+        self.wasted = {}
+
+    # Robots are also watched from their first command, as replays only set
+    # up their robots once the world has started
+    def watch(self, robot):
+        if robot not in self.commands:
+            self.robots.append(robot)
+            self.commands[robot] = {}
+            self.wasted[robot] = {}
+        if robot.think_times is None:
+            robot.think_times = []
+
+    def attach(self, world):
+        for robot in world.robots:
+            self.watch(robot)
+        world.events.subscribe(self.count_command, (Command,))
+        world.events.subscribe(self.count_wasted, (Wasted,))
+
+    def detach(self, world):
+        for robot in world.robots:
+            robot.think_times = None
+        world.events.unsubscribe(self.count_command, (Command,))
+        world.events.unsubscribe(self.count_wasted, (Wasted,))
+
+    def count_command(self, event):
+        name = ">".join(list(event.route) + [event.command])
+        self.watch(event.robot)
+        counts = self.commands[event.robot]
+        counts[name] = counts.get(name, 0) + 1
+
+    def count_wasted(self, event):
+        name = "%s: %s" % (event.command, event.kind)
+        self.watch(event.robot)
+        counts = self.wasted[event.robot]
+        counts[name] = counts.get(name, 0) + 1
+
+    # Returns (turns, p50, p99, max, total) think time in seconds
+    def think_time(self, robot):
+        times = sorted(robot.think_times or [])
+        if len(times) == 0:
+            return (0, 0.0, 0.0, 0.0, 0.0)
+        return (len(times), percentile(times, 0.5), percentile(times, 0.99), times[-1], sum(times))
+
+    def command_counts(self, robot):
+        return dict(self.commands[robot])
+
+    def wasted_counts(self, robot):
+        return dict(self.wasted[robot])
+
+    # Robots ordered slowest first by their worst turn
+    def slowest(self):
+        return sorted(self.robots, key=lambda robot: -self.think_time(robot)[3])
+
+    def show(self, out=sys.stdout):
+        width = max([len(robot.name) for robot in self.robots] + [5])
+        out.write("%-*s %7s %10s %10s %10s %10s\n" % (width, "Robot", "Turns", "p50 ms", "p99 ms", "Max ms", "Total ms"))
+        for robot in self.slowest():
+            turns, p50, p99, longest, total = self.think_time(robot)
+            out.write("%-*s %7i %10.3f %10.3f %10.3f %10.1f\n" % (width, robot.name, turns, p50 * 1000,
+                                                                 p99 * 1000, longest * 1000, total * 1000))
+
+        for robot in self.robots:
+            out.write("\n%s commands:\n" % robot.name)
+            counts = self.commands[robot]
+            for name in sorted(counts, key=lambda name: (-counts[name], name)):
+                out.write("  %-20s %7i\n" % (name, counts[name]))
+            counts = self.wasted[robot]
+            if len(counts) > 0:
+                out.write("%s wasted:\n" % robot.name)
+                for name in sorted(counts, key=lambda name: (-counts[name], name)):
+                    out.write("  %-20s %7i\n" % (name, counts[name]))
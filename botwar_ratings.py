@@ -0,0 +1,289 @@
+#!/usr/bin/python
+
+import botwar
+import botwar_replay
+import logging
+import multiprocessing
+import os
+import sqlite3
+import sys
+
+logger = logging.getLogger()
+
+DEFAULT_RATING = 1500.0
+DEFAULT_K = 32.0
+DEFAULT_BATCH = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ratings (
+    robot TEXT PRIMARY KEY,
+    rating REAL NOT NULL,
+    wins INTEGER NOT NULL,
+    losses INTEGER NOT NULL,
+    draws INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    source TEXT,
+    seed TEXT,
+    turns INTEGER,
+    winner TEXT
+);
+CREATE INDEX IF NOT EXISTS games_source ON games (source);
+CREATE TABLE IF NOT EXISTS history (
+    game INTEGER NOT NULL,
+    robot TEXT NOT NULL,
+    before REAL NOT NULL,
+    after REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS history_robot ON history (robot);
+"""
+
+def expected_score(rating, opponent):
+    return 1.0 / (1.0 + 10.0 ** ((opponent - rating) / 400.0))
+
+class Ladder(object):
+    """Elo ratings kept in an SQLite database, updated a game at a time.
+
+    The ratings are held in memory, and every game changes only the ratings
+    of the robots that played it.  Games and the rating changes they made are
+    written out in batches of batch games, each batch in one transaction, so
+    call commit() or close() once the last game is in."""
+    db = None
+    k = None
+    batch = None
+    ratings = None
+    records = None
+    changed = None
+    games = None
+    history = None
+    sources = None
+    next_game = None
+
+    def __init__(self, filename, k=DEFAULT_K, batch=DEFAULT_BATCH):
+        self.k = k
+        self.batch = batch
+        self.db = sqlite3.connect(filename)
+        self.db.executescript(SCHEMA)
+        self.ratings = {}
+        self.records = {}
+        for robot, rating, wins, losses, draws in self.db.execute("SELECT robot, rating, wins, losses, draws FROM ratings"):
+            self.ratings[robot] = rating
+            self.records[robot] = [wins, losses, draws]
+        self.next_game = (self.db.execute("SELECT MAX(id) FROM games").fetchone()[0] or 0) + 1
+        self.changed = set()
+        self.games = []
+        self.history = []
+        self.sources = set()
+
+    def rating(self, robot):
+        return self.ratings.get(robot, DEFAULT_RATING)
+
+    # Add a game between robots, won by winner, or a draw if winner is None.
+    # A winner beats each of the others, and in a draw every pair draws
+    def add(self, robots, winner=None, source=None, seed=None, turns=None):
+        before = dict([(robot, self.rating(robot)) for robot in robots])
+        for robot in robots:
+            if robot not in self.records:
+                self.records[robot] = [0, 0, 0]
+            change = 0.0
+            for opponent in robots:
+                if opponent == robot:
+                    continue
+                if winner is None:
+                    score = 0.5
+                elif winner == robot:
+                    score = 1.0
+                elif winner == opponent:
+                    score = 0.0
+                else:
+                    continue
+                change += self.k * (score - expected_score(before[robot], before[opponent]))
+            self.ratings[robot] = before[robot] + change
+            if winner is None:
+                self.records[robot][2] += 1
+            elif winner == robot:
+                self.records[robot][0] += 1
+            else:
+                self.records[robot][1] += 1
+            self.history.append((self.next_game, robot, before[robot], self.ratings[robot]))
+            self.changed.add(robot)
+        # Seeds go up to 2**64 - 1, past what SQLite's integers hold
+        if seed is not None:
+            seed = str(seed)
+        self.games.append((self.next_game, source, seed, turns, winner))
+        if source is not None:
+            self.sources.add(source)
+        self.next_game += 1
+        if len(self.games) >= self.batch:
+            self.commit()
+
+    # Add a result from botwar_tournament, with paths giving each robot
+    # file's robot path
+    def add_result(self, result, paths):
+        first, second, winner, turns, error, seed = result
+        if error is not None:
+            return
+        robots = [paths[first], paths[second]]
+        if winner is not None:
+            winner = robots[winner]
+        self.add(robots, winner, None, seed, turns)
+
+    def has_source(self, source):
+        if source in self.sources:
+            return True
+        return self.db.execute("SELECT 1 FROM games WHERE source = ? LIMIT 1", (source,)).fetchone() is not None
+
+    def commit(self):
+        if len(self.games) == 0:
+            return
+        with self.db:
+            self.db.executemany("INSERT INTO games (id, source, seed, turns, winner) VALUES (?, ?, ?, ?, ?)", self.games)
+            self.db.executemany("INSERT INTO history (game, robot, before, after) VALUES (?, ?, ?, ?)", self.history)
+            self.db.executemany("INSERT OR REPLACE INTO ratings (robot, rating, wins, losses, draws) VALUES (?, ?, ?, ?, ?)",
+                                [[robot, self.ratings[robot]] + self.records[robot] for robot in self.changed])
+        self.games = []
+        self.history = []
+        self.changed = set()
+        self.sources = set()
+
+    def close(self):
+        self.commit()
+        self.db.close()
+
+    def standings(self):
+        return sorted(self.ratings, key=lambda robot: (-self.ratings[robot], robot))
+
+    def show(self, out=sys.stdout):
+        width = max([len(robot) for robot in self.ratings] + [5])
+        out.write("%-*s %7s %6s %6s %6s %6s\n" % (width, "Robot", "Rating", "Games", "Wins", "Losses", "Draws"))
+        for robot in self.standings():
+            wins, losses, draws = self.records[robot]
+            out.write("%-*s %7.1f %6i %6i %6i %6i\n" % (width, robot, self.ratings[robot], wins + losses + draws,
+                                                       wins, losses, draws))
+
+def robot_paths(robot_files):
+    # What the ladder rates each robot file as, which is the robot path saves
+    # record, as robots from different files can share a name
+    return dict([(robot_file, botwar.robot_path(robot_file)) for robot_file in robot_files])
+
+def robot_key(robot):
+    # Text saves, and binary saves of robots whose path wasn't known, only
+    # have the robot's name
+    if robot.path is not None:
+        return robot.path
+    return robot.name
+
+def replay_outcome(replay_file):
+    # Play a replay through, returning (replay_file, robots, winner, seed,
+    # turns, error), where the winner is the one robot left at the end
+    try:
+        world = botwar.load(["--replay=%s" % replay_file])
+        world.quiet = True
+        if not world.start():
+            return (replay_file, None, None, None, 0, "Unable to start replay")
+        while not world.game_over:
+            world.next_turn()
+        world.close()
+    except:
+        return (replay_file, None, None, None, 0, "Unable to play replay")
+    robots = [robot_key(robot) for robot in world.robots]
+    alive = [robot_key(robot) for robot in world.robots if robot.playing]
+    winner = None
+    if len(alive) == 1:
+        winner = alive[0]
+    # Text saves don't record the seed, so the world made one up
+    seed = None
+    if botwar_replay.is_binary(replay_file):
+        seed = world.seed
+    return (replay_file, robots, winner, seed, world.turn, None)
+
+def init_worker():
+    logger.setLevel(logging.CRITICAL)
+
+def replay_files(paths):
+    # Replays named on the command line, or found in directories named there
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, subdirectories, filenames in os.walk(path):
+                subdirectories.sort()
+                for filename in sorted(filenames):
+                    files.append(os.path.join(directory, filename))
+        else:
+            files.append(path)
+    return files
+
+def add_replays(ladder, paths, processes=None):
+    # Replays are played through in parallel but added in order, as Elo
+    # ratings depend on the order games are played in.  Replays already in
+    # the ladder are skipped, so the same archive can be added again as it
+    # grows
+    files = [replay_file for replay_file in replay_files(paths) if not ladder.has_source(os.path.abspath(replay_file))]
+    if len(files) == 0:
+        return 0
+    pool = multiprocessing.Pool(processes, init_worker)
+    added = 0
+    try:
+        for replay_file, robots, winner, seed, turns, error in pool.imap(replay_outcome, files, 16):
+            if error is not None:
+                logger.error("%s: %s", replay_file, error)
+                continue
+            ladder.add(robots, winner, os.path.abspath(replay_file), seed, turns)
+            added += 1
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+        ladder.commit()
+    return added
+
+def usage():
+    print "Usage: %s [ --k=N ] [ --processes=N ] <ladder.db> [ <replay> | <directory> .. ]" % sys.argv[0]
+
+def main():
+    k = DEFAULT_K
+    processes = None
+    paths = []
+
+    for arg in sys.argv[1:]:
+        if arg.startswith('--'):
+            arglist = arg[2:].split('=', 1)
+            if len(arglist) != 2:
+                print "You must specify a value with --%s" % (arglist[0])
+                sys.exit(1)
+            try:
+                value = float(arglist[1])
+            except ValueError:
+                print "--%s must be a number" % (arglist[0])
+                sys.exit(1)
+            if arglist[0] == 'k':
+                k = value
+            elif arglist[0] == 'processes':
+                processes = int(value)
+            else:
+                print "Unrecognized argument %s" % (arg)
+                sys.exit(1)
+        else:
+            paths.append(arg)
+
+    if len(paths) < 1:
+        usage()
+        sys.exit(1)
+
+    logging.basicConfig(
+            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+            level=logging.ERROR)
+    ladder = Ladder(paths[0], k)
+    try:
+        added = add_replays(ladder, paths[1:], processes)
+    finally:
+        ladder.close()
+    if len(paths) > 1:
+        print "Added %i replays" % added
+    ladder.show()
+
+if __name__ == '__main__':
+    main()
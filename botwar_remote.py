@@ -0,0 +1,422 @@
+#!/usr/bin/python
+
+import botwar
+import logging
+import os
+import select
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+logger = logging.getLogger()
+
+# Robots connect to the engine and say which robot they are.  The engine then
+# sends one line per message and the robot answers each with one line:
+#
+#   robot:  hello <key> <name>
+#   engine: reset                   robot: ok
+#   engine: turn <turn> <max_energy> <max_life> <energy> <life>
+#           <location_x> <location_y>
+#           <enemy_location_x> <enemy_location_y> <enemy_location_age>
+#           <powerup_location_x> <powerup_location_y> <powerup_location_age>
+#           <robot_direction> <turret_direction>
+#                                   robot: <command> [<argument> ..]
+#                                      or: error <message>
+#
+# key is what robots are asked for by, as remote:<key>.  Connections are kept
+# once a game is over, for the next game that wants a robot with that key
+
+DEFAULT_TIMEOUT = 30.0
+REMOTE_PREFIX = "remote:"
+
+class RemoteError(Exception):
+    pass
+
+def parse_address(address):
+    # tcp:host:port or unix:path
+    kind, sep, rest = address.partition(":")
+    if kind == "tcp":
+        host, sep, port = rest.rpartition(":")
+        try:
+            return socket.AF_INET, (host, int(port))
+        except ValueError:
+            pass
+    elif kind == "unix" and rest != "":
+        return socket.AF_UNIX, rest
+    raise RemoteError("Addresses must be tcp:host:port or unix:path, not %s" % address)
+
+class Connection(object):
+    key = None
+    name = None
+
+    def __init__(self, sock, timeout=DEFAULT_TIMEOUT):
+        self.sock = sock
+        self.sock.settimeout(timeout)
+        self.reader = sock.makefile("rb")
+        words = self.read().split(None, 2)
+        if len(words) != 3 or words[0] != "hello":
+            raise RemoteError("Robot didn't say hello")
+        self.key = words[1]
+        self.name = words[2]
+
+    def read(self):
+        try:
+            line = self.reader.readline()
+        except socket.timeout:
+            raise RemoteError("%s took too long to answer" % self.name)
+        if not line.endswith("\n"):
+            raise RemoteError("%s has disconnected" % self.name)
+        return line[:-1]
+
+    def request(self, line):
+        self.sock.sendall(line + "\n")
+        return self.read()
+
+    # Robots only speak when asked, so a robot waiting for a game with
+    # something to read has disconnected
+    def is_idle(self):
+        try:
+            return len(select.select([self.sock], [], [], 0)[0]) == 0
+        except (select.error, socket.error):
+            return False
+
+    def close(self):
+        self.reader.close()
+        self.sock.close()
+
+class ConnectionPool(object):
+    """Robots that have connected to address and aren't in a game"""
+    address = None
+    timeout = None
+    listener = None
+    path = None
+    idle = None
+
+    def __init__(self, address, timeout=DEFAULT_TIMEOUT):
+        self.address = address
+        self.timeout = timeout
+        self.idle = {}
+        family, location = parse_address(address)
+        if family == socket.AF_UNIX:
+            self.path = location
+            if os.path.exists(location):
+                os.unlink(location)
+        self.listener = socket.socket(family, socket.SOCK_STREAM)
+        if family == socket.AF_INET:
+            self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind(location)
+        self.listener.listen(64)
+
+    # Take a robot that connected with key, waiting for one to connect if
+    # none are free.  Robots that disconnected while they waited are dropped
+    def acquire(self, key):
+        deadline = time.time() + self.timeout
+        while True:
+            connections = self.idle.get(key, [])
+            while len(connections) > 0:
+                connection = connections.pop()
+                if connection.is_idle():
+                    return connection
+                logger.warning("Dropping connection: %s has disconnected", connection.name)
+                connection.close()
+            remaining = deadline - time.time()
+            if remaining <= 0 or len(select.select([self.listener], [], [], remaining)[0]) == 0:
+                raise RemoteError("No robot connected as %s to %s" % (key, self.address))
+            sock, peer = self.listener.accept()
+            try:
+                connection = Connection(sock, self.timeout)
+            except (RemoteError, socket.error), e:
+                logger.warning("Dropping connection: %s", e)
+                sock.close()
+                continue
+            self.idle.setdefault(connection.key, []).append(connection)
+
+    def release(self, connection):
+        self.idle.setdefault(connection.key, []).append(connection)
+
+    def close(self):
+        for connections in self.idle.values():
+            for connection in connections:
+                connection.close()
+        self.idle = {}
+        self.listener.close()
+        if self.path is not None and os.path.exists(self.path):
+            os.unlink(self.path)
+
+# Pools by address, kept for as long as the process runs so every game loaded
+# with the same address uses the same connections
+pools = {}
+
+def get_pool(address, timeout=DEFAULT_TIMEOUT):
+    if address not in pools:
+        pools[address] = ConnectionPool(address, timeout)
+    return pools[address]
+
+def format_environment(environ):
+    return "turn %i %i %i %i %i %i %i %i %i %i %i %i %i %i %i" % (
+        environ.turn, environ.max_energy, environ.max_life, environ.energy, environ.life,
+        environ.location[0], environ.location[1],
+        environ.enemy_location[0], environ.enemy_location[1], environ.enemy_location[2],
+        environ.powerup_location[0], environ.powerup_location[1], environ.powerup_location[2],
+        environ.robot_direction, environ.turret_direction)
+
+def parse_command(line):
+    words = line.split()
+    if len(words) == 1:
+        return words[0]
+    return tuple(words)
+
+def format_command(command):
+    if type(command) in (list, tuple):
+        return " ".join([str(word) for word in command])
+    return str(command)
+
+class RemoteRobot(botwar.Robot):
+    """A robot in another process that has connected to the engine, which is
+    handed back to the pool when the game is closed.  A robot that fails to
+    reset is replaced by another that connected with the same key, or if
+    there are none, crashes on its first turn."""
+    pool = None
+    key = None
+    connection = None
+
+    def __init__(self, pool, key):
+        self.pool = pool
+        self.key = key
+        self.connection = pool.acquire(key)
+        botwar.Robot.__init__(self, self.connection.name, REMOTE_PREFIX + key, self.run_remote, "class", self.reset_remote)
+
+    def reset_remote(self):
+        while self.connection is not None:
+            try:
+                if self.connection.request("reset") == "ok":
+                    return
+                logger.warning("Dropping connection: %s didn't reset", self.name)
+            except (RemoteError, socket.error), e:
+                logger.warning("Dropping connection: %s", e)
+            self.drop()
+            try:
+                self.connection = self.pool.acquire(self.key)
+            except (RemoteError, socket.error), e:
+                logger.error("%s", e)
+
+    def run_remote(self, environ):
+        try:
+            line = self.connection.request(format_environment(environ))
+        except (RemoteError, socket.error):
+            self.drop()
+            raise
+        if line.startswith("error "):
+            raise RemoteError(line[6:])
+        return parse_command(line)
+
+    # Forget a connection that has stopped working
+    def drop(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def run_turn(self, turn):
+        if self.connection is None:
+            raise RemoteError("%s has disconnected" % self.name)
+        return botwar.Robot.run_turn(self, turn)
+
+    def close(self):
+        if self.connection is not None:
+            self.pool.release(self.connection)
+            self.connection = None
+
+def load_robots(pool, robot_files, count=None):
+    # The same as botwar.load_robots, taking robots named remote:<key> from
+    # the pool
+    if count is None:
+        count = len(robot_files)
+    robots = []
+    names = {}
+    for i in range(0, count):
+        robot_file = robot_files[i % len(robot_files)]
+        if robot_file.startswith(REMOTE_PREFIX):
+            try:
+                robot = RemoteRobot(pool, robot_file[len(REMOTE_PREFIX):])
+            except (RemoteError, socket.error), e:
+                logger.error("%s", e)
+                robot = None
+        else:
+            robot = botwar.load_robot(robot_file)
+        if robot is None:
+            for robot in robots:
+                robot.close()
+            return None
+        names[robot.name] = names.get(robot.name, 0) + 1
+        if names[robot.name] > 1:
+            robot.name = "%s-%i" % (robot.name, names[robot.name])
+        robots.append(robot)
+    return robots
+
+class StandIn(object):
+    """Plays a robot module over a connection to the engine, as a remote
+    robot would"""
+    def __init__(self, address, robot_file, timeout=DEFAULT_TIMEOUT):
+        family, location = parse_address(address)
+        self.robot_file = robot_file
+        self.robot = botwar.load_robot(robot_file)
+        if self.robot is None:
+            raise RemoteError("Unable to load %s" % robot_file)
+
+        # The engine may not be listening yet
+        deadline = time.time() + timeout
+        while True:
+            self.sock = socket.socket(family, socket.SOCK_STREAM)
+            try:
+                self.sock.connect(location)
+                break
+            except socket.error:
+                self.sock.close()
+                if time.time() >= deadline:
+                    raise
+                time.sleep(0.1)
+        self.reader = self.sock.makefile("rb")
+        key = os.path.basename(robot_file)
+        if key.endswith(".py"):
+            key = key[:-3]
+        self.sock.sendall("hello %s %s\n" % (key, self.robot.name))
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    # Answer one message, returning False once the engine has gone
+    def answer(self):
+        line = self.reader.readline()
+        if not line:
+            return False
+        words = line.split()
+        if words[0] == "reset":
+            # Every game gets a fresh copy of the robot
+            self.robot = botwar.load_robot(self.robot_file)
+            if self.robot.reset_function is not None:
+                self.robot.reset_function()
+            self.sock.sendall("ok\n")
+            return True
+        robot = self.robot
+        values = [int(word) for word in words[1:]]
+        (turn, robot.max_energy, robot.max_life, robot.energy, robot.life, x, y,
+         enemy_x, enemy_y, enemy_age, powerup_x, powerup_y, powerup_age,
+         robot.robot_direction, robot.turret_direction) = values
+        robot.location = (x, y)
+        robot.enemy_location = (enemy_x, enemy_y, enemy_age)
+        robot.powerup_location = (powerup_x, powerup_y, powerup_age)
+        try:
+            reply = format_command(robot.run_turn(turn))
+        except Exception, e:
+            reply = "error %s: %s" % (e.__class__.__name__, " ".join(str(e).split()))
+        self.sock.sendall(reply + "\n")
+        return True
+
+def stand_in(address, robot_files, connections=1):
+    # Connect each robot connections times and answer the engine until it
+    # closes them all
+    if os.getcwd() not in sys.path:
+        sys.path.append(os.getcwd())
+    clients = []
+    for robot_file in robot_files:
+        for i in range(0, connections):
+            clients.append(StandIn(address, robot_file))
+    while len(clients) > 0:
+        readable = select.select(clients, [], [])[0]
+        for client in readable:
+            if not client.answer():
+                clients.remove(client)
+
+def play(arguments, games):
+    # Play games with botwar.load(arguments), returning turns per second
+    turns = 0
+    elapsed = 0.0
+    for game in range(0, games):
+        world = botwar.load(["--seed=%i" % game] + arguments)
+        world.quiet = True
+        world.start()
+        start = time.time()
+        while not world.game_over:
+            world.next_turn()
+        elapsed += time.time() - start
+        turns += world.turn
+        world.close()
+    return turns / elapsed
+
+def bench(robot_files, games):
+    # Compare playing the robots in the engine with playing them through
+    # stand-ins over a Unix socket
+    directory = tempfile.mkdtemp()
+    address = "unix:" + os.path.join(directory, "botwar.sock")
+    get_pool(address)
+    keys = [os.path.basename(robot_file).replace(".py", "") for robot_file in robot_files]
+    client = subprocess.Popen([sys.executable, os.path.abspath(__file__), "stand-in", address] + robot_files)
+    try:
+        local = play(robot_files, games)
+        remote = play(["--listen=" + address] + [REMOTE_PREFIX + key for key in keys], games)
+    finally:
+        pools.pop(address).close()
+        client.wait()
+        os.rmdir(directory)
+    print "In process: %10.0f turns per second" % local
+    print "Remote:     %10.0f turns per second" % remote
+
+def usage():
+    print "Usage: %s stand-in <address> [ --connections=N ] <robot.py> [ <robot.py> .. ]" % sys.argv[0]
+    print "       %s bench [ --games=N ] <robot.py> <robot.py>" % sys.argv[0]
+    print "Addresses are tcp:host:port or unix:path"
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ("stand-in", "bench"):
+        usage()
+        sys.exit(1)
+    command = sys.argv[1]
+    arguments = sys.argv[2:]
+    if command == "stand-in":
+        if len(arguments) < 2:
+            usage()
+            sys.exit(1)
+        address = arguments.pop(0)
+    connections = 1
+    games = 20
+    robot_files = []
+    for arg in arguments:
+        if arg.startswith('--'):
+            arglist = arg[2:].split('=', 1)
+            if len(arglist) != 2 or arglist[0] not in ('connections', 'games'):
+                print "Unrecognized argument %s" % (arg)
+                sys.exit(1)
+            try:
+                value = int(arglist[1])
+            except ValueError:
+                print "--%s must be a number" % (arglist[0])
+                sys.exit(1)
+            if arglist[0] == 'connections':
+                connections = value
+            else:
+                games = value
+        else:
+            robot_files.append(arg)
+
+    logging.basicConfig(
+            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+            level=logging.ERROR)
+    if command == "stand-in":
+        try:
+            stand_in(address, robot_files, connections)
+        except (RemoteError, socket.error), e:
+            print "ERROR: %s" % e
+            sys.exit(1)
+    else:
+        if len(robot_files) < 2:
+            usage()
+            sys.exit(1)
+        bench(robot_files, games)
+
+if __name__ == '__main__':
+    # botwar.load finds pools through botwar_remote, so play with that module
+    # rather than this copy run as __main__
+    import botwar_remote
+    botwar_remote.main()
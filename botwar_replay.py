@@ -0,0 +1,741 @@
+#!/usr/bin/python
+
+import atexit
+import collections
+import cStringIO
+import Queue
+import struct
+import sys
+import threading
+import zlib
+
+# Saved games come in two formats.  The text format is one line per item,
+# and is kept readable by older versions, so it doesn't record the seed or
+# robot paths:
+#
+#   [size WIDTH HEIGHT]      only for boards that aren't the standard size
+#   X Y                      one line per powerup
+#   endpu
+#   NAME                     two lines per robot
+#   X Y
+#   endrb
+#   COMMAND                  one line per command, or "cr NAME" for a crash
+#
+# The binary format is a fixed header, one record per command and an index
+# of turn offsets at the end.  All numbers are little endian:
+#
+#   header   "BWR" VERSION(u8) WIDTH(u16) HEIGHT(u16) SEED(u64)
+#            POWERUPS(u16) then X(u16) Y(u16) for each powerup
+#            ROBOTS(u16) then NAME_LENGTH(u8) NAME X(u16) Y(u16)
+#            PATH_LENGTH(u8) PATH for each robot, PATH being empty if unknown
+#   records  one byte of (TURN_DELTA << 4) | CODE, where TURN_DELTA is the
+#            number of turns since the previous record.  A TURN_DELTA of 15
+#            means a varint of TURN_DELTA - 15 follows.  CODE is one of
+#            COMMAND_CODES, CODE_OTHER or CODE_CRASH (both followed by
+#            LENGTH(u8) TEXT), CODE_KEYFRAME, CODE_MOVE (followed by X(u16)
+#            Y(u16), where the robot whose turn it is moved to), CODE_HIT
+#            (followed by TARGET(u16), the robot hit by the laser or EMP of
+#            the robot whose turn it is) or CODE_END, which ends the records
+#   keyframe the full game state before the record's turn is played:
+#            POWERUPS(u16) then X(u16) Y(u16) for each powerup
+#            ROBOTS(u16) then for each robot X(u16) Y(u16)
+#            ROBOT_DIRECTION(u8) TURRET_DIRECTION(u8) ENERGY(i32) LIFE(i32)
+#            PLAYING(u8) ENEMY_X(i32) ENEMY_Y(i32) ENEMY_AGE(i32)
+#            POWERUP_X(i32) POWERUP_Y(i32) POWERUP_AGE(i32)
+#            LAST_COMMAND_LENGTH(u8) LAST_COMMAND
+#   index    ENTRIES(u32) then TURN(u32) BASE(u32) OFFSET(u32) for each
+#            keyframe, where BASE is the turn the keyframe's TURN_DELTA
+#            counts from
+#   trailer  INDEX_OFFSET(u32) "BWRI"
+#
+# Keyframes are written every KEYFRAME_INTERVAL turns, starting with turn 1,
+# and once more when the save is closed with the state the game ended in.
+# A game that was cut short has no index or trailer, and is read up to the
+# end of the file.
+#
+# Either format can be gzip compressed by adding .gz to the file name, as in
+# game.bwr.gz or game.txt.gz, and is read the same way as the uncompressed
+# file.
+
+MAGIC = "BWR"
+VERSION = 1
+TRAILER_MAGIC = "BWRI"
+KEYFRAME_INTERVAL = 64
+
+CODE_END = 0
+COMMAND_CODES = {"w": 1, "se": 2, "sp": 3, "lt": 4, "rt": 5, "fd": 6, "bk": 7, "emp": 8, "laser": 9}
+CODE_OTHER = 10
+CODE_CRASH = 11
+CODE_KEYFRAME = 12
+CODE_MOVE = 13
+CODE_HIT = 14
+ROBOT_STATE = struct.Struct("<HHBBiiBiiiiii")
+CODE_COMMANDS = dict([(code, command) for command, code in COMMAND_CODES.items()])
+GZIP_MAGIC = "\x1f\x8b"
+# zlib's window bits for reading and writing gzip rather than zlib streams
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+# Bytes held before they're handed to the compressing thread, and how many
+# of those chunks can wait for it before writing blocks
+COMPRESS_BUFFER_SIZE = 65536
+COMPRESS_QUEUE_SIZE = 16
+
+class ReplayError(ValueError):
+    pass
+
+# size, seed and paths are None if the savegame doesn't record them, robots
+# is a (name, location) pair for each robot, paths the robot.path of each, and
+# moves whether the savegame records every move and hit, which only binary
+# saves do
+Header = collections.namedtuple("Header", "size powerups robots seed paths moves")
+
+# Records yielded by read_records after the Header.  turn is the engine's turn
+# number and seat the index of the robot in the header, both None in text
+# saves, which don't record them.  robots in a Keyframe is a RobotState for
+# each seat
+Command = collections.namedtuple("Command", "turn seat command")
+Crash = collections.namedtuple("Crash", "turn seat name")
+Keyframe = collections.namedtuple("Keyframe", "turn powerups robots")
+Move = collections.namedtuple("Move", "turn seat location")
+Hit = collections.namedtuple("Hit", "turn seat target")
+RobotState = collections.namedtuple("RobotState", "location robot_direction turret_direction energy life playing "
+                                    "enemy_location powerup_location last_command")
+
+class TextReplayWriter(object):
+    fd = None
+    default_size = None
+
+    def __init__(self, fd, default_size):
+        self.fd = fd
+        self.default_size = default_size
+
+    def header(self, size, powerups, robots, seed, paths=None):
+        if size != self.default_size:
+            self.fd.write("size %i %i\n" % (size[0], size[1]))
+        for powerup in powerups:
+            self.fd.write("%i %i\n" % (powerup[0], powerup[1]))
+        self.fd.write("endpu\n")
+        for name, location in robots:
+            self.fd.write("%s\n" % (name))
+            self.fd.write("%i %i\n" % (location[0], location[1]))
+        self.fd.write("endrb\n")
+
+    def command(self, turn, command):
+        self.fd.write("%s\n" % command)
+
+    def crash(self, turn, name):
+        self.fd.write("cr %s\n" % name)
+
+    # Older versions couldn't skip keyframes, so text saves don't have them
+    def keyframe(self, turn, state):
+        pass
+
+    def move(self, turn, location):
+        pass
+
+    def hit(self, turn, target):
+        pass
+
+    def close(self):
+        self.fd.close()
+
+class CompressedFile(object):
+    """A file opened for writing that gzip compresses whatever is written to
+    it.  Writes are gathered in memory and handed in chunks through a
+    bounded queue to a thread that compresses and writes them, so the game
+    doesn't wait on compression or the disk unless the thread falls a whole
+    queue behind.  Anything still open when the program exits, including
+    when it stops on an exception, is finished off so the file can be read."""
+    fd = None
+    buffer = None
+    buffered = 0
+    queue = None
+    thread = None
+    error = None
+
+    def __init__(self, fd, level=6, buffer_size=COMPRESS_BUFFER_SIZE, queue_size=COMPRESS_QUEUE_SIZE):
+        self.fd = fd
+        self.buffer = []
+        self.buffered = 0
+        self.buffer_size = buffer_size
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, GZIP_WBITS)
+        self.queue = Queue.Queue(queue_size)
+        self.thread = threading.Thread(target=self.run, name="replay compressor")
+        self.thread.daemon = True
+        self.thread.start()
+        open_files.add(self)
+
+    def run(self):
+        while True:
+            data = self.queue.get()
+            if data is None:
+                if self.error is None:
+                    try:
+                        self.fd.write(self.compressor.flush())
+                    except Exception, e:
+                        self.error = e
+                return
+            if self.error is not None:
+                continue
+            try:
+                self.fd.write(self.compressor.compress(data))
+            except Exception, e:
+                # Raised again from the next write or close
+                self.error = e
+
+    def write(self, data):
+        if self.error is not None:
+            raise self.error
+        self.buffer.append(data)
+        self.buffered += len(data)
+        if self.buffered >= self.buffer_size:
+            self.flush()
+
+    # Hand what's been written so far to the compressing thread
+    def flush(self):
+        if len(self.buffer) > 0:
+            self.queue.put("".join(self.buffer))
+            self.buffer = []
+            self.buffered = 0
+
+    def close(self):
+        if self.thread is None:
+            return
+        self.flush()
+        self.queue.put(None)
+        self.thread.join()
+        self.thread = None
+        open_files.discard(self)
+        self.fd.close()
+        if self.error is not None:
+            raise self.error
+
+class DecompressedFile(object):
+    """A gzip compressed file opened for reading, decompressed a chunk at a
+    time as it's read, so a save can be read from start to end without
+    holding all of it in memory.  It can't be seeked, so compressed games
+    that are replayed are read with open_compressed instead."""
+    fd = None
+    decompressor = None
+    buffer = ""
+    offset = 0
+    finished = False
+
+    def __init__(self, fd, buffer_size=COMPRESS_BUFFER_SIZE):
+        self.fd = fd
+        self.buffer_size = buffer_size
+        self.decompressor = zlib.decompressobj(GZIP_WBITS)
+        self.buffer = ""
+        self.offset = 0
+        self.finished = False
+
+    # Decompress the next chunk into the buffer, returning False at the end
+    def fill(self):
+        while not self.finished:
+            data = self.fd.read(self.buffer_size)
+            try:
+                if data == "":
+                    self.finished = True
+                    data = self.decompressor.flush()
+                else:
+                    data = self.decompressor.decompress(data)
+            except zlib.error, e:
+                raise ReplayError("Unable to decompress savegame: %s" % e)
+            if data != "":
+                self.buffer = self.buffer[self.offset:] + data
+                self.offset = 0
+                return True
+        return False
+
+    # Returns what's next without reading past it
+    def peek(self, length):
+        while len(self.buffer) - self.offset < length and self.fill():
+            pass
+        return self.buffer[self.offset:self.offset + length]
+
+    def read(self, length=-1):
+        while (length < 0 or len(self.buffer) - self.offset < length) and self.fill():
+            pass
+        if length < 0:
+            length = len(self.buffer) - self.offset
+        data = self.buffer[self.offset:self.offset + length]
+        self.offset += len(data)
+        return data
+
+    def readline(self):
+        end = self.buffer.find("\n", self.offset)
+        while end < 0 and self.fill():
+            end = self.buffer.find("\n", self.offset)
+        if end < 0:
+            end = len(self.buffer) - 1
+        data = self.buffer[self.offset:end + 1]
+        self.offset += len(data)
+        return data
+
+    def close(self):
+        self.fd.close()
+
+# Compressed files that haven't been closed yet
+open_files = set()
+
+def close_open_files():
+    for f in list(open_files):
+        try:
+            f.close()
+        except:
+            pass
+
+atexit.register(close_open_files)
+
+def varint(value):
+    data = []
+    while value >= 0x80:
+        data.append(chr((value & 0x7f) | 0x80))
+        value >>= 7
+    data.append(chr(value))
+    return "".join(data)
+
+# Text is saved with a one byte length, so anything longer is cut short
+def text_field(text):
+    text = "%s" % (text,)
+    return chr(min(len(text), 255)) + text[:255]
+
+class BinaryReplayWriter(object):
+    fd = None
+    offset = 0
+    last_turn = 0
+    index = None
+
+    def __init__(self, fd):
+        self.fd = fd
+        self.offset = 0
+        self.last_turn = 0
+        self.index = []
+
+    def write(self, data):
+        self.fd.write(data)
+        self.offset += len(data)
+
+    def header(self, size, powerups, robots, seed, paths=None):
+        data = [MAGIC, struct.pack("<BHHQH", VERSION, size[0], size[1], seed, len(powerups))]
+        for powerup in powerups:
+            data.append(struct.pack("<HH", powerup[0], powerup[1]))
+        data.append(struct.pack("<H", len(robots)))
+        for i in range(0, len(robots)):
+            name, location = robots[i]
+            path = ""
+            if paths is not None and paths[i] is not None:
+                path = paths[i]
+            data.append(text_field(name) + struct.pack("<HH", location[0], location[1]) + text_field(path))
+        self.write("".join(data))
+
+    def record(self, turn, code):
+        delta = turn - self.last_turn
+        self.last_turn = turn
+        if delta < 15:
+            self.write(chr((delta << 4) | code))
+        else:
+            self.write(chr(0xf0 | code) + varint(delta - 15))
+
+    def command(self, turn, command):
+        code = COMMAND_CODES.get(command)
+        if code is not None:
+            self.record(turn, code)
+        else:
+            self.record(turn, CODE_OTHER)
+            self.write(text_field(command))
+
+    def crash(self, turn, name):
+        self.record(turn, CODE_CRASH)
+        self.write(text_field(name))
+
+    def move(self, turn, location):
+        self.record(turn, CODE_MOVE)
+        self.write(struct.pack("<HH", location[0], location[1]))
+
+    # target is the seat of the robot that was hit
+    def hit(self, turn, target):
+        self.record(turn, CODE_HIT)
+        self.write(struct.pack("<H", target))
+
+    # state is (powerups, robots) as returned by World.get_state()
+    def keyframe(self, turn, state):
+        self.index.append((turn, self.last_turn, self.offset))
+        self.record(turn, CODE_KEYFRAME)
+        powerups, robots = state
+        data = [struct.pack("<H", len(powerups))]
+        for powerup in powerups:
+            data.append(struct.pack("<HH", powerup[0], powerup[1]))
+        data.append(struct.pack("<H", len(robots)))
+        for (location, robot_direction, turret_direction, energy, life, playing,
+             enemy_location, powerup_location, last_command) in robots:
+            data.append(ROBOT_STATE.pack(location[0], location[1],
+                                         robot_direction, turret_direction, energy, life, playing,
+                                         enemy_location[0], enemy_location[1], enemy_location[2],
+                                         powerup_location[0], powerup_location[1], powerup_location[2]))
+            if last_command is None:
+                last_command = ""
+            data.append(text_field(last_command))
+        self.write("".join(data))
+
+    def close(self):
+        self.write(chr(CODE_END))
+        index_offset = self.offset
+        data = [struct.pack("<I", len(self.index))]
+        for entry in self.index:
+            data.append(struct.pack("<III", *entry))
+        data.append(struct.pack("<I", index_offset) + TRAILER_MAGIC)
+        self.write("".join(data))
+        self.fd.close()
+
+class TextReplayReader(object):
+    fd = None
+
+    def __init__(self, fd):
+        self.fd = fd
+
+    def read_line(self):
+        data = self.fd.readline()
+        if data == "":
+            raise ReplayError("Savegame ended unexpectedly")
+        return data[:-1]
+
+    def read_location(self, data, what):
+        try:
+            data = data.split(" ", 1)
+            return (int(data[0]), int(data[1]))
+        except:
+            raise ReplayError("Error loading %s from savegame" % what)
+
+    def read_header(self):
+        size = None
+        powerups = []
+        robots = []
+        data = self.read_line()
+        if data.startswith("size "):
+            try:
+                data = data.split(" ", 2)
+                size = (int(data[1]), int(data[2]))
+            except:
+                raise ReplayError("Error loading board size from savegame")
+            data = self.read_line()
+        while data != "endpu":
+            powerups.append(self.read_location(data, "powerups"))
+            data = self.read_line()
+        data = self.read_line()
+        while data != "endrb":
+            name = data.strip()
+            data = self.read_line()
+            if data == "endrb":
+                raise ReplayError("Missing robot information in savegame")
+            robots.append((name, self.read_location(data, "robot")))
+            data = self.read_line()
+        return Header(size, powerups, robots, None, None, False)
+
+    # Returns the next command, "cr NAME" for a crash, or None at the end
+    def read_command(self):
+        data = self.fd.readline()
+        if data == "":
+            return None
+        return data[:-1].strip()
+
+    def close(self):
+        self.fd.close()
+
+class BinaryReplayReader(object):
+    fd = None
+    turn = 0
+    index = None
+    finished = False
+    ended = False
+
+    def __init__(self, fd):
+        self.fd = fd
+        self.turn = 0
+        self.index = None
+        self.finished = False
+        self.ended = False
+
+    def read(self, length):
+        data = self.fd.read(length)
+        if len(data) != length:
+            raise ReplayError("Savegame ended unexpectedly")
+        return data
+
+    def read_text(self):
+        return self.read(ord(self.read(1)))
+
+    def read_header(self):
+        if self.read(len(MAGIC)) != MAGIC:
+            raise ReplayError("Not a binary savegame")
+        version, width, height = struct.unpack("<BHH", self.read(5))
+        if version != VERSION:
+            raise ReplayError("Unsupported savegame version %i" % version)
+        seed, = struct.unpack("<Q", self.read(8))
+        count, = struct.unpack("<H", self.read(2))
+        powerups = []
+        for i in range(0, count):
+            powerups.append(struct.unpack("<HH", self.read(4)))
+        robots = []
+        paths = []
+        count, = struct.unpack("<H", self.read(2))
+        for i in range(0, count):
+            name = self.read_text()
+            robots.append((name, struct.unpack("<HH", self.read(4))))
+            paths.append(self.read_text() or None)
+        return Header((width, height), powerups, robots, seed, paths, True)
+
+    def read_keyframe(self):
+        count, = struct.unpack("<H", self.read(2))
+        powerups = [struct.unpack("<HH", self.read(4)) for i in range(0, count)]
+        robots = []
+        count, = struct.unpack("<H", self.read(2))
+        for i in range(0, count):
+            values = ROBOT_STATE.unpack(self.read(ROBOT_STATE.size))
+            last_command = self.read_text()
+            if last_command == "":
+                last_command = None
+            robots.append(((values[0], values[1]), values[2], values[3], values[4], values[5], values[6] == 1,
+                           values[7:10], values[10:13], last_command))
+        return powerups, robots
+
+    # Returns (turn, code, data) for the next record, or None at the end.
+    # data is the text of other commands and crashes, the (powerups, robots)
+    # state of keyframes, the location of moves and the target of hits.  ended is only set once
+    # the records end with CODE_END rather than the end of the file
+    def read_record(self):
+        if self.finished:
+            return None
+        data = self.fd.read(1)
+        if data == "":
+            self.finished = True
+            return None
+        code = ord(data) & 0x0f
+        if code == CODE_END:
+            self.finished = True
+            self.ended = True
+            return None
+        delta = ord(data) >> 4
+        if delta == 15:
+            shift = 0
+            value = 0
+            while True:
+                byte = ord(self.read(1))
+                value |= (byte & 0x7f) << shift
+                shift += 7
+                if byte < 0x80:
+                    break
+            delta += value
+        self.turn += delta
+        text = None
+        if code == CODE_OTHER or code == CODE_CRASH:
+            text = self.read_text()
+        elif code == CODE_KEYFRAME:
+            text = self.read_keyframe()
+        elif code == CODE_MOVE:
+            text = struct.unpack("<HH", self.read(4))
+        elif code == CODE_HIT:
+            text, = struct.unpack("<H", self.read(2))
+        elif code not in CODE_COMMANDS:
+            raise ReplayError("Unknown record type %i in savegame" % code)
+        return self.turn, code, text
+
+    def read_command(self):
+        record = self.read_record()
+        while record is not None and record[1] in (CODE_KEYFRAME, CODE_MOVE, CODE_HIT):
+            record = self.read_record()
+        if record is None:
+            return None
+        turn, code, text = record
+        if code == CODE_CRASH:
+            return "cr %s" % text
+        if code == CODE_OTHER:
+            return text
+        return CODE_COMMANDS[code]
+
+    # Whether the rest of the save, read once the records have ended, is a
+    # whole index and trailer.  Unlike read_index this reads on rather than
+    # seeking, so works on compressed saves read as they're decompressed
+    def read_trailer(self):
+        rest = self.fd.read()
+        if len(rest) < 12 or rest[-4:] != TRAILER_MAGIC:
+            return False
+        count, = struct.unpack("<I", rest[:4])
+        return len(rest) == 4 + count * 12 + 8
+
+    # Returns a list of (turn, base, offset) for each keyframe, or None if the
+    # game has no index
+    def read_index(self):
+        if self.index is not None:
+            return self.index
+        position = self.fd.tell()
+        try:
+            self.fd.seek(-8, 2)
+            index_offset, magic = struct.unpack("<I4s", self.fd.read(8))
+            if magic != TRAILER_MAGIC:
+                return None
+            self.fd.seek(index_offset)
+            count, = struct.unpack("<I", self.read(4))
+            self.index = [struct.unpack("<III", self.read(12)) for i in range(0, count)]
+        finally:
+            self.fd.seek(position)
+        return self.index
+
+    # Move to the last keyframe at or before turn, and return its turn and
+    # the (powerups, robots) state before that turn was played
+    def seek_keyframe(self, turn):
+        index = self.read_index()
+        if not index:
+            raise ReplayError("Savegame has no keyframes")
+        found = None
+        for entry in index:
+            if entry[0] > turn:
+                break
+            found = entry
+        if found is None:
+            raise ReplayError("Savegame has no keyframe before turn %i" % turn)
+        self.fd.seek(found[2])
+        self.turn = found[1]
+        self.finished = False
+        turn, code, state = self.read_record()
+        return turn, state
+
+    def close(self):
+        self.fd.close()
+
+def is_compressed(filename):
+    fd = open(filename, 'rb')
+    try:
+        return fd.read(len(GZIP_MAGIC)) == GZIP_MAGIC
+    finally:
+        fd.close()
+
+def open_compressed(filename):
+    # Compressed games are read into memory, where they can be seeked.  A
+    # game that was cut short is read as far as it goes
+    fd = open(filename, 'rb')
+    try:
+        return cStringIO.StringIO(zlib.decompressobj(GZIP_WBITS).decompress(fd.read()))
+    except zlib.error, e:
+        raise ReplayError("Unable to decompress %s: %s" % (filename, e))
+    finally:
+        fd.close()
+
+def is_binary(filename):
+    if is_compressed(filename):
+        fd = DecompressedFile(open(filename, 'rb'))
+    else:
+        fd = open(filename, 'rb')
+    try:
+        return fd.read(len(MAGIC)) == MAGIC
+    finally:
+        fd.close()
+
+# Compressed games are read into memory where they can be seeked, unless
+# stream is set, when they're decompressed as they're read
+def open_reader(filename, stream=False):
+    if is_compressed(filename) and stream:
+        fd = DecompressedFile(open(filename, 'rb'))
+        if fd.peek(len(MAGIC)) == MAGIC:
+            return BinaryReplayReader(fd)
+        return TextReplayReader(fd)
+    if is_compressed(filename):
+        fd = open_compressed(filename)
+        if fd.read(len(MAGIC)) == MAGIC:
+            fd.seek(0)
+            return BinaryReplayReader(fd)
+        fd.seek(0)
+        return TextReplayReader(fd)
+    if is_binary(filename):
+        return BinaryReplayReader(open(filename, 'rb'))
+    return TextReplayReader(open(filename, 'r'))
+
+def read_records(filename):
+    # Yields the Header of a saved game of either format and then a record
+    # for each command, crash, keyframe, move and hit in the order they were
+    # saved, without setting up a game.  Unlike replaying, a binary save that
+    # was cut short raises ReplayError once its records run out.  Compressed
+    # saves are decompressed as they're read
+    reader = open_reader(filename, True)
+    try:
+        header = reader.read_header()
+        yield header
+        seats = dict([(header.robots[seat][0], seat) for seat in range(0, len(header.robots))])
+        if isinstance(reader, TextReplayReader):
+            command = reader.read_command()
+            while command is not None:
+                if command.startswith("cr "):
+                    yield Crash(None, seats.get(command[3:]), command[3:])
+                else:
+                    yield Command(None, None, command)
+                command = reader.read_command()
+            return
+        robot_count = len(header.robots)
+        record = reader.read_record()
+        while record is not None:
+            turn, code, data = record
+            if code == CODE_KEYFRAME:
+                powerups, robots = data
+                yield Keyframe(turn, powerups, [RobotState(*robot) for robot in robots])
+            elif code == CODE_MOVE:
+                yield Move(turn, turn % robot_count, data)
+            elif code == CODE_HIT:
+                yield Hit(turn, turn % robot_count, data)
+            elif code == CODE_CRASH:
+                yield Crash(turn, seats.get(data), data)
+            elif code == CODE_OTHER:
+                yield Command(turn, turn % robot_count, data)
+            else:
+                yield Command(turn, turn % robot_count, CODE_COMMANDS[code])
+            record = reader.read_record()
+        if not reader.ended or not reader.read_trailer():
+            raise ReplayError("Savegame was cut short")
+    finally:
+        reader.close()
+
+def open_writer(filename, default_size):
+    # Games are saved in the binary format if the file ends in .bwr, and
+    # compressed if that's followed by .gz
+    if filename.endswith(".gz"):
+        fd = CompressedFile(open(filename, 'wb'))
+        filename = filename[:-3]
+    elif filename.endswith(".bwr"):
+        fd = open(filename, 'wb')
+    else:
+        fd = open(filename, 'w')
+    if filename.endswith(".bwr"):
+        return BinaryReplayWriter(fd)
+    return TextReplayWriter(fd, default_size)
+
+def convert(text_file, binary_file):
+    # Replays the text game through the engine a turn at a time, as the text
+    # format doesn't record which turn each command was in
+    import botwar
+
+    world = botwar.World(botwar.DEFAULT_SIZE, None, text_file, None, [])
+    if binary_file.endswith(".gz"):
+        fd = CompressedFile(open(binary_file, 'wb'))
+    else:
+        fd = open(binary_file, 'wb')
+    world.save_writer = BinaryReplayWriter(fd)
+    world.quiet = True
+    world.start()
+    while not world.game_over:
+        world.next_turn()
+    world.close()
+    return world.turn
+
+def usage():
+    print "Usage: %s convert <savegame.txt> <savegame.bwr[.gz]>" % sys.argv[0]
+
+def main():
+    if len(sys.argv) != 4 or sys.argv[1] != "convert":
+        usage()
+        sys.exit(1)
+    try:
+        convert(sys.argv[2], sys.argv[3])
+    except ReplayError, e:
+        print "ERROR: %s" % e
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+#!/usr/bin/python
+
+import sqlite3
+import sys
+import time
+
+from botwar_events import TurnStart, TurnEnd, Command
+
+DEFAULT_BATCH = 50
+# Seconds to wait for another writer to finish before giving up
+DEFAULT_TIMEOUT = 60.0
+
+# A row per match, a row per robot in each match with how it finished, and a
+# row per turn with the command played and the life and energy of the robot
+# whose turn it was
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS matches (
+    id INTEGER PRIMARY KEY,
+    played REAL NOT NULL,
+    seed TEXT,
+    turns INTEGER NOT NULL,
+    winner INTEGER,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS match_robots (
+    match INTEGER NOT NULL,
+    seat INTEGER NOT NULL,
+    robot TEXT NOT NULL,
+    name TEXT,
+    life INTEGER,
+    energy INTEGER,
+    playing INTEGER,
+    PRIMARY KEY (match, seat)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS match_robots_robot ON match_robots (robot);
+CREATE TABLE IF NOT EXISTS turns (
+    match INTEGER NOT NULL,
+    turn INTEGER NOT NULL,
+    seat INTEGER NOT NULL,
+    command TEXT,
+    life INTEGER NOT NULL,
+    energy INTEGER NOT NULL,
+    PRIMARY KEY (match, turn)
+) WITHOUT ROWID;
+"""
+
+class TurnStats(object):
+    """Collects a row of statistics for every turn of a game from the
+    world's events, as (turn, seat, command, life, energy).  command is the
+    command carried out after goto and face were worked out, or None if the
+    robot's command was wasted or it crashed.  Turns of robots that are
+    already dead are left out."""
+    seats = None
+    playing = False
+    command = None
+    turns = None
+
+    def __init__(self, world):
+        self.seats = {}
+        self.turns = []
+        for seat in range(0, len(world.robots)):
+            self.seats[world.robots[seat]] = seat
+        world.events.subscribe(self.turn_started, (TurnStart,))
+        world.events.subscribe(self.command_played, (Command,))
+        world.events.subscribe(self.turn_ended, (TurnEnd,))
+
+    def turn_started(self, event):
+        self.playing = event.robot.playing
+        self.command = None
+
+    def command_played(self, event):
+        self.command = event.command
+
+    def turn_ended(self, event):
+        if not self.playing:
+            return
+        robot = event.robot
+        self.turns.append((event.turn, self.seats[robot], self.command, robot.life, robot.energy))
+
+class ResultsStore(object):
+    """Match results kept in an SQLite database in WAL mode, so several
+    processes can add to the same database while others read it.
+
+    Matches are held until batch of them have finished, then written in one
+    transaction with a bulk insert of each match's robots and turns, so
+    call commit() or close() once the last match is in."""
+    db = None
+    batch = None
+    pending = None
+
+    def __init__(self, filename, batch=DEFAULT_BATCH, timeout=DEFAULT_TIMEOUT):
+        self.batch = batch
+        self.pending = []
+        self.db = sqlite3.connect(filename, timeout)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+
+    # Add a finished game, where robot_files are what each seat's robot was
+    # loaded from, and stats is the game's TurnStats if there is one
+    def add(self, world, robot_files, seed=None, stats=None):
+        robots = world.robots
+        alive = [seat for seat in range(0, len(robots)) if robots[seat].playing]
+        winner = None
+        if len(alive) == 1:
+            winner = alive[0]
+        rows = []
+        for seat in range(0, len(robots)):
+            robot = robots[seat]
+            rows.append((seat, robot_files[seat], robot.name, robot.life, robot.energy, int(robot.playing)))
+        turns = []
+        if stats is not None:
+            turns = stats.turns
+        self.queue((time.time(), seed, world.turn, winner, None), rows, turns)
+
+    # Add a game that couldn't be played
+    def add_error(self, robot_files, seed, error):
+        rows = [(seat, robot_files[seat], None, None, None, None) for seat in range(0, len(robot_files))]
+        self.queue((time.time(), seed, 0, None, error), rows, [])
+
+    def queue(self, match, rows, turns):
+        played, seed, turn_count, winner, error = match
+        # Seeds go up to 2**64 - 1, past what SQLite's integers hold
+        if seed is not None:
+            seed = str(seed)
+        self.pending.append(((played, seed, turn_count, winner, error), rows, turns))
+        if len(self.pending) >= self.batch:
+            self.commit()
+
+    def commit(self):
+        if len(self.pending) == 0:
+            return
+        with self.db:
+            for match, rows, turns in self.pending:
+                match_id = self.db.execute("INSERT INTO matches (played, seed, turns, winner, error) VALUES (?, ?, ?, ?, ?)",
+                                           match).lastrowid
+                self.db.executemany("INSERT INTO match_robots (match, seat, robot, name, life, energy, playing) "
+                                    "VALUES (%i, ?, ?, ?, ?, ?, ?)" % match_id, rows)
+                self.db.executemany("INSERT INTO turns (match, turn, seat, command, life, energy) "
+                                    "VALUES (%i, ?, ?, ?, ?, ?)" % match_id, turns)
+        self.pending = []
+
+    def close(self):
+        self.commit()
+        self.db.close()
+
+def show(filename, out=sys.stdout):
+    # Each robot's record across every match in the database
+    db = sqlite3.connect(filename, DEFAULT_TIMEOUT)
+    rows = db.execute("""
+        SELECT r.robot, COUNT(*),
+               SUM(m.winner = r.seat), SUM(m.winner IS NOT NULL AND m.winner != r.seat), SUM(m.winner IS NULL),
+               AVG(m.turns)
+        FROM match_robots r JOIN matches m ON m.id = r.match
+        WHERE m.error IS NULL
+        GROUP BY r.robot
+        ORDER BY SUM(m.winner = r.seat) DESC, r.robot""").fetchall()
+    db.close()
+    width = max([len(row[0]) for row in rows] + [5])
+    out.write("%-*s %6s %6s %6s %6s %9s\n" % (width, "Robot", "Games", "Wins", "Losses", "Draws", "Avg turns"))
+    for robot, games, wins, losses, draws, turns in rows:
+        out.write("%-*s %6i %6i %6i %6i %9.1f\n" % (width, robot, games, wins, losses, draws, turns))
+
+def usage():
+    print "Usage: %s <results.db>" % sys.argv[0]
+
+def main():
+    if len(sys.argv) != 2:
+        usage()
+        sys.exit(1)
+    show(sys.argv[1])
+
+if __name__ == '__main__':
+    main()
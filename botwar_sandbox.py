@@ -0,0 +1,208 @@
+#!/usr/bin/python
+
+import botwar
+import logging
+import multiprocessing
+import os
+import signal
+import struct
+import sys
+import time
+import traceback
+
+logger = logging.getLogger()
+
+# Messages to a worker are a type byte and, for a turn, a sequence number and
+# the robot's environment packed as integers.  Workers answer a turn with a
+# (sequence, ok, command) tuple, where command is the traceback if the robot
+# crashed, and a reset with an (ok, error) tuple
+TURN = struct.Struct("<cI15i")
+RESET = "R"
+
+class SandboxError(Exception):
+    pass
+
+def worker(conn, robot_file):
+    # Leave Ctrl-C to the engine, which stops the workers itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    robot = botwar.load_robot(robot_file)
+    if robot is None:
+        conn.send(None)
+        return
+    conn.send((robot.name, robot.path, robot.max_energy, robot.max_life))
+
+    while True:
+        try:
+            message = conn.recv_bytes()
+        except EOFError:
+            return
+        if message == RESET:
+            # Each game gets a fresh copy of the robot's module
+            robot = botwar.load_robot(robot_file)
+            if robot is None:
+                conn.send((False, "Unable to load %s" % robot_file))
+                return
+            try:
+                if robot.reset_function is not None:
+                    robot.reset_function()
+            except:
+                conn.send((False, traceback.format_exc()))
+                continue
+            conn.send((True, None))
+            continue
+        (kind, sequence, turn, robot.max_energy, robot.max_life, robot.energy, robot.life, x, y,
+         enemy_x, enemy_y, enemy_age, powerup_x, powerup_y, powerup_age,
+         robot.robot_direction, robot.turret_direction) = TURN.unpack(message)
+        robot.location = (x, y)
+        robot.enemy_location = (enemy_x, enemy_y, enemy_age)
+        robot.powerup_location = (powerup_x, powerup_y, powerup_age)
+        try:
+            conn.send((sequence, True, robot.run_turn(turn)))
+        except:
+            conn.send((sequence, False, traceback.format_exc()))
+
+class SandboxedRobot(botwar.Robot):
+    """A robot that runs in its own worker process, so a robot that crashes
+    or never returns can't take the engine down with it.  The worker lives as
+    long as the robot, and is only replaced when it has to be stopped.
+
+    If timeout is set, a robot that takes longer than that many seconds over
+    a turn either waits out the turn while it carries on thinking, with the
+    command it eventually returns thrown away, or crashes, depending on
+    timeout_action.  A robot still thinking about an earlier turn waits
+    without being sent the new one."""
+    robot_file = None
+    timeout = None
+    timeout_action = "wait"
+    process = None
+    conn = None
+    sequence = 0
+    outstanding = False
+
+    def __init__(self, robot_file, timeout=None, timeout_action="wait"):
+        self.robot_file = robot_file
+        self.timeout = timeout
+        self.timeout_action = timeout_action
+        info = self.start_worker()
+        if info is None:
+            raise SandboxError("Unable to load %s" % robot_file)
+        name, path, max_energy, max_life = info
+        botwar.Robot.__init__(self, name, path, self.run_worker, "class", self.reset_worker, max_energy, max_life)
+
+    def start_worker(self):
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=worker, args=(child_conn, self.robot_file))
+        self.process.daemon = True
+        self.process.start()
+        child_conn.close()
+        self.sequence = 0
+        self.outstanding = False
+        try:
+            return self.conn.recv()
+        except EOFError:
+            return None
+
+    def stop_worker(self):
+        if self.process is None:
+            return
+        self.conn.close()
+        self.process.terminate()
+        self.process.join()
+        self.process = None
+        self.conn = None
+
+    # Whether the worker is still thinking about a turn that timed out,
+    # dropping its answer if it has come in
+    def busy(self):
+        if self.outstanding:
+            try:
+                if self.conn.poll(0):
+                    self.conn.recv()
+                    self.outstanding = False
+            except EOFError:
+                self.stop_worker()
+                raise SandboxError("%s's worker has stopped" % self.name)
+        return self.outstanding
+
+    def reset_worker(self):
+        # A worker still thinking about a turn from the last game may never
+        # finish, so is replaced
+        if self.process is None or not self.process.is_alive() or self.busy():
+            self.stop_worker()
+            if self.start_worker() is None:
+                raise SandboxError("Unable to load %s" % self.robot_file)
+        self.conn.send_bytes(RESET)
+        try:
+            ok, error = self.conn.recv()
+        except EOFError:
+            self.stop_worker()
+            raise SandboxError("%s's worker has stopped" % self.name)
+        if not ok:
+            raise SandboxError(error)
+
+    def run_worker(self, environ):
+        if self.process is None:
+            raise SandboxError("%s has no worker" % self.name)
+        # Sending more turns to a worker that isn't reading them would fill
+        # the pipe and block the engine
+        if self.busy():
+            logger.warning("%s is still thinking about an earlier turn, so is waiting this turn", self.name)
+            return "w"
+        self.sequence += 1
+        self.conn.send_bytes(TURN.pack("T", self.sequence, environ.turn, environ.max_energy, environ.max_life,
+                                       environ.energy, environ.life,
+                                       environ.location[0], environ.location[1],
+                                       environ.enemy_location[0], environ.enemy_location[1],
+                                       environ.enemy_location[2],
+                                       environ.powerup_location[0], environ.powerup_location[1],
+                                       environ.powerup_location[2],
+                                       environ.robot_direction, environ.turret_direction))
+        self.outstanding = True
+        # Late answers to earlier turns don't give the robot any more time
+        if self.timeout is not None:
+            deadline = time.time() + self.timeout
+        while True:
+            if self.timeout is not None and not self.conn.poll(max(0, deadline - time.time())):
+                if self.timeout_action == "wait":
+                    logger.warning("%s took longer than %.3f seconds, so is waiting this turn", self.name, self.timeout)
+                    return "w"
+                self.stop_worker()
+                raise SandboxError("%s took longer than %.3f seconds" % (self.name, self.timeout))
+            try:
+                sequence, ok, command = self.conn.recv()
+            except EOFError:
+                self.stop_worker()
+                raise SandboxError("%s's worker has stopped" % self.name)
+
+            # Answers to turns that timed out come in late, and are dropped
+            if sequence != self.sequence:
+                continue
+            self.outstanding = False
+            if not ok:
+                raise SandboxError(command)
+            return command
+
+    def close(self):
+        self.stop_worker()
+
+def load_robots(robot_files, count=None, timeout=None, timeout_action="wait"):
+    # The same as botwar.load_robots, with each robot in its own worker
+    if count is None:
+        count = len(robot_files)
+    if os.getcwd() not in sys.path:
+        sys.path.append(os.getcwd())
+    robots = []
+    names = {}
+    for i in range(0, count):
+        try:
+            robot = SandboxedRobot(robot_files[i % len(robot_files)], timeout, timeout_action)
+        except SandboxError, e:
+            logger.error("%s", e)
+            for robot in robots:
+                robot.close()
+            return None
+        names[robot.name] = names.get(robot.name, 0) + 1
+        if names[robot.name] > 1:
+            robot.name = "%s-%i" % (robot.name, names[robot.name])
+        robots.append(robot)
+    return robots
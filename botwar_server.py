@@ -0,0 +1,214 @@
+#!/usr/bin/python
+
+import botwar
+import botwar_tournament
+import heapq
+import logging
+import select
+import sys
+import time
+import types
+
+from collections import deque
+
+logger = logging.getLogger()
+
+class Sleep(object):
+    """Yielded by a robot to be woken again after seconds have passed"""
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+class Readable(object):
+    """Yielded by a robot to be woken again once there's something to read
+    from f, which can be anything select() accepts"""
+    def __init__(self, f):
+        self.f = f
+
+class Match(object):
+    """A game played a turn at a time by the server.  Robots can be ordinary
+    robots, or have a run() that is a generator, which yields Sleep or
+    Readable while it waits on something and then yields its command.  While
+    a robot waits, the server plays the other matches."""
+    world = None
+    max_turns = None
+    error = None
+
+    def __init__(self, world, max_turns=None):
+        self.world = world
+        self.max_turns = max_turns
+
+    def play(self):
+        world = self.world
+        if not world.start():
+            self.error = "Unable to start game"
+            return
+        while not world.game_over:
+            if self.max_turns is not None and world.turn >= self.max_turns:
+                break
+            robot = world.begin_turn()
+            if robot.playing:
+                try:
+                    command = robot.run_turn(world.round)
+                    if type(command) == types.GeneratorType:
+                        thinking = command
+                        for command in thinking:
+                            if not isinstance(command, (Sleep, Readable)):
+                                break
+                            yield command
+                        else:
+                            raise ValueError("%s finished without sending a command" % robot.name)
+                        thinking.close()
+                except GeneratorExit:
+                    # The match itself is being closed, not the robot crashing
+                    raise
+                except:
+                    world.crash(robot)
+                else:
+                    world.play_command(robot, command)
+            world.end_turn(robot)
+
+            # Give the other matches a turn
+            yield None
+        world.close()
+
+class MatchServer(object):
+    """Plays many matches at once in one process, switching between them
+    whenever a robot is waiting and after every turn.  Robots that keep the
+    CPU busy still hold up every match, so this is for robots that spend
+    their time waiting on other processes or the network."""
+    ready = None
+    sleeping = None
+    reading = None
+    matches = 0
+
+    def __init__(self):
+        self.ready = deque()
+        self.sleeping = []
+        self.reading = {}
+        self.matches = 0
+
+    def add(self, match, callback=None):
+        self.ready.append((match, match.play(), callback))
+        self.matches += 1
+
+    def step(self, playing):
+        match, moves, callback = playing
+        try:
+            move = moves.next()
+        except StopIteration:
+            self.matches -= 1
+            if callback is not None:
+                callback(match)
+            return
+        except:
+            logger.exception("Match stopped")
+            match.error = "Match stopped"
+            self.matches -= 1
+            if callback is not None:
+                callback(match)
+            return
+        if move is None:
+            self.ready.append(playing)
+        elif isinstance(move, Sleep):
+            heapq.heappush(self.sleeping, (time.time() + move.seconds, id(playing), playing))
+        else:
+            self.reading.setdefault(move.f, []).append(playing)
+
+    def wait(self):
+        # Wait for whichever comes first of something to read or a sleeping
+        # robot waking up, or only check if there are matches ready
+        if len(self.ready) > 0:
+            timeout = 0
+        elif len(self.sleeping) > 0:
+            timeout = max(0, self.sleeping[0][0] - time.time())
+        else:
+            timeout = None
+        if len(self.reading) > 0:
+            readable, writable, errors = select.select(self.reading.keys(), [], [], timeout)
+            for f in readable:
+                self.ready.extend(self.reading.pop(f))
+        elif timeout:
+            time.sleep(timeout)
+        now = time.time()
+        while len(self.sleeping) > 0 and self.sleeping[0][0] <= now:
+            self.ready.append(heapq.heappop(self.sleeping)[2])
+
+    def run(self):
+        while self.matches > 0:
+            for i in range(0, len(self.ready)):
+                self.step(self.ready.popleft())
+            self.wait()
+
+def usage():
+    print "Usage: %s [ --games=N ] [ --max-turns=N ] [ --seed=N ] <robot.py> <robot.py> [ <robot.py> .. ]" % sys.argv[0]
+
+def main():
+    robot_files = []
+    games = botwar_tournament.DEFAULT_GAMES
+    max_turns = botwar_tournament.DEFAULT_MAX_TURNS
+    seed = None
+
+    for arg in sys.argv[1:]:
+        if arg.startswith('--'):
+            arglist = arg[2:].split('=', 1)
+            if len(arglist) != 2:
+                print "You must specify a value with --%s" % (arglist[0])
+                sys.exit(1)
+            try:
+                value = int(arglist[1])
+            except ValueError:
+                print "--%s must be a number" % (arglist[0])
+                sys.exit(1)
+            if arglist[0] == 'games':
+                games = value
+            elif arglist[0] == 'max-turns':
+                max_turns = value
+            elif arglist[0] == 'seed':
+                seed = value
+            else:
+                print "Unrecognized argument %s" % (arg)
+                sys.exit(1)
+        else:
+            robot_files.append(arg)
+
+    if len(robot_files) < 2:
+        print "You must specify at least two robots"
+        usage()
+        sys.exit(1)
+
+    logging.basicConfig(
+            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+            level=logging.ERROR)
+
+    # Play the same games as a tournament, all at once in this process
+    results = botwar_tournament.Results(robot_files)
+    server = MatchServer()
+    for first, second, max_turns, game_seed in botwar_tournament.schedule(robot_files, games, max_turns, seed):
+        world = botwar.load(["--seed=%i" % game_seed, first, second])
+        if world is None:
+            results.add((first, second, None, 0, "Unable to load robots", game_seed))
+            continue
+        world.quiet = True
+        server.add(Match(world, max_turns), recorder(results, first, second, game_seed))
+    server.run()
+    results.show()
+
+def recorder(results, first, second, seed):
+    # Callback adding a finished match to results, in the same form as
+    # botwar_tournament.play_game returns
+    def record(match):
+        if match.error is not None:
+            results.add((first, second, None, match.world.turn, match.error, seed))
+            return
+        winner = None
+        alive = [seat for seat in range(0, len(match.world.robots)) if match.world.robots[seat].playing]
+        if len(alive) == 1:
+            winner = alive[0]
+        results.add((first, second, winner, match.world.turn, None, seed))
+    return record
+
+if __name__ == '__main__':
+    # Robots import Sleep and Readable from botwar_server, so play with that
+    # module rather than this copy run as __main__
+    import botwar_server
+    botwar_server.main()
@@ -0,0 +1,238 @@
+#!/usr/bin/python
+
+import botwar
+import logging
+import multiprocessing
+import random
+import sys
+
+logger = logging.getLogger()
+
+# Each worker's connection to the results database, if there is one
+results_store = None
+
+DEFAULT_GAMES = 1
+DEFAULT_MAX_TURNS = 10000
+
+def usage():
+    print "Usage: %s [ --games=N ] [ --processes=N ] [ --max-turns=N ] [ --seed=N ] [ --ladder=ratings.db ] [ --results=results.db ] <robot.py> <robot.py> [ <robot.py> .. ]" % sys.argv[0]
+
+def init_worker(results_file=None):
+    # Workers play many games, so only log problems
+    logger.setLevel(logging.ERROR)
+
+    # Each worker adds its own games to the results, writing out what's left
+    # when the pool is closed
+    global results_store
+    if results_file is not None:
+        import botwar_results
+        results_store = botwar_results.ResultsStore(results_file)
+        multiprocessing.util.Finalize(results_store, results_store.close, exitpriority=10)
+
+def schedule(robot_files, games, max_turns=DEFAULT_MAX_TURNS, seed=None):
+    # Every pairing plays the requested number of games, swapping who moves
+    # first on alternate games so neither robot gets an advantage.  Each game
+    # gets its own seed, so any game can be played again on its own
+    seeds = random.Random(seed)
+    games_list = []
+    for i in range(0, len(robot_files)):
+        for j in range(i + 1, len(robot_files)):
+            for game in range(0, games):
+                game_seed = seeds.randint(0, botwar.MAX_SEED)
+                if game % 2 == 0:
+                    games_list.append((robot_files[i], robot_files[j], max_turns, game_seed))
+                else:
+                    games_list.append((robot_files[j], robot_files[i], max_turns, game_seed))
+    return games_list
+
+def play_game(game):
+    first, second, max_turns, seed = game
+    world = botwar.load(["--seed=%i" % seed, first, second])
+    if world is None:
+        if results_store is not None:
+            results_store.add_error((first, second), seed, "Unable to load robots")
+        return (first, second, None, 0, "Unable to load robots", seed)
+    world.quiet = True
+    try:
+        stats = None
+        if results_store is not None:
+            import botwar_results
+            stats = botwar_results.TurnStats(world)
+        if not world.start():
+            if results_store is not None:
+                results_store.add_error((first, second), seed, "Unable to start game")
+            return (first, second, None, 0, "Unable to start game", seed)
+
+        while not world.game_over:
+            if max_turns is not None and world.turn >= max_turns:
+                break
+            world.next_turn()
+        if results_store is not None:
+            results_store.add(world, (first, second), seed, stats)
+
+        # Seat of the surviving robot, or None for a draw
+        winner = None
+        alive = [seat for seat in range(0, len(world.robots)) if world.robots[seat].playing]
+        if len(alive) == 1:
+            winner = alive[0]
+        return (first, second, winner, world.turn, None, seed)
+    finally:
+        world.close()
+
+class Results(object):
+    robot_files = None
+    totals = None
+    pairings = None
+    errors = None
+
+    def __init__(self, robot_files):
+        self.robot_files = robot_files
+        self.totals = {}
+        self.pairings = {}
+        self.errors = []
+        for robot_file in robot_files:
+            self.totals[robot_file] = [0, 0, 0]
+            for opponent in robot_files:
+                self.pairings[(robot_file, opponent)] = [0, 0, 0]
+
+    def add(self, result):
+        first, second, winner, turns, error, seed = result
+        if error is not None:
+            self.errors.append("%s vs %s (seed %i): %s" % (first, second, seed, error))
+            return
+        if winner is None:
+            self.record(first, second, 2)
+            self.record(second, first, 2)
+        elif winner == 0:
+            self.record(first, second, 0)
+            self.record(second, first, 1)
+        else:
+            self.record(first, second, 1)
+            self.record(second, first, 0)
+
+    def record(self, robot_file, opponent, outcome):
+        # outcome is an index into [wins, losses, draws]
+        self.totals[robot_file][outcome] += 1
+        self.pairings[(robot_file, opponent)][outcome] += 1
+
+    def points(self, robot_file):
+        wins, losses, draws = self.totals[robot_file]
+        return wins + draws * 0.5
+
+    def standings(self):
+        return sorted(self.robot_files, key=lambda r: (-self.points(r), r))
+
+    def show(self, out=sys.stdout):
+        width = max([len(r) for r in self.robot_files] + [5])
+        out.write("%-*s %6s %6s %6s %6s %7s\n" % (width, "Robot", "Games", "Wins", "Losses", "Draws", "Points"))
+        for robot_file in self.standings():
+            wins, losses, draws = self.totals[robot_file]
+            out.write("%-*s %6i %6i %6i %6i %7.1f\n" % (width, robot_file, wins + losses + draws,
+                                                       wins, losses, draws, self.points(robot_file)))
+
+        # Head to head table, read as row's wins-losses-draws against column
+        out.write("\n%-*s" % (width, ""))
+        for opponent in self.standings():
+            out.write(" %*s" % (max(len(opponent), 8), opponent))
+        out.write("\n")
+        for robot_file in self.standings():
+            out.write("%-*s" % (width, robot_file))
+            for opponent in self.standings():
+                if opponent == robot_file:
+                    cell = "-"
+                else:
+                    cell = "%i-%i-%i" % tuple(self.pairings[(robot_file, opponent)])
+                out.write(" %*s" % (max(len(opponent), 8), cell))
+            out.write("\n")
+
+        for error in self.errors:
+            out.write("ERROR: %s\n" % error)
+
+def run(robot_files, games=DEFAULT_GAMES, processes=None, max_turns=DEFAULT_MAX_TURNS, callback=None, seed=None,
+        results_file=None):
+    games_list = schedule(robot_files, games, max_turns, seed)
+    results = Results(robot_files)
+    if results_file is not None:
+        # Set the database up before the workers start, so they don't race
+        # each other to create it
+        import botwar_results
+        botwar_results.ResultsStore(results_file).close()
+    pool = multiprocessing.Pool(processes, init_worker, (results_file,))
+    try:
+        for result in pool.imap_unordered(play_game, games_list):
+            results.add(result)
+            if callback is not None:
+                callback(result)
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+    return results
+
+def main():
+    robot_files = []
+    games = DEFAULT_GAMES
+    processes = None
+    max_turns = DEFAULT_MAX_TURNS
+    seed = None
+    ladder_file = None
+    results_file = None
+
+    for arg in sys.argv[1:]:
+        if arg.startswith('--'):
+            arglist = arg[2:].split('=', 1)
+            if len(arglist) != 2:
+                print "You must specify a value with --%s" % (arglist[0])
+                sys.exit(1)
+            if arglist[0] == 'ladder':
+                ladder_file = arglist[1]
+                continue
+            if arglist[0] == 'results':
+                results_file = arglist[1]
+                continue
+            try:
+                value = int(arglist[1])
+            except ValueError:
+                print "--%s must be a number" % (arglist[0])
+                sys.exit(1)
+            if arglist[0] == 'games':
+                games = value
+            elif arglist[0] == 'processes':
+                processes = value
+            elif arglist[0] == 'max-turns':
+                max_turns = value
+            elif arglist[0] == 'seed':
+                seed = value
+            else:
+                print "Unrecognized argument %s" % (arg)
+                sys.exit(1)
+        else:
+            robot_files.append(arg)
+
+    if len(robot_files) < 2:
+        print "You must specify at least two robots"
+        usage()
+        sys.exit(1)
+
+    # Rate each game on the ladder as its result comes in
+    callback = None
+    if ladder_file is not None:
+        import botwar_ratings
+        ladder = botwar_ratings.Ladder(ladder_file)
+        paths = botwar_ratings.robot_paths(robot_files)
+        callback = lambda result: ladder.add_result(result, paths)
+
+    try:
+        results = run(robot_files, games, processes, max_turns, callback, seed, results_file)
+    finally:
+        if ladder_file is not None:
+            ladder.close()
+    results.show()
+    if ladder_file is not None:
+        print
+        ladder.show()
+
+if __name__ == '__main__':
+    main()
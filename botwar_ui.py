@@ -15,11 +15,11 @@ WEST=3
 
 direction = ["NORTH", "EAST", "SOUTH", "WEST"]
 
-logging.basicConfig(
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        level=logging.INFO)
+# Sprites are drawn turned to the nearest of this many angles, which gives
+# every frame of a 30 frame quarter turn its own image
+ROTATION_STEPS = 120
+
 logger = logging.getLogger()
-logger.setLevel(logging.DEBUG)
 
 screen = None
 clock = None
@@ -38,6 +38,101 @@ def check_quit():
             pygame.quit()
             sys.exit(0)
 
+def bar_rows(value, maximum, rows):
+    # How many of a bar's rows, counted from the bottom, show value out of
+    # maximum
+    ratio = float(value) / float(maximum)
+    return len([i for i in range(0, rows) if ratio >= float(i) / rows])
+
+class AssetCache(object):
+    """Everything the UI draws that doesn't change from frame to frame:
+    images converted to the display's format, scaled and turned to each
+    angle, sight overlays and rendered text, each made the first time it's
+    asked for.
+
+    Images have to be converted after the display mode is set, and what's
+    made from them depends on the tile size, so call clear() whenever that
+    changes."""
+    path = None
+    images = None
+    scaled_images = None
+    rotated_images = None
+    overlays = None
+    gradients = None
+    fonts = None
+    texts = None
+
+    def __init__(self, path):
+        self.path = path
+        self.images = {}
+        self.fonts = {}
+        self.clear()
+
+    def clear(self):
+        self.scaled_images = {}
+        self.rotated_images = {}
+        self.overlays = {}
+        self.gradients = {}
+        self.texts = {}
+
+    def image(self, filename):
+        if filename not in self.images:
+            self.images[filename] = pygame.image.load(os.path.join(self.path, filename)).convert_alpha()
+        return self.images[filename]
+
+    def scaled(self, filename, size):
+        key = (filename, size)
+        if key not in self.scaled_images:
+            self.scaled_images[key] = pygame.transform.smoothscale(self.image(filename), size)
+        return self.scaled_images[key]
+
+    # The image scaled to size and turned anticlockwise by angle degrees,
+    # rounded to the nearest of ROTATION_STEPS
+    def rotated(self, filename, size, angle):
+        step = int(round(angle * ROTATION_STEPS / 360.0)) % ROTATION_STEPS
+        key = (filename, size, step)
+        if key not in self.rotated_images:
+            self.rotated_images[key] = pygame.transform.rotate(self.scaled(filename, size), step * 360.0 / ROTATION_STEPS)
+        return self.rotated_images[key]
+
+    def overlay(self, size, color):
+        key = (size, color)
+        if key not in self.overlays:
+            overlay = pygame.Surface(size, pygame.SRCALPHA)
+            overlay.fill(color)
+            self.overlays[key] = overlay
+        return self.overlays[key]
+
+    # A bar of size shaded a row at a time from the bottom up, where
+    # color(i, rows) gives the color of row i of rows
+    def gradient(self, name, size, color):
+        key = (name, size)
+        if key not in self.gradients:
+            gradient = pygame.Surface(size)
+            for i in range(0, size[1]):
+                pygame.draw.line(gradient, color(i, size[1]), (0, size[1] - 1 - i), (size[0] - 1, size[1] - 1 - i))
+            self.gradients[key] = gradient
+        return self.gradients[key]
+
+    def font(self, size):
+        if size not in self.fonts:
+            self.fonts[size] = pygame.font.Font(None, size)
+        return self.fonts[size]
+
+    # text rendered in a font of size, turned anticlockwise by rotation
+    # degrees and, if max_height is given, shrunk to be no taller than that
+    def text(self, text, size, color, rotation=0, max_height=None):
+        key = (text, size, color, rotation, max_height)
+        if key not in self.texts:
+            surface = self.font(size).render(text, 1, color)
+            if rotation != 0:
+                surface = pygame.transform.rotate(surface, rotation)
+            if max_height is not None and surface.get_height() > max_height:
+                ratio = max_height / float(surface.get_height())
+                surface = pygame.transform.smoothscale(surface, (max(1, int(surface.get_width() * ratio)), int(max_height)))
+            self.texts[key] = surface
+        return self.texts[key]
+
 class WorldAnimation(object):
     robot_sprite_list = []
     world = None
@@ -48,14 +143,20 @@ class WorldAnimation(object):
     pad_x = None
     pad_y = None
     init = False
+    board_layer = None
+    hud_layer = None
+    hud_values = None
+    fill = None
+    dirty = None
     
     def __init__(self, world, powerup_file):
         self.world = world
         self.path = os.path.dirname(os.path.abspath(__file__))
-        self.powerup_orig_image = pygame.image.load(os.path.join(self.path, powerup_file))
+        self.powerup_file = powerup_file
+        self.assets = AssetCache(self.path)
         
     def scale_images(self):
-        self.powerup_image = pygame.transform.smoothscale(self.powerup_orig_image, (self.square, self.square))
+        self.powerup_image = self.assets.scaled(self.powerup_file, (self.square, self.square))
         
     def add_robot_sprite(self, robot_sprite):
         self.robot_sprite_list.append(robot_sprite)
@@ -83,18 +184,26 @@ class WorldAnimation(object):
         
     def set_res(self, w, h):
         self.init_game()
-        screen = pygame.display.set_mode((w, h), DOUBLEBUF | RESIZABLE)
+        # Frames only update the parts of the screen that changed, which
+        # needs a single buffered display
+        screen = pygame.display.set_mode((w, h), RESIZABLE)
         self.height = h
         self.width = w
         
         sw = float(w) / float(self.world.size[0])
         sh = float(h) / float(self.world.size[1])
+        old_square = self.square
         if sw > sh:
             self.square = int(sh)
         else:
             self.square = int(sw)
+        if self.square != old_square:
+            self.assets.clear()
         self.pad_x = (w - (self.square * self.world.size[0])) / 2
         self.pad_y = (h - (self.square * self.world.size[1])) / 2
+        self.board_layer = None
+        self.hud_layer = None
+        self.dirty = None
         self.scale_images()
         logger.info("Setting resolution to %ix%i with tile size of %i and padding of (%i, %i)" % (w, h, self.square, self.pad_x, self.pad_y))
         return screen
@@ -104,21 +213,31 @@ class WorldAnimation(object):
                ((self.world.size[1] - y) * self.square) + self.pad_y + (self.square/2))
         return loc
         
-    def draw_scores(self):
+    def score_panels(self):
+        return [pygame.Rect(0, 0, self.pad_x, self.height),
+                pygame.Rect(self.width - self.pad_x, 0, self.pad_x, self.height)]
+
+    # Draw the robots' names and energy and life bars into hud_layer
+    def draw_hud(self):
+        if self.hud_layer is None:
+            self.hud_layer = pygame.Surface((self.width, self.height))
+        surface = self.hud_layer
         height = self.height / ((len(self.robot_sprite_list)+1) / 2)
         block_size = self.pad_x / 20.0
-        font = pygame.font.Font(None, self.pad_x/5)
+        bar_height = int(height*0.8)
+        energy_size = (int(block_size*4), bar_height)
+        life_size = (int(block_size*12) - int(block_size*8), bar_height)
+        energy_bar = self.assets.gradient("energy", energy_size, lambda i, rows: (0, float(i)/rows*255, 255))
+        life_bar = self.assets.gradient("life", life_size, lambda i, rows: (float(rows - i)/rows*255, float(i)/rows*255, 0))
         count = 0
         # Black out scores area
-        pygame.draw.rect(screen, (0, 0, 0), (0, 0, self.pad_x, self.height))
-        pygame.draw.rect(screen, (0, 0, 0), (self.width - self.pad_x, 0, self.pad_x, self.height))
+        for rect in self.score_panels():
+            surface.fill((0, 0, 0), rect)
         for robot_sprite in self.robot_sprite_list:
             count += 1
             robot = robot_sprite.robot
-            text = font.render(robot.name, 1, (255, 255, 255))
 
             top = (height * ((count-1) / 2)) + int(height*0.1)
-            bottom = top + int(height*0.8)
             if count % 2 == 1:
                 rotation = -90
                 left = int(block_size * 6)
@@ -127,52 +246,66 @@ class WorldAnimation(object):
                 rotation = 90
                 left = (self.width - self.pad_x) + int(block_size*2)
                 location = (self.width - (block_size * 3), top + (height/2))
-            text = pygame.transform.rotate(text, rotation) 
+            text = self.assets.text(robot.name, self.pad_x/5, (255, 255, 255), rotation, bar_height)
             textpos = text.get_rect()
-            if textpos[3] > int(height*0.8):
-                ratio = (height*0.8) / float(textpos[3])
-                text = pygame.transform.smoothscale(textpos[2] * ratio, textpos[3]*ratio)
-                textpos = text.get_rect()
             textpos.center = location
-            screen.blit(text, textpos)
-            for i in range(0, int(height*0.8)):
-                # Show energy bar
-                energy_color = (0, float(i)/int(height*0.8)*255, 255)
-                if float(robot.energy)/float(robot.max_energy) >= float(i)/int(height*0.8):
-                    pygame.draw.line(screen, energy_color, (left, top+int(height*0.8)-i), (left+int(block_size*4)-1, top+int(height*0.8)-i))
-                # Show life bar
-                life_color = ((height*0.8 - float(i))/int(height*0.8)*255, float(i)/int(height*0.8)*255, 0)
-                if float(robot.life)/float(robot.max_life) >= float(i)/int(height*0.8):
-                    pygame.draw.line(screen, life_color, (left+int(block_size*8), top+int(height*0.8)-i), (left+int(block_size*12)-1, top+int(height*0.8)-i))
+            surface.blit(text, textpos)
+            # Show as much of each bar as the robot has energy and life left
+            rows = bar_rows(robot.energy, robot.max_energy, bar_height)
+            surface.blit(energy_bar, (left, top+1+bar_height-rows), (0, bar_height-rows, energy_size[0], rows))
+            rows = bar_rows(robot.life, robot.max_life, bar_height)
+            surface.blit(life_bar, (left+int(block_size*8), top+1+bar_height-rows), (0, bar_height-rows, life_size[0], rows))
 
             energy_color = (0, float(robot.energy)/float(robot.max_energy)*255, 255)
             life_color = ((float(robot.max_life) - float(robot.life))/float(robot.max_life)*255, float(robot.life)/float(robot.max_life)*255, 0)
-            pygame.draw.rect(screen, energy_color, (left, top, int(block_size*4), int(height*0.8)), 1)
-            pygame.draw.rect(screen, life_color, (left+int(block_size*8), top, int(block_size*4), int(height*0.8)), 1) 
+            pygame.draw.rect(surface, energy_color, (left, top, int(block_size*4), bar_height), 1)
+            pygame.draw.rect(surface, life_color, (left+int(block_size*8), top, int(block_size*4), bar_height), 1) 
+
+    # Put the scores back wherever rects overlap them, or redraw them all if
+    # any robot's energy or life has changed, returning the rects of the
+    # panels if so
+    def draw_scores(self, rects):
+        values = [(robot_sprite.robot.name, robot_sprite.robot.energy, robot_sprite.robot.life)
+                  for robot_sprite in self.robot_sprite_list]
+        panels = self.score_panels()
+        if self.hud_layer is None or values != self.hud_values:
+            self.draw_hud()
+            self.hud_values = values
+            for panel in panels:
+                screen.blit(self.hud_layer, panel, panel)
+            return panels
+        for rect in rects:
+            for panel in panels:
+                clip = panel.clip(rect)
+                if clip.width > 0 and clip.height > 0:
+                    screen.blit(self.hud_layer, clip, clip)
+        return []
         	
-    def draw_board(self):
-        for i in range(0, self.world.size[0]+1):
-            pygame.draw.line(screen, (64, 64, 64), (i*self.square + self.pad_x, self.pad_y), (i*self.square + self.pad_x, self.height-self.pad_y))
+    def draw_board(self, surface):
         for i in range(0, self.world.size[0]+1):
-            pygame.draw.line(screen, (64, 64, 64), (self.pad_x, i*self.square + self.pad_y), (self.width-self.pad_x, i*self.square + self.pad_y))
+            pygame.draw.line(surface, (64, 64, 64), (i*self.square + self.pad_x, self.pad_y), (i*self.square + self.pad_x, self.height-self.pad_y))
+        for i in range(0, self.world.size[1]+1):
+            pygame.draw.line(surface, (64, 64, 64), (self.pad_x, i*self.square + self.pad_y), (self.width-self.pad_x, i*self.square + self.pad_y))
             
     def draw_sight(self):
+        rects = []
         for robot_sprite in self.robot_sprite_list:
             robot = robot_sprite.robot
             y = robot_sprite.current_location[1] - self.square*1.5
             x = robot_sprite.current_location[0] - self.square*1.5
             if robot.turret_direction == EAST or robot.turret_direction == WEST:
-                s = pygame.Surface((self.square*6, self.square*3), pygame.SRCALPHA)
+                s = self.assets.overlay((self.square*6, self.square*3), (255,255,0,32))
                 if robot.turret_direction == WEST:
                     x -= self.square * 3
             else:
-                s = pygame.Surface((self.square*3, self.square*6), pygame.SRCALPHA)
+                s = self.assets.overlay((self.square*3, self.square*6), (255,255,0,32))
                 if robot.turret_direction == NORTH:
                     y -= self.square * 3
-            s.fill((255,255,0,32))
-            screen.blit(s, (x, y)) 
+            rects.append(screen.blit(s, (x, y)))
+        return rects
 
     def draw_enemy_circles(self):
+        rects = []
         count = 0
         for robot_sprite in self.robot_sprite_list:
             count += 1
@@ -189,33 +322,58 @@ class WorldAnimation(object):
             age_check = 10 - robot.enemy_location[2]
             if age_check < 0:
                 age_check = 0
-            pygame.draw.circle(screen, (red*64 + (red * (age_check * 19.1)), 0, blue*64 + (blue * (age_check * 19.1))), enemy_location, self.square/2, 2)
+            rects.append(pygame.draw.circle(screen, (red*64 + (red * (age_check * 19.1)), 0, blue*64 + (blue * (age_check * 19.1))), enemy_location, self.square/2, 2))
+        return rects
 
     def draw_powerups(self):
+        rects = []
         for powerup in self.world.powerups:
             rect = self.powerup_image.get_rect()
             rect.center = self.board_to_screen(powerup[0], powerup[1])
-            screen.blit(self.powerup_image, rect)
+            rects.append(screen.blit(self.powerup_image, rect))
+        return rects
             
-    def animate(self):
-        self.draw_sight()
-        self.draw_scores()
-        self.draw_board()
-        self.draw_powerups()
-        self.draw_enemy_circles()
+    # Draw a frame and show it.  The screen is built up in layers: the
+    # background, filled with fill, effect (a function that draws on the
+    # screen and returns the rect it drew, such as an EMP blast), the sight
+    # overlays and scores, the grid lines, then the powerups, enemy circles
+    # and robots.  The grid is drawn once into board_layer and the scores
+    # into hud_layer whenever they change, and only the rects drawn on in
+    # this frame or the last one are redrawn and updated, unless fill has
+    # changed
+    def animate(self, fill=(0, 0, 0), effect=None):
+        if self.board_layer is None:
+            self.board_layer = pygame.Surface((self.width, self.height))
+            self.board_layer.set_colorkey((0, 0, 0))
+            self.draw_board(self.board_layer)
+        if self.dirty is None or fill != self.fill:
+            restored = [screen.fill(fill)]
+            self.fill = fill
+        else:
+            restored = self.dirty
+            for rect in restored:
+                screen.fill(fill, rect)
+        drawn = []
+        if effect is not None:
+            drawn.append(effect())
+        drawn.extend(self.draw_sight())
+        scores = self.draw_scores(restored + drawn)
+        for rect in restored + drawn + scores:
+            screen.blit(self.board_layer, rect, rect)
+        drawn.extend(self.draw_powerups())
+        drawn.extend(self.draw_enemy_circles())
         for robot_sprite in self.robot_sprite_list:
-            robot_sprite.render()
+            drawn.extend(robot_sprite.render())
+        pygame.display.update(restored + drawn + scores)
+        self.dirty = drawn
 
         
 class RobotSprite(object):
     robot = None
     w = None
     
-    tank_orig_image = None
-    turret_orig_image = None
-    
-    tank_image = None
-    turret_image = None
+    tank_file = None
+    turret_file = None
     
     old_location = None
     old_robot_direction = None
@@ -230,18 +388,14 @@ class RobotSprite(object):
     
     def __init__(self, tank_image, turret_image, robot, w, frames):
         self.w = w
-        self.tank_orig_image = pygame.image.load(os.path.join(self.w.path, tank_image))
-        self.turret_orig_image = pygame.image.load(os.path.join(self.w.path, turret_image))
+        self.tank_file = tank_image
+        self.turret_file = turret_image
         self.robot = robot
         self.frames = frames
         self.current_location = self.calc_loc(self.robot.location)
         self.current_robot_direction = robot.robot_direction*90
         self.current_turret_direction = robot.turret_direction*90
     
-    def scale_images(self):
-        self.tank_image = pygame.transform.smoothscale(self.tank_orig_image, (self.w.square, self.w.square))
-        self.turret_image = pygame.transform.smoothscale(self.turret_orig_image, (self.w.square, self.w.square))
-        
     def calc_loc(self, location):
         loc = (((location[0] - 1) * self.w.square) + self.w.pad_x + (self.w.square/2),
                ((self.w.world.size[1] - location[1]) * self.w.square) + self.w.pad_y + (self.w.square/2))
@@ -249,7 +403,6 @@ class RobotSprite(object):
         
     def next_turn(self):
         if self.robot.last_command is None:
-            screen.fill((0, 0, 0))
             self.w.animate()
             clock.tick(1)
             return
@@ -261,16 +414,12 @@ class RobotSprite(object):
             deltax = (new_location[0] - old_location[0]) / float(self.frames)
             deltay = (new_location[1] - old_location[1]) / float(self.frames)
             for i in range(1, self.frames):
-                screen.fill((0, 0, 0))
                 self.current_location = (self.current_location[0] + deltax, self.current_location[1] + deltay)
                 self.w.animate()
                 check_quit()
-                pygame.display.flip()
                 clock.tick(self.frames)
-            screen.fill((0, 0, 0))
             self.current_location = new_location
             self.w.animate()
-            pygame.display.flip()
             clock.tick(self.frames)
 
         # Last command was turning
@@ -290,14 +439,11 @@ class RobotSprite(object):
                 old_turret_direction = 360
             delta_turret_direction = (new_turret_direction - old_turret_direction) / float(self.frames)
             for i in range(1, self.frames):
-                screen.fill((0, 0, 0))
                 self.current_robot_direction = self.current_robot_direction + delta_robot_direction
                 self.current_turret_direction = self.current_turret_direction + delta_turret_direction
                 self.w.animate()
                 check_quit()
-                pygame.display.flip()
                 clock.tick(self.frames)
-            screen.fill((0, 0, 0))
             if new_turret_direction == 360:
                 new_turret_direction = 0
             if new_robot_direction == 360:
@@ -305,123 +451,101 @@ class RobotSprite(object):
             self.current_robot_direction = new_robot_direction
             self.current_turret_direction = new_turret_direction
             self.w.animate()
-            pygame.display.flip()
             clock.tick(self.frames)
             
         # Last command was scan for enemies
         elif self.robot.last_command == "se":
             delta_color = 255/(self.frames/2)
             for i in range(1, self.frames/2):
-                screen.fill((i*delta_color, 0, i*delta_color))
-                self.w.animate()
+                self.w.animate((i*delta_color, 0, i*delta_color))
                 check_quit()
-                pygame.display.flip()
                 clock.tick(self.frames)
             for i in range(1, self.frames/2):
-                screen.fill((255-(i*delta_color), 0, 255-(i*delta_color)))
-                self.w.animate()
+                self.w.animate((255-(i*delta_color), 0, 255-(i*delta_color)))
                 check_quit()
-                pygame.display.flip()
                 clock.tick(self.frames)
-            screen.fill((0, 0, 0))
             self.w.animate()
-            pygame.display.flip()
             clock.tick(self.frames)
             
         # Last command was scan for powerups
         elif self.robot.last_command == "sp":
             delta_color = 255/(self.frames/2)
             for i in range(1, self.frames/2):
-                screen.fill((0, i*delta_color, 0))
-                self.w.animate()
+                self.w.animate((0, i*delta_color, 0))
                 check_quit()
-                pygame.display.flip()
                 clock.tick(self.frames)
             for i in range(1, self.frames/2):
-                screen.fill((0, 255-(i*delta_color), 0))
-                self.w.animate()
+                self.w.animate((0, 255-(i*delta_color), 0))
                 check_quit()
-                pygame.display.flip()
                 clock.tick(self.frames)
-            screen.fill((0, 0, 0))
             self.w.animate()
-            pygame.display.flip()
             clock.tick(self.frames)
             
         elif self.robot.last_command == "emp":
             delta_color = 255/(self.frames/2)
             for i in range(1, self.frames/2):
-                screen.fill((0, 0, 0))
-                rect = pygame.Rect(0, 0, self.w.square*5, self.w.square*5)
-                rect.center = self.current_location
-                pygame.draw.rect(screen, (i*delta_color, 0, 0), rect)
-                self.w.animate()
+                self.w.animate(effect=lambda: self.draw_emp((i*delta_color, 0, 0)))
                 check_quit()
-                pygame.display.flip()
                 clock.tick(self.frames)
             for i in range(1, self.frames/2):
-                screen.fill((0, 0, 0))
-                rect = pygame.Rect(0, 0, self.w.square*5, self.w.square*5)
-                rect.center = self.current_location
-                pygame.draw.rect(screen, (255-(i*delta_color), 0, 0), rect)
-                self.w.animate()
+                self.w.animate(effect=lambda: self.draw_emp((255-(i*delta_color), 0, 0)))
                 check_quit()
-                pygame.display.flip()
                 clock.tick(self.frames)
-            screen.fill((0, 0, 0))
             self.w.animate()
-            pygame.display.flip()
             clock.tick(self.frames)
             
         elif self.robot.last_command == "laser":
             delta_color = 255/(self.frames/2)
             for i in range(1, self.frames/2):
-                screen.fill((0, 0, 0))
-                if self.robot.turret_direction == NORTH:
-                    pygame.draw.line(screen, (255, 0, 0), self.current_location, (self.current_location[0], 0), 3)
-                elif self.robot.turret_direction == SOUTH:
-                    pygame.draw.line(screen, (255, 0, 0), self.current_location, (self.current_location[0], self.w.height), 3)
-                elif self.robot.turret_direction == EAST:
-                    pygame.draw.line(screen, (255, 0, 0), self.current_location, (self.w.width, self.current_location[1]), 3)
-                elif self.robot.turret_direction == WEST:
-                    pygame.draw.line(screen, (255, 0, 0), self.current_location, (0, self.current_location[1]), 3)
-                self.w.animate()
+                self.w.animate(effect=self.draw_laser)
                 check_quit()
-                pygame.display.flip()
                 clock.tick(self.frames)
-            screen.fill((0, 0, 0))
             self.w.animate()
-            pygame.display.flip()
             clock.tick(self.frames)
             
         # Wait
         else:
-            screen.fill((0, 0, 0))
             self.w.animate()
             check_quit()
-            pygame.display.flip()
             clock.tick(1)
             
         return
+
+    def draw_emp(self, color):
+        rect = pygame.Rect(0, 0, self.w.square*5, self.w.square*5)
+        rect.center = self.current_location
+        return pygame.draw.rect(screen, color, rect)
+
+    def draw_laser(self):
+        if self.robot.turret_direction == NORTH:
+            end = (self.current_location[0], 0)
+        elif self.robot.turret_direction == SOUTH:
+            end = (self.current_location[0], self.w.height)
+        elif self.robot.turret_direction == EAST:
+            end = (self.w.width, self.current_location[1])
+        else:
+            end = (0, self.current_location[1])
+        # The rect pygame gives back for a thick line can leave out its edges
+        return pygame.draw.line(screen, (255, 0, 0), self.current_location, end, 3).inflate(4, 4)
         
     def render(self):
         if self.current_location[0] == -1 or self.current_location[1] == -1:
             logger.warning("%s isn't on the board yet, so can't render it" % self.robot.name)
-            return
+            return []
 
         # Render tank and turret
-        tankdir = pygame.transform.rotate(self.tank_image, -self.current_robot_direction)
-        turretdir = pygame.transform.rotate(self.turret_image, -self.current_turret_direction)
+        size = (self.w.square, self.w.square)
+        tankdir = self.w.assets.rotated(self.tank_file, size, -self.current_robot_direction)
+        turretdir = self.w.assets.rotated(self.turret_file, size, -self.current_turret_direction)
         rect = tankdir.get_rect()
         rect.center = self.current_location
-        screen.blit(tankdir, rect)
+        tank_rect = screen.blit(tankdir, rect)
         rect = turretdir.get_rect()
         rect.center = self.current_location
-        screen.blit(turretdir, rect)        
+        return [tank_rect, screen.blit(turretdir, rect)]
         
         
 def animate(robot):
-    screen.fill((0, 0, 0))
     for robot_sprite in robot_list:
         if robot_sprite.robot == robot:
             break
@@ -439,9 +563,15 @@ def init():
     global world
     global w
         
+    logging.basicConfig(
+            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+            level=logging.INFO)
+    logger.setLevel(logging.DEBUG)
+
     world = botwar.load(sys.argv[1:])
     if world is None:
         sys.exit(1)
+    botwar.LoggingSubscriber(logger).attach(world.events)
 
     if not world.start():
         sys.exit(1)
@@ -459,41 +589,38 @@ def main():
     i = 0
     for robot in world.robots:
         robot_sprite = RobotSprite('tank-%i.png' % (i+1), 'turret-%i.png' % (i+1), robot, w, 30)
-        robot_sprite.scale_images()
         w.add_robot_sprite(robot_sprite)
         robot_list.append(robot_sprite)
         i = 1 - i
         
-    screen.fill((0, 0, 0))
     w.animate()
     while True:
         robot = world.next_turn()
         animate(robot)
         if world.game_over:
             break
+    if world.profiler is not None:
+        world.profiler.show()
     for r in w.robot_sprite_list:
         if r.robot.playing:
             if w.width > w.height:
                 size = int(w.height * 0.5)
             else:
                 size = int(w.width * 0.5)
-            tank_image = pygame.transform.smoothscale(r.tank_orig_image, (size, size))
-            turret_image = pygame.transform.smoothscale(r.turret_orig_image, (size, size))
             dir_delta = 90 / r.frames
             for i in xrange(0, r.frames * 8):
                 check_quit()
                 pygame.draw.rect(screen, (0, 0, 0), (w.width / 20, w.height / 20, w.width * 0.9, w.height * 0.9))
                 pygame.draw.rect(screen, (128, 128, 128), (w.width / 20, w.height / 20, w.width * 0.9, w.height * 0.9), 1)
-                tankdir = pygame.transform.rotate(tank_image, dir_delta*i)
-                turretdir = pygame.transform.rotate(turret_image, dir_delta*i)
+                tankdir = w.assets.rotated(r.tank_file, (size, size), dir_delta*i)
+                turretdir = w.assets.rotated(r.turret_file, (size, size), dir_delta*i)
                 rect = tankdir.get_rect()
                 rect.center = (w.width / 2, w.height / 2 - 20)
                 screen.blit(tankdir, rect)
                 rect = turretdir.get_rect()
                 rect.center = (w.width / 2, w.height / 2 - 20)
                 screen.blit(turretdir, rect)
-                font = pygame.font.Font(None, w.height / 10)
-                text = font.render(r.robot.name + " wins!", 1, (255, 255, 255))
+                text = w.assets.text(r.robot.name + " wins!", w.height / 10, (255, 255, 255))
                 rect = text.get_rect()
                 rect.center = (w.width / 2, w.height * 0.8)
                 screen.blit(text, rect)
@@ -35,3 +35,26 @@ def run(turn, max_energy, max_life, energy, life,
             return "face", "east"
         else:
             return "laser"
+
+# The same moves for many games at once, for botwar_batch
+def run_batch(observations):
+    import numpy
+    from botwar_batch import SE, LASER, GOTO, FACE_NORTH, FACE_EAST, FACE_SOUTH, FACE_WEST, UNKNOWN
+    enemy_x = observations["enemy_location_x"]
+    enemy_y = observations["enemy_location_y"]
+    x = observations["location_x"]
+    y = observations["location_y"]
+    direction = observations["robot_direction"]
+    codes = numpy.select([enemy_x == -1,
+                          (enemy_x == x) & (enemy_y > y) & (direction != 0),
+                          (enemy_x == x) & (enemy_y > y),
+                          (enemy_x == x) & (enemy_y < y) & (direction != 2),
+                          (enemy_x == x) & (enemy_y < y),
+                          enemy_y != y,
+                          (enemy_x < x) & (direction != 3),
+                          enemy_x < x,
+                          (enemy_x > x) & (direction != 1),
+                          enemy_x > x],
+                         [SE, FACE_NORTH, LASER, FACE_SOUTH, LASER, GOTO, FACE_WEST, LASER, FACE_EAST, LASER],
+                         UNKNOWN)
+    return codes, x, enemy_y
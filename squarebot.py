@@ -12,3 +12,10 @@ def run(turn, max_energy, max_life, energy, life,
         return "laser"
     else:
         return "fd"
+
+# The same moves for many games at once, for botwar_batch
+def run_batch(observations):
+    import numpy
+    from botwar_batch import RT, LASER, FD
+    turn = observations["turn"] % 7
+    return numpy.where(turn == 0, RT, numpy.where(turn == 1, LASER, FD))